@@ -0,0 +1,170 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 12:40
+# @Author :Pang
+# @File :  batch_annotate.py
+# @Description : Headless batch pre-annotation of whole image folders (no Qt required)
+
+
+import argparse
+import os
+import sys
+import time
+
+from tools import label_io
+from tools.result_cache import result_cache
+from tools.sam_processor import SAMProcessor
+from tools.yolo_processor import YOLOProcessor
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+CHECKPOINT_FILE = '.batch_checkpoint.txt'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-annotate an image folder with YOLO boxes and/or SAM polygons.")
+    parser.add_argument('--images', required=True, help="Image folder (searched recursively)")
+    parser.add_argument('--labels', required=True, help="Label folder with classes.txt and Box/Point/Polygon")
+    parser.add_argument('--mode', choices=['yolo', 'sam', 'both'], default='both',
+                        help="yolo: boxes only, sam: polygons from existing labels, both: YOLO boxes then SAM")
+    parser.add_argument('--yolo-weight', default='weights/yolo11n.pt')
+    parser.add_argument('--sam-weight', default='weights/sam2_b.pt')
+    parser.add_argument('--sam-prompt', choices=['box', 'point'], default='box',
+                        help="Which existing labels are used as SAM prompts (mode=sam)")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.45, help="YOLO NMS IoU threshold")
+    parser.add_argument('--box-iou', type=float, default=0.45,
+                        help="Detections overlapping an existing box by more than this IoU are not added")
+    parser.add_argument('--sam-iou', type=float, default=0.6, help="Polygon de-duplication IoU threshold")
+    parser.add_argument('--reduction-factor', type=int, default=4)
+    parser.add_argument('--sam-roi', action='store_true',
+                        help="Run SAM on padded crops around the prompts instead of the full frame")
+    parser.add_argument('--tile-size', type=int, default=0,
+                        help="Run YOLO and SAM on overlapping tiles of this size (0 = whole image)")
+    parser.add_argument('--tile-overlap', type=int, default=128)
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--workers', type=int, default=4, help="Threads used to decode images ahead of inference")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--resume', action='store_true', help="Skip images recorded in the checkpoint file")
+    parser.add_argument('--no-result-cache', action='store_true',
+                        help="Always run inference instead of reusing cached detections and polygons")
+    return parser.parse_args(argv)
+
+
+def find_images(folder):
+    image_files = []
+    for root, dirs, files in os.walk(folder):
+        for file in files:
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                image_files.append(os.path.join(root, file))
+    return sorted(image_files)
+
+
+def image_name_of(image_path):
+    return os.path.splitext(os.path.basename(image_path))[0]
+
+
+def load_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, 'r') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def ensure_class_names(label_folder, names):
+    class_file_path = os.path.join(label_folder, 'classes.txt')
+    class_names = label_io.read_class_names(class_file_path) if os.path.exists(class_file_path) else {}
+    missing = {class_id: name for class_id, name in names.items() if class_id not in class_names}
+    if missing:
+        class_names.update(missing)
+        # Keep ids contiguous so line numbers in classes.txt stay the class ids
+        for class_id in range(max(class_names) + 1):
+            class_names.setdefault(class_id, f"class_{class_id}")
+        label_io.write_class_names(class_file_path, class_names)
+
+
+def save_boxes(args, image_path, boxes, img_size):
+    """Add the detections to the image's Box labels, existing (hand-made) boxes are kept."""
+    image_name = image_name_of(image_path)
+    labels = label_io.read_labels(args.labels, 'box', image_name)
+    labels.extend(YOLOProcessor.merge_boxes(labels.coords.tolist(), boxes, img_size, args.box_iou))
+    label_io.write_labels(args.labels, 'box', image_name, labels)
+
+
+def iter_tiled(args, processor, image_paths):
+    # Each large image is split into tiles that are batched through the model
+    for image_path in image_paths:
+        boxes, img_size = processor.process_image_tiled(image_path, tile_size=args.tile_size,
+                                                        overlap=args.tile_overlap, batch_size=args.batch_size,
+                                                        workers=args.workers)
+        yield image_path, boxes.tolist(), img_size
+
+
+def run_sam(args, image_path, prompt_type):
+    labels = label_io.read_labels(args.labels, prompt_type, image_name_of(image_path))
+    if not labels:
+        return False
+    SAMProcessor.process(image_path, labels, args.labels, prompt_type,
+                         reduction_factor=args.reduction_factor, iou_threshold=args.sam_iou,
+                         model_path=args.sam_weight, conf=args.conf, device=args.device, roi=args.sam_roi,
+                         tile_size=args.tile_size or None, tile_overlap=args.tile_overlap, workers=args.workers)
+    return True
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.labels, exist_ok=True)
+    if args.no_result_cache:
+        result_cache.disable()
+
+    checkpoint_path = os.path.join(args.labels, CHECKPOINT_FILE)
+    done = load_checkpoint(checkpoint_path) if args.resume else set()
+    image_paths = [path for path in find_images(args.images) if path not in done]
+    print(f"{len(image_paths)} images to process ({len(done)} already done)")
+    if not image_paths:
+        return 0
+
+    processor = None
+    if args.mode in ('yolo', 'both'):
+        processor = YOLOProcessor(args.yolo_weight, args.conf, args.iou, device=args.device)
+        ensure_class_names(args.labels, dict(processor.model.names))
+    prompt_type = 'box' if args.mode == 'both' else args.sam_prompt
+
+    if processor is not None:
+        os.makedirs(os.path.join(args.labels, 'Box'), exist_ok=True)
+        # Detection streams in batches, box files are written as each result arrives
+        if args.tile_size:
+            items = iter_tiled(args, processor, image_paths)
+        else:
+            items = ((image_path, boxes.tolist(), img_size) for image_path, boxes, img_size in
+                     processor.process_stream(image_paths, batch_size=args.batch_size, workers=args.workers))
+    else:
+        items = ((image_path, None, None) for image_path in image_paths)
+
+    start_time = time.time()
+    processed = 0
+    with open(checkpoint_path, 'a' if args.resume else 'w') as checkpoint:
+        for image_path, boxes, img_size in items:
+            if boxes is not None:
+                save_boxes(args, image_path, boxes, img_size)
+
+            if args.mode in ('sam', 'both'):
+                try:
+                    run_sam(args, image_path, prompt_type)
+                except Exception as e:
+                    # Not recorded in the checkpoint, so it is retried on resume
+                    print(f"SAM failed on {image_path}: {e}", file=sys.stderr)
+                    continue
+
+            # Only record images whose results are completely written
+            checkpoint.write(f"{image_path}\n")
+            processed += 1
+            if processed % args.batch_size == 0 or processed == len(image_paths):
+                checkpoint.flush()
+                elapsed = time.time() - start_time
+                print(f"[{processed}/{len(image_paths)}] {processed / elapsed:.2f} images/s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
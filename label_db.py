@@ -0,0 +1,66 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 23:20
+# @Author :Pang
+# @File :  label_db.py
+# @Description : Import a label folder into a project database and export it back (no Qt required)
+
+
+import argparse
+import os
+import sys
+import time
+
+from tools.label_backend import DB_SUFFIXES, copy_labels, open_backend
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between the Box/Point/Polygon label folder layout "
+                                                 "and a single-file SQLite project database.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Copy a label folder into a database")
+    import_parser.add_argument('folder', help="Label folder with classes.txt and Box/Point/Polygon")
+    import_parser.add_argument('database', help=f"Database file ({', '.join(DB_SUFFIXES)})")
+    export_parser = subparsers.add_parser('export', help="Write a database out as a label folder")
+    export_parser.add_argument('database')
+    export_parser.add_argument('folder')
+    for subparser in (import_parser, export_parser):
+        subparser.add_argument('--workers', type=int, default=8, help="Threads reading label files / rows")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.database.lower().endswith(DB_SUFFIXES):
+        print(f"Database file name must end with one of {', '.join(DB_SUFFIXES)}", file=sys.stderr)
+        return 1
+
+    if args.command == 'import':
+        if not os.path.isdir(args.folder):
+            print(f"No label folder at {args.folder}", file=sys.stderr)
+            return 1
+        source, target = args.folder, args.database
+    else:
+        if not os.path.exists(args.database):
+            print(f"No database at {args.database}", file=sys.stderr)
+            return 1
+        os.makedirs(args.folder, exist_ok=True)
+        source, target = args.database, args.folder
+    source, target = open_backend(source), open_backend(target)
+
+    start_time = time.time()
+
+    def progress(done, total):
+        print(f"[{done}/{total}] {done / max(time.time() - start_time, 1e-6):.0f} label sets/s")
+
+    try:
+        copied = copy_labels(source, target, workers=args.workers, progress=progress)
+    finally:
+        # Closes the connections of the copy threads too
+        source.close()
+        target.close()
+    print(f"{copied} label sets copied from {source.location} to {target.location}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
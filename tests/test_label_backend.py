@@ -0,0 +1,59 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 17:10
+# @Author :Pang
+# @File :  test_label_backend.py
+# @Description : SQLiteBackend closes the connections of every thread, copy_labels round trip
+
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.label_backend import SQLiteBackend, copy_labels, open_backend
+from tools.label_store import ImageLabels
+
+
+BOXES = [{'class_id': 1, 'bbox': [0.5, 0.5, 0.1, 0.2]}, {'class_id': 0, 'bbox': [0.25, 0.75, 0.05, 0.05]}]
+POLYGONS = [{'class_id': 2, 'polygon': [(0.1, 0.1), (0.2, 0.1), (0.2, 0.2)]}, {'class_id': 3, 'polygon': []}]
+
+
+def test_close_closes_every_thread_connection(tmp_path):
+    db_path = str(tmp_path / 'project.sqlite')
+    backend = SQLiteBackend(db_path)
+    backend.write('box', 'image', BOXES)
+    threads = [threading.Thread(target=backend.read, args=('box', 'image')) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    backend.close()
+    # The last connection to close removes the write-ahead log
+    assert os.listdir(tmp_path) == ['project.sqlite']
+    # Used again, the backend reconnects
+    assert list(backend.read('box', 'image')) == BOXES
+    backend.close()
+
+
+def test_copy_round_trip(tmp_path):
+    folder = open_backend(str(tmp_path / 'labels'))
+    folder.write_class_names({0: 'cat', 1: 'dog', 2: 'bird', 3: 'fish'})
+    folder.write('box', 'a', BOXES)
+    folder.write('polygon', 'a', POLYGONS)
+    folder.write('point', 'b', [{'class_id': 0, 'point': (0.5, 0.25)}])
+
+    assert copy_labels(folder, str(tmp_path / 'project.sqlite')) == 3
+    assert copy_labels(str(tmp_path / 'project.sqlite'), str(tmp_path / 'exported')) == 3
+    # The database was opened from a location both times and closed again
+    assert not os.path.exists(tmp_path / 'project.sqlite-wal')
+
+    exported = open_backend(str(tmp_path / 'exported'))
+    assert exported.read_class_names() == folder.read_class_names()
+    names_of = {label_type: set(names) for label_type, names in folder.scan().items()}
+    assert {label_type: set(names) for label_type, names in exported.scan().items()} == names_of
+    for label_type, names in names_of.items():
+        for image_name in names:
+            assert exported.read(label_type, image_name).to_lines() == \
+                ImageLabels.from_labels(label_type, folder.read(label_type, image_name)).to_lines()
@@ -0,0 +1,135 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 16:40
+# @Author :Pang
+# @File :  test_label_cache.py
+# @Description : LabelCache LRU eviction, write-back of modified labels and pinning
+
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.label_backend import FolderBackend, open_backend
+from tools.label_cache import LabelCache
+from tools.label_store import ImageLabels
+
+
+def box(class_id, x=0.5):
+    return {'class_id': class_id, 'bbox': [x, 0.5, 0.1, 0.1]}
+
+
+class RecordingBackend(FolderBackend):
+    def __init__(self, label_folder):
+        super().__init__(label_folder)
+        self.reads = []
+        self.writes = []
+
+    def read(self, label_type, image_name):
+        self.reads.append(image_name)
+        return super().read(label_type, image_name)
+
+    def write(self, label_type, image_name, labels):
+        self.writes.append(image_name)
+        super().write(label_type, image_name, labels)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = RecordingBackend(str(tmp_path))
+    for i in range(6):
+        backend.write('box', f"image{i}", ImageLabels.from_labels('box', [box(i)]))
+    backend.writes.clear()
+    return backend
+
+
+def test_least_recently_used_is_evicted(backend):
+    cache = LabelCache('box', backend, capacity=3)
+    for name in ['image0', 'image1', 'image2']:
+        cache[name]
+    cache['image0']  # image1 is now the least recently used
+    cache['image3']
+    assert [name for name, _ in cache.cached_items()] == ['image2', 'image0', 'image3']
+    assert backend.writes == []
+
+    # Evicted labels are read again on the next access
+    assert cache['image1'][0] == box(1)
+    assert backend.reads.count('image1') == 2
+
+
+def test_modified_labels_are_written_on_eviction(backend):
+    cache = LabelCache('box', backend, capacity=2)
+    cache['image0'] = [box(7)]
+    cache['image1'].append(box(8))
+    cache.mark_modified('image1')
+    cache['image2']
+    assert backend.writes == ['image0']
+    cache['image3']
+    cache['image4']
+    assert backend.writes == ['image0', 'image1']
+    assert cache.modified == set()
+    assert list(backend.read('box', 'image0')) == [box(7)]
+    assert list(backend.read('box', 'image1')) == [box(1), box(8)]
+
+
+def test_pinned_image_is_never_evicted(backend):
+    cache = LabelCache('box', backend, capacity=2)
+    cache.pin('image0')
+    cache['image0'] = [box(9)]
+    for i in range(1, 6):
+        cache[f"image{i}"]
+    assert 'image0' in dict(cache.cached_items())
+    assert len(cache.cached_items()) == 2
+    assert 'image0' in cache.modified
+    assert 'image0' not in backend.writes
+
+
+def test_modified_labels_without_backend_are_kept():
+    cache = LabelCache('box', capacity=2)
+    for i in range(4):
+        cache[f"image{i}"] = [box(i)]
+    assert len(cache.cached_items()) == 4
+    assert cache.flush() == 0
+
+
+def test_flush_writes_only_modified(backend):
+    cache = LabelCache('box', backend)
+    cache['image0']
+    cache['image1'] = [box(5)]
+    cache.labels_for('unlabelled')
+    assert cache.flush() == 1
+    assert backend.writes == ['image1']
+    assert not os.path.exists(os.path.join(backend.location, 'Box', 'unlabelled.txt'))
+
+
+@pytest.mark.parametrize('location', ['labels', 'project.sqlite'])
+def test_matches_dict_after_random_use(tmp_path, location):
+    """Whatever is evicted, written back or read again, the cache behaves like a dict of every image's labels."""
+    rng = random.Random(22)
+    cache = LabelCache('box', open_backend(str(tmp_path / location)), capacity=4)
+    expected = {}
+    names = [f"image{i}" for i in range(12)]
+    for step in range(500):
+        name = rng.choice(names)
+        action = rng.randrange(5)
+        if action == 0:
+            labels = [box(rng.randrange(4), rng.random()) for _ in range(rng.randrange(3))]
+            cache[name] = labels
+            expected[name] = labels
+        elif action == 1:
+            labels = cache.labels_for(name)
+            labels.append(box(step % 4, rng.random()))
+            cache.mark_modified(name)
+            expected[name] = expected.get(name, []) + [labels[-1]]
+        elif action == 2:
+            cache.pin(rng.choice(names + [None]))
+        elif action == 3:
+            cache.flush()
+        assert list(cache.get(name, [])) == expected.get(name, [])
+    cache.flush()
+
+    reopened = LabelCache('box', open_backend(str(tmp_path / location)))
+    assert {name: list(reopened[name]) for name in reopened} == expected
@@ -0,0 +1,112 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 15:20
+# @Author :Pang
+# @File :  test_label_store.py
+# @Description : ImageLabels parses label files like the former line by line parsers and writes the same text back
+
+
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import label_io
+from tools.label_store import ImageLabels
+
+
+def parse_lines(label_type, text):
+    """The per-line parsers label_io had before ImageLabels."""
+    labels = []
+    for line in text.splitlines():
+        parts = line.strip().split()
+        if label_type == 'point' and len(parts) == 3:
+            class_id, x, y = map(float, parts)
+            labels.append({'class_id': int(class_id), 'point': (x, y)})
+        elif label_type == 'box' and len(parts) == 5:
+            class_id, x_center, y_center, width, height = map(float, parts)
+            labels.append({'class_id': int(class_id), 'bbox': [x_center, y_center, width, height]})
+        elif label_type == 'polygon' and len(parts) >= 3 and len(parts) % 2 == 1:
+            points = list(map(float, parts[1:]))
+            labels.append({'class_id': int(parts[0]),
+                           'polygon': [(points[i], points[i + 1]) for i in range(0, len(points), 2)]})
+    return labels
+
+
+# Box, point and polygon lines mixed with blank and malformed lines, each type keeps the lines it can parse
+MIXED_TEXT = """0 0.5 0.5 0.2 0.1
+1 0.25 0.75
+
+2 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2
+3 0.3
+  4 0.125 0.375 0.5 0.625
+5 0.1 0.2 0.3 0.4 0.5 0.6
+6 1e-3 2.5e-1
+"""
+
+
+@pytest.mark.parametrize('label_type', ['box', 'point', 'polygon'])
+@pytest.mark.parametrize('text', ['', '\n\n', MIXED_TEXT], ids=['empty', 'blank', 'mixed'])
+def test_parse_matches_line_parser(label_type, text):
+    labels = ImageLabels.parse(label_type, text)
+    assert list(labels) == parse_lines(label_type, text)
+    if label_type == 'polygon':
+        assert labels.offsets[-1] == len(labels.coords)
+
+
+@pytest.mark.parametrize('label_type', ['box', 'point', 'polygon'])
+@pytest.mark.parametrize('text', ['', MIXED_TEXT], ids=['empty', 'mixed'])
+def test_lines_round_trip(label_type, text):
+    labels = ImageLabels.parse(label_type, text)
+    lines = labels.to_lines()
+    assert lines == [label_io.FORMATTERS[label_type](label) for label in parse_lines(label_type, text)]
+
+    again = ImageLabels.parse(label_type, '\n'.join(lines))
+    assert np.array_equal(again.class_ids, labels.class_ids)
+    assert np.array_equal(again.coords, labels.coords)
+    assert again.to_lines() == lines
+
+
+def test_file_round_trip(tmp_path):
+    polygons = ImageLabels.parse('polygon', MIXED_TEXT)
+    label_io.write_labels(str(tmp_path), 'polygon', 'image', polygons)
+    assert list(label_io.read_labels(str(tmp_path), 'polygon', 'image')) == list(polygons)
+
+    label_io.write_labels(str(tmp_path), 'box', 'empty', ImageLabels('box'))
+    assert len(label_io.read_labels(str(tmp_path), 'box', 'empty')) == 0
+    assert len(label_io.read_labels(str(tmp_path), 'box', 'missing')) == 0
+
+
+def test_polygon_edits_match_list():
+    rng = random.Random(0)
+
+    def random_polygon():
+        return {'class_id': rng.randrange(5),
+                'polygon': [(rng.random(), rng.random()) for _ in range(rng.randrange(0, 6))]}
+
+    polygons = ImageLabels('polygon')
+    expected = []
+    for _ in range(300):
+        action = rng.randrange(4)
+        if action == 0 or not expected:
+            label = random_polygon()
+            polygons.append(label)
+            expected.append(label)
+        elif action == 1:
+            index = rng.randrange(len(expected))
+            del polygons[index]
+            del expected[index]
+        elif action == 2:
+            index = rng.randrange(len(expected))
+            polygons[index] = expected[index] = random_polygon()
+        else:
+            index = rng.randrange(len(expected) + 1)
+            label = random_polygon()
+            polygons.insert(index, label)
+            expected.insert(index, label)
+    assert list(polygons) == expected
+    assert polygons.to_lines() == [label_io.format_polygon_label(label) for label in expected]
+    assert polygons.subset(range(len(polygons) - 1, -1, -1)).to_lines() == polygons.to_lines()[::-1]
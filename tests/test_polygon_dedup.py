@@ -0,0 +1,94 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 15:40
+# @Author :Pang
+# @File :  test_polygon_dedup.py
+# @Description : The bounding-box prefiltered de-duplication decides like the former pairwise calculate_iou loop
+
+
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('PIL')
+pytest.importorskip('shapely')
+
+from tools.sam_processor import SAMProcessor, calculate_iou
+
+
+def pairwise_merge(existing_labels, new_labels, iou_threshold):
+    """The loop SAMProcessor.process ran before PolygonDeduplicator: replace the first match, else append."""
+    updated_labels = list(existing_labels)
+    for new_label in new_labels:
+        is_duplicate = False
+        for i, existing_label in enumerate(updated_labels):
+            if calculate_iou(new_label, existing_label) > iou_threshold:
+                updated_labels[i] = new_label
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            updated_labels.append(new_label)
+    return updated_labels
+
+
+def random_label(rng, near=None):
+    """
+    A random simple (star-shaped) polygon label string, the shape of SAM mask contours; near gives
+    a shifted and scaled copy of that label, which stays simple.
+    """
+    if near is not None:
+        parts = near.split()
+        coords = list(map(float, parts[1:]))
+        xs, ys = coords[0::2], coords[1::2]
+        cx, cy = sum(xs) / len(xs), sum(ys) / len(ys)
+        spread = rng.choice([0.01, 0.1])
+        dx, dy = rng.uniform(-spread, spread) / 2, rng.uniform(-spread, spread) / 2
+        scale = rng.uniform(1 - 2 * spread, 1 + 2 * spread)
+        vertices = [(cx + dx + (x - cx) * scale, cy + dy + (y - cy) * scale) for x, y in zip(xs, ys)]
+        class_id = parts[0]
+    else:
+        cx, cy, size = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9), rng.uniform(0.02, 0.2)
+        # Every angular gap below pi, so the polygon winds once around its centre without crossing itself
+        count = rng.randrange(4, 12)
+        angles = [2 * math.pi * (i + rng.uniform(0, 0.5)) / count for i in range(count)]
+        radii = [size * rng.uniform(0.3, 1) for _ in angles]
+        vertices = [(cx + math.cos(angle) * radius, cy + math.sin(angle) * radius)
+                    for angle, radius in zip(angles, radii)]
+        class_id = rng.randrange(3)
+    return f"{class_id} {' '.join(f'{x} {y}' for x, y in vertices)}"
+
+
+def merged(existing_labels, new_labels, iou_threshold):
+    replaced, added = SAMProcessor.merge_polygons([SAMProcessor.to_polygon_label(label)['polygon']
+                                                   for label in existing_labels], new_labels, iou_threshold)
+    updated_labels = list(existing_labels)
+    for index, label in replaced:
+        updated_labels[index] = label
+    return updated_labels + added
+
+
+@pytest.mark.parametrize('iou_threshold', [-1, 0.0, 0.3, 0.6, 0.9])
+def test_matches_pairwise_loop(iou_threshold):
+    rng = random.Random(13)
+    for _ in range(40):
+        existing_labels = [random_label(rng) for _ in range(rng.randrange(0, 15))]
+        new_labels = []
+        for _ in range(rng.randrange(1, 15)):
+            pool = existing_labels + new_labels
+            near = rng.choice(pool) if pool and rng.random() < 0.5 else None
+            new_labels.append(random_label(rng, near))
+        assert merged(existing_labels, new_labels, iou_threshold) == \
+            pairwise_merge(existing_labels, new_labels, iou_threshold)
+
+
+def test_duplicate_of_added_polygon_replaces_it():
+    square = "0 0.1 0.1 0.5 0.1 0.5 0.5 0.1 0.5"
+    shifted = "1 0.11 0.1 0.51 0.1 0.51 0.5 0.11 0.5"
+    far = "2 0.7 0.7 0.9 0.7 0.9 0.9"
+    replaced, added = SAMProcessor.merge_polygons([], [square, far, shifted], 0.6)
+    assert replaced == []
+    assert added == [shifted, far]
@@ -0,0 +1,117 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 10:30
+# @Author :Pang
+# @File :  test_sam_predict.py
+# @Description : SAMProcessor.predict runs the SAM image encoder once per image, and not at all on a cache hit
+
+
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('PIL')
+pytest.importorskip('shapely')
+
+from tools import sam_processor
+from tools.embedding_cache import EmbeddingCache
+from tools.sam_processor import SAMProcessor
+
+
+class FakeModel:
+    def __init__(self):
+        self.imgsz = None
+
+    def set_imgsz(self, imgsz):
+        self.imgsz = imgsz
+
+
+class FakePredictor:
+    """
+    Follows the ultralytics SAM2 Predictor: every setup_source applies args.imgsz and resets the
+    image and its features, encoding sizes the model for that imgsz.
+    """
+
+    def __init__(self):
+        self.args = SimpleNamespace(conf=0.25, imgsz=1024)
+        self.model = FakeModel()
+        self.imgsz = None
+        self.features = None
+        self.source = None
+        self.encoder_calls = 0
+        self.prompts = []
+        self.decoded_with = []
+
+    def image_encoder(self, source):
+        self.model.set_imgsz(self.imgsz)
+        self.encoder_calls += 1
+        return {'image': source}
+
+    def setup_source(self, source):
+        if source is None:
+            return
+        self.reset_image()
+        self.source = source
+        self.imgsz = [self.args.imgsz, self.args.imgsz]
+
+    def reset_image(self):
+        self.features = None
+        self.source = None
+
+    def set_image(self, source):
+        self.setup_source(source)
+        self.features = self.image_encoder(source)
+
+    def __call__(self, source=None, bboxes=None, points=None):
+        self.setup_source(source)
+        if self.features is None:
+            self.features = self.image_encoder(self.source)
+        self.prompts.append((bboxes, points))
+        self.decoded_with.append((vars(self.args).copy(), self.imgsz, self.model.imgsz))
+        return [self.features]
+
+
+@pytest.fixture
+def predictor(monkeypatch):
+    predictor = FakePredictor()
+    # A model that already has its predictor, get_predictor only applies conf and imgsz to it
+    monkeypatch.setattr(sam_processor.model_registry, 'get', lambda *args: SimpleNamespace(predictor=predictor))
+    # Memory only, nothing is spilled to disk
+    monkeypatch.setattr(sam_processor, 'embedding_cache', EmbeddingCache(disk_max_mb=0))
+    return predictor
+
+
+def test_cache_miss_encodes_once(predictor):
+    boxes = np.array([[1, 2, 3, 4]])
+    result = SAMProcessor.predict('image.jpg', 'hash', boxes, None, 'sam.pt', imgsz=640)
+    assert predictor.encoder_calls == 1
+    assert result == [{'image': 'image.jpg'}]
+    assert predictor.prompts[0][0] is boxes
+
+
+def test_cache_hit_skips_encoder(predictor):
+    SAMProcessor.predict('image.jpg', 'hash', None, np.array([[5, 6]]), 'sam.pt', imgsz=640)
+    result = SAMProcessor.predict('image.jpg', 'hash', None, np.array([[7, 8]]), 'sam.pt', imgsz=640)
+    assert predictor.encoder_calls == 1
+    assert result == [{'image': 'image.jpg'}]
+
+
+def test_other_imgsz_is_encoded_again(predictor):
+    SAMProcessor.predict('image.jpg', 'hash', None, np.array([[5, 6]]), 'sam.pt', imgsz=640)
+    SAMProcessor.predict('image.jpg', 'hash', None, np.array([[5, 6]]), 'sam.pt', imgsz=1024)
+    assert predictor.encoder_calls == 2
+
+
+def test_hit_decodes_like_a_miss_after_other_imgsz(predictor):
+    points = np.array([[5, 6]])
+    SAMProcessor.predict('image.jpg', 'hash', None, points, 'sam.pt', imgsz=640)
+    miss = predictor.decoded_with[-1]
+    SAMProcessor.predict('image.jpg', 'hash', None, points, 'sam.pt', imgsz=1024)
+    SAMProcessor.predict('image.jpg', 'hash', None, points, 'sam.pt', imgsz=640)
+    assert predictor.encoder_calls == 2
+    assert predictor.decoded_with[-1] == miss
+    assert miss[2] == [640, 640]
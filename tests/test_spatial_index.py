@@ -0,0 +1,117 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 16:05
+# @Author :Pang
+# @File :  test_spatial_index.py
+# @Description : LabelIndex hit-testing finds the same label as a scan over every label
+
+
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.label_store import ImageLabels
+from tools.spatial_index import LabelIndex
+
+
+SCALE = (800, 600)
+
+
+def inside_polygon(x, y, polygon):
+    # Even-odd ray casting, one edge at a time
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def scan_hit(label_type, labels, x, y, visible, threshold=5):
+    """What ImageView did before the index: the first visible label under (x, y) in list order."""
+    for i, label in enumerate(labels):
+        if i not in visible:
+            continue
+        if label_type == 'box':
+            x_center, y_center, width, height = label['bbox']
+            if (x_center - width / 2 <= x <= x_center + width / 2 and
+                    y_center - height / 2 <= y <= y_center + height / 2):
+                return i
+        elif label_type == 'point':
+            dx, dy = (label['point'][0] - x) * SCALE[0], (label['point'][1] - y) * SCALE[1]
+            if dx ** 2 + dy ** 2 <= threshold ** 2:
+                return i
+        elif label['polygon'] and inside_polygon(x, y, label['polygon']):
+            return i
+    return None
+
+
+def random_label(rng, label_type):
+    # Some labels reach over the image border, where the grid clamps them into the edge cells
+    x, y, size = rng.uniform(-0.1, 1.1), rng.uniform(-0.1, 1.1), rng.uniform(0.001, 0.08)
+    class_id = rng.randrange(3)
+    if label_type == 'box':
+        return {'class_id': class_id, 'bbox': [x, y, size, rng.uniform(0.001, 0.08)]}
+    if label_type == 'point':
+        return {'class_id': class_id, 'point': (x, y)}
+    if rng.random() < 0.05:
+        return {'class_id': class_id, 'polygon': []}
+    count = rng.randrange(3, 10)
+    angles = [2 * math.pi * (i + rng.uniform(0, 0.5)) / count for i in range(count)]
+    if rng.random() < 0.3:
+        # Self-intersecting outlines, even-odd decides what is inside those too
+        rng.shuffle(angles)
+    radii = [size * rng.uniform(0.2, 1) for _ in angles]
+    return {'class_id': class_id, 'polygon': [(x + math.cos(angle) * radius, y + math.sin(angle) * radius)
+                                              for angle, radius in zip(angles, radii)]}
+
+
+def query_points(rng, label_type, labels, count):
+    """Random points, plus points on or right next to labels so that most queries hit something."""
+    points = [(rng.uniform(-0.05, 1.05), rng.uniform(-0.05, 1.05)) for _ in range(count)]
+    bounds = ImageLabels.from_labels(label_type, labels).bounds()
+    for min_x, min_y, max_x, max_y in rng.sample(bounds.tolist(), min(count, len(labels))):
+        if math.isnan(min_x):
+            continue
+        points.append((rng.uniform(min_x, max_x) + rng.uniform(-0.004, 0.004),
+                       rng.uniform(min_y, max_y) + rng.uniform(-0.004, 0.004)))
+    return points
+
+
+@pytest.mark.parametrize('label_type', ['box', 'point', 'polygon'])
+def test_hit_matches_scan(label_type):
+    rng = random.Random(14)
+    labels = [random_label(rng, label_type) for _ in range(1000)]
+    index = LabelIndex(label_type, labels)
+    for _ in range(6):
+        visible = set(rng.sample(range(len(labels)), len(labels) * 3 // 4))
+        for x, y in query_points(rng, label_type, labels, 200):
+            assert index.hit(x, y, SCALE, visible) == scan_hit(label_type, labels, x, y, visible)
+        # Later labels move down on removal, appended ones go to the end, like the label lists
+        for _ in range(20):
+            position = rng.randrange(len(labels))
+            del labels[position]
+            index.remove(position)
+        for _ in range(20):
+            label = random_label(rng, label_type)
+            labels.append(label)
+            index.append(label)
+        assert len(index) == len(labels)
+
+
+def test_candidates_cover_overlapping_boxes():
+    rng = random.Random(7)
+    labels = ImageLabels.from_labels('box', [random_label(rng, 'box') for _ in range(500)])
+    index = LabelIndex('box', labels)
+    bounds = labels.bounds()
+    for _ in range(100):
+        min_x, min_y = rng.uniform(-0.1, 1), rng.uniform(-0.1, 1)
+        max_x, max_y = min_x + rng.uniform(0, 0.3), min_y + rng.uniform(0, 0.3)
+        overlapping = [i for i, (x0, y0, x1, y1) in enumerate(bounds.tolist())
+                       if x0 <= max_x and min_x <= x1 and y0 <= max_y and min_y <= y1]
+        candidates = index.candidates(min_x, min_y, max_x, max_y)
+        assert candidates == sorted(candidates)
+        assert set(overlapping) <= set(candidates)
@@ -0,0 +1,66 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 17:40
+# @Author :Pang
+# @File :  test_yolo_tiled.py
+# @Description : Tiled YOLO detection cuts tiles at, and runs the model with, a multiple of the model stride
+
+
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Image = pytest.importorskip('PIL.Image')
+
+from tools import yolo_processor
+from tools.result_cache import ResultCache
+from tools.yolo_processor import YOLOProcessor
+
+
+class FakeBoxes:
+    def __init__(self, data):
+        self.data = SimpleNamespace(cpu=lambda: SimpleNamespace(numpy=lambda: data))
+
+
+class FakeYOLO:
+    """Records the imgsz and tile shapes it is called with and finds one box in the tile corner."""
+
+    def __init__(self, stride):
+        self.model = SimpleNamespace(stride=[8, 16, stride])
+        self.calls = []
+
+    def __call__(self, images, imgsz=640, **kwargs):
+        self.calls.append((imgsz, [image.shape for image in images]))
+        return [SimpleNamespace(boxes=FakeBoxes(np.array([[1, 1, 5, 5, 0.9, 0]], dtype=np.float32)))
+                for _ in images]
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    def make(stride):
+        model = FakeYOLO(stride)
+        monkeypatch.setattr(yolo_processor.model_registry, 'get', lambda *args: model)
+        # Nothing is cached, every call runs the model
+        monkeypatch.setattr(yolo_processor, 'result_cache', ResultCache(max_mb=0))
+        monkeypatch.setattr(YOLOProcessor, 'cache_key', lambda self, image_path, **params: None)
+        return YOLOProcessor('yolo.pt')
+    return make
+
+
+@pytest.mark.parametrize('stride, tile_size, expected', [(32, 1000, 1024), (32, 640, 640), (64, 600, 640)])
+def test_tile_size_is_a_stride_multiple(tmp_path, processor, stride, tile_size, expected):
+    image_path = str(tmp_path / 'image.png')
+    Image.fromarray(np.zeros((1500, 2100, 3), dtype=np.uint8)).save(image_path)
+    yolo = processor(stride)
+
+    boxes, size = yolo.process_image_tiled(image_path, tile_size=tile_size, overlap=128, batch_size=4)
+    assert size == (2100, 1500)
+    assert {imgsz for imgsz, _ in yolo.model.calls} == {expected}
+    shapes = [shape for _, batch in yolo.model.calls for shape in batch]
+    assert max(shape[0] for shape in shapes) == max(shape[1] for shape in shapes) == expected
+    # One box per tile, none of them overlap across tiles
+    assert len(boxes) == len(shapes)
@@ -0,0 +1,148 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 09:58
+# @Author :Pang
+# @File :  disk_cache.py
+# @Description : Size-bounded on-disk cache and image content hashing
+
+
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_ROOT = os.environ.get('SMARTTAGGER_CACHE_DIR',
+                                    os.path.join(os.path.expanduser('~'), '.cache', 'smarttagger'))
+
+# Mode of new files, the umask can not be read without changing it process-wide
+DEFAULT_FILE_MODE = 0o644
+
+
+def target_mode(path):
+    """Permission bits for a file written over path: those of the existing file, else DEFAULT_FILE_MODE."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return DEFAULT_FILE_MODE
+
+
+# {absolute path: (mtime_ns, size, digest)}, least recently used first
+_hash_memo = OrderedDict()
+_hash_lock = threading.Lock()
+HASH_MEMO_ENTRIES = 4096
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-1 of the file content, memoized per path while its mtime and size stay the same."""
+    stat = os.stat(path)
+    path = os.path.abspath(path)
+    with _hash_lock:
+        memo = _hash_memo.get(path)
+        if memo is not None and memo[:2] == (stat.st_mtime_ns, stat.st_size):
+            _hash_memo.move_to_end(path)
+            return memo[2]
+
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    digest = sha1.hexdigest()
+
+    with _hash_lock:
+        # A rewritten file replaces its old entry
+        _hash_memo[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        _hash_memo.move_to_end(path)
+        while len(_hash_memo) > HASH_MEMO_ENTRIES:
+            _hash_memo.popitem(last=False)
+    return digest
+
+
+def make_key(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """Stores one file per key and evicts the least recently used files above max_bytes."""
+
+    def __init__(self, cache_dir, max_bytes, suffix='.bin'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._scan())
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    def get_path(self, key):
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        # Touch the entry so that eviction keeps it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, writer):
+        """Call writer(file_object) to produce the entry, then move it in place atomically."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer(f)
+            # mkstemp creates the file 0600, which the rename would keep
+            os.chmod(tmp_path, target_mode(path))
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._size += os.path.getsize(path) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def remove(self, key):
+        path = self.path_for(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                # Already gone, e.g. evicted by another process sharing the cache
+                return
+            self._size -= size
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._scan())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
@@ -0,0 +1,95 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 10:20
+# @Author :Pang
+# @File :  embedding_cache.py
+# @Description : Two-tier (RAM + disk) cache of SAM image encoder features
+
+
+import os
+import threading
+from collections import OrderedDict
+
+from tools.disk_cache import DiskCache, DEFAULT_CACHE_ROOT, make_key
+
+
+def map_tensors(obj, fn):
+    import torch
+
+    if isinstance(obj, torch.Tensor):
+        return fn(obj)
+    if isinstance(obj, dict):
+        return {k: map_tensors(v, fn) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(map_tensors(v, fn) for v in obj)
+    return obj
+
+
+class EmbeddingCache:
+    """Keeps the hottest image embeddings in RAM and spills colder ones to a size-bounded disk store."""
+
+    def __init__(self, memory_entries=8, disk_dir=None, disk_max_mb=2048):
+        self.memory_entries = memory_entries
+        self.disk_dir = disk_dir or os.path.join(DEFAULT_CACHE_ROOT, 'embeddings')
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+        self._memory = OrderedDict()
+        self._disk = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_hash, model_path, imgsz):
+        return make_key(image_hash, os.path.abspath(str(model_path)), imgsz)
+
+    @property
+    def disk(self):
+        if self._disk is None and self.disk_max_bytes > 0:
+            self._disk = DiskCache(self.disk_dir, self.disk_max_bytes, suffix='.pt')
+        return self._disk
+
+    def get(self, key, device=None):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self.disk.get_path(key) if self.disk else None
+        if path is None:
+            return None
+        # torch is only needed once there is something to load, so importing this module stays cheap
+        import torch
+        try:
+            # Entries are plain tensors (in dicts / lists), nothing else is unpickled from the shared cache
+            features = torch.load(path, map_location=device or 'cpu', weights_only=True)
+        except Exception as e:
+            # Truncated, corrupted or foreign entry: drop it, the features are computed again
+            print(f"Dropping unreadable cached embedding {path}: {e}")
+            self.disk.remove(key)
+            return None
+
+        self.put(key, features)
+        return features
+
+    def put(self, key, features):
+        spilled = []
+        with self._lock:
+            self._memory[key] = features
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                spilled.append(self._memory.popitem(last=False))
+
+        for spilled_key, spilled_features in spilled:
+            self._spill(spilled_key, spilled_features)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _spill(self, key, features):
+        if self.disk is None:
+            return
+        import torch
+
+        cpu_features = map_tensors(features, lambda t: t.detach().cpu())
+        self.disk.put(key, lambda f: torch.save(cpu_features, f))
+
+
+embedding_cache = EmbeddingCache()
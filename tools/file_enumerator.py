@@ -0,0 +1,63 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 23:55
+# @Author :Pang
+# @File :  file_enumerator.py
+# @Description : Stream the image files of a folder tree in batches, in os.walk order, with os.scandir
+
+
+import os
+import time
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def iter_image_files(folder, extensions=IMAGE_EXTENSIONS, stop=None):
+    """Image paths under folder: the files of a directory first, then its subdirectories (like os.walk)."""
+    folders = [folder]
+    while folders:
+        if stop is not None and stop.is_set():
+            return
+        current = folders.pop()
+        subfolders = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            # Linked folders are listed but not entered, as os.walk does
+                            if not entry.is_symlink():
+                                subfolders.append(entry.path)
+                        elif entry.name.lower().endswith(extensions):
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Failed to list {current}: {e}")
+        # Popped from the end, so reversed to visit them in listing order
+        folders.extend(reversed(subfolders))
+
+
+def enumerate_images(folder, on_batch, stop=None, first_batch=64, batch_size=4096, interval=0.1):
+    """
+    Call on_batch(paths) with the image paths under folder as they are found, returns the count.
+
+    The first batch is small so the first images show up at once, later batches are sent
+    every `interval` seconds or `batch_size` paths.
+    """
+    batch = []
+    limit = first_batch
+    last_sent = time.monotonic()
+    count = 0
+    for path in iter_image_files(folder, stop=stop):
+        batch.append(path)
+        if len(batch) >= limit or time.monotonic() - last_sent >= interval:
+            on_batch(batch)
+            count += len(batch)
+            batch = []
+            limit = batch_size
+            last_sent = time.monotonic()
+    if batch and not (stop is not None and stop.is_set()):
+        on_batch(batch)
+        count += len(batch)
+    return count
@@ -0,0 +1,218 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 22:50
+# @Author :Pang
+# @File :  label_backend.py
+# @Description : Label storage backends, the YOLO txt folder layout or a single SQLite project file
+
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from tools import label_io
+from tools.label_loader import LABEL_TYPES, scan_label_folder
+from tools.label_store import ImageLabels
+
+
+DB_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+class FolderBackend:
+    """classes.txt plus one YOLO txt file per image in the Box / Polygon / Point folders."""
+
+    def __init__(self, label_folder):
+        self.location = label_folder
+        # (mtime_ns, size) of the files written here, so a watcher can tell our writes from outside changes
+        self._written = {}
+        self._written_lock = threading.Lock()
+
+    def scan(self):
+        """{label type: image names that have labels}."""
+        return scan_label_folder(self.location)
+
+    def exists(self, label_type, image_name):
+        return os.path.exists(label_io.label_path(self.location, label_type, image_name))
+
+    def read(self, label_type, image_name):
+        """ImageLabels of the image, or None when it has no label file."""
+        path = label_io.label_path(self.location, label_type, image_name)
+        if not os.path.exists(path):
+            return None
+        return label_io.PARSERS[label_type](path)
+
+    def write(self, label_type, image_name, labels):
+        label_io.write_labels(self.location, label_type, image_name, labels)
+        self._record_write(label_io.label_path(self.location, label_type, image_name))
+
+    def write_many(self, items):
+        """Write (label type, image name, labels) items."""
+        for label_type, image_name, labels in items:
+            self.write(label_type, image_name, labels)
+
+    def read_class_names(self):
+        class_file_path = os.path.join(self.location, 'classes.txt')
+        return label_io.read_class_names(class_file_path) if os.path.exists(class_file_path) else None
+
+    def write_class_names(self, class_names):
+        class_file_path = os.path.join(self.location, 'classes.txt')
+        label_io.write_class_names(class_file_path, class_names)
+        self._record_write(class_file_path)
+
+    def is_own_write(self, path, stamp):
+        """True if the file at path, with (mtime_ns, size) stamp, is still exactly as this backend wrote it."""
+        with self._written_lock:
+            return self._written.pop(path, None) == stamp
+
+    def close(self):
+        """Nothing to release, the files are opened per read and write."""
+
+    def _record_write(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._written_lock:
+            self._written[path] = (stat.st_mtime_ns, stat.st_size)
+
+
+class SQLiteBackend:
+    """
+    Every label of a project and its class names in one SQLite file.
+
+    There is one row per (label type, image name) holding the ImageLabels arrays as raw
+    little-endian bytes, so reading an image is one primary key lookup and the stored
+    values are exactly the ones in memory. Each thread uses its own connection, close()
+    closes all of them.
+    """
+
+    def __init__(self, db_path):
+        self.location = db_path
+        self._local = threading.local()
+        # Every connection handed out, close() bumps the generation so threads open a new one afterwards
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._generation = 0
+        with self._connection() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS labels (
+                                      label_type TEXT NOT NULL,
+                                      image_name TEXT NOT NULL,
+                                      class_ids BLOB NOT NULL,
+                                      coords BLOB NOT NULL,
+                                      offsets BLOB,
+                                      PRIMARY KEY (label_type, image_name)) WITHOUT ROWID""")
+            connection.execute("CREATE TABLE IF NOT EXISTS classes (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.generation != self._generation:
+            # Only used by this thread, but close() may close it from another one
+            connection = sqlite3.connect(self.location, timeout=30, check_same_thread=False)
+            # Readers on other threads are not blocked while one thread writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connections_lock:
+                self._connections.append(connection)
+                self._local.generation = self._generation
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close the connections of every thread, releasing their WAL locks. Using the backend again reconnects."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for connection in connections:
+            connection.close()
+
+    def scan(self):
+        names = {label_type: set() for label_type in LABEL_TYPES}
+        for label_type, image_name in self._connection().execute("SELECT label_type, image_name FROM labels"):
+            names.setdefault(label_type, set()).add(image_name)
+        return names
+
+    def exists(self, label_type, image_name):
+        row = self._connection().execute("SELECT 1 FROM labels WHERE label_type = ? AND image_name = ?",
+                                         (label_type, image_name)).fetchone()
+        return row is not None
+
+    def read(self, label_type, image_name):
+        row = self._connection().execute(
+            "SELECT class_ids, coords, offsets FROM labels WHERE label_type = ? AND image_name = ?",
+            (label_type, image_name)).fetchone()
+        if row is None:
+            return None
+        class_ids, coords, offsets = row
+        # astype copies, frombuffer arrays are read-only and labels are edited in place
+        return ImageLabels(label_type, np.frombuffer(class_ids, dtype='<i8').astype(np.int64),
+                           np.frombuffer(coords, dtype='<f8').astype(np.float64),
+                           np.frombuffer(offsets, dtype='<i8').astype(np.int64) if offsets is not None else None)
+
+    def write(self, label_type, image_name, labels):
+        self.write_many([(label_type, image_name, labels)])
+
+    def write_many(self, items):
+        """Write (label type, image name, labels) items in one transaction."""
+        rows = []
+        for label_type, image_name, labels in items:
+            labels = ImageLabels.from_labels(label_type, labels)
+            rows.append((label_type, image_name, labels.class_ids.astype('<i8').tobytes(),
+                         labels.coords.astype('<f8').tobytes(),
+                         labels.offsets.astype('<i8').tobytes() if labels.offsets is not None else None))
+        with self._connection() as connection:
+            connection.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?)", rows)
+
+    def read_class_names(self):
+        rows = self._connection().execute("SELECT id, name FROM classes ORDER BY id").fetchall()
+        return dict(rows) if rows else None
+
+    def write_class_names(self, class_names):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM classes")
+            connection.executemany("INSERT INTO classes VALUES (?, ?)", sorted(class_names.items()))
+
+
+def open_backend(location):
+    """Backend for a label folder or a project database file (by suffix); backends are returned as they are."""
+    if isinstance(location, (FolderBackend, SQLiteBackend)):
+        return location
+    if str(location).lower().endswith(DB_SUFFIXES):
+        return SQLiteBackend(location)
+    return FolderBackend(location)
+
+
+def copy_labels(source, target, workers=8, batch_size=256, progress=None):
+    """
+    Copy every label and the class names from one backend (or location) to another.
+
+    Images are read on a thread pool and written in batches, progress(done, total) is
+    called after each batch. Returns the number of label sets copied. Backends opened here
+    from a location are closed again, backends passed in are left open.
+    """
+    backends = [open_backend(location) for location in (source, target)]
+    opened = [backend for location, backend in zip((source, target), backends) if backend is not location]
+    source, target = backends
+    try:
+        class_names = source.read_class_names()
+        if class_names is not None:
+            target.write_class_names(class_names)
+
+        items = [(label_type, image_name) for label_type, names in source.scan().items()
+                 for image_name in sorted(names)]
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                labels = pool.map(lambda item: source.read(*item), batch)
+                target.write_many((label_type, image_name, image_labels)
+                                  for (label_type, image_name), image_labels in zip(batch, labels)
+                                  if image_labels is not None)
+                done += len(batch)
+                if progress:
+                    progress(done, len(items))
+        return len(items)
+    finally:
+        for backend in opened:
+            backend.close()
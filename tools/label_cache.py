@@ -0,0 +1,212 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 14:05
+# @Author :Pang
+# @File :  label_cache.py
+# @Description : Lazily loaded, LRU bounded labels of one type keyed by image name
+
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from tools.label_backend import open_backend
+from tools.label_store import ImageLabels
+
+
+DEFAULT_CAPACITY = 512
+
+
+class LabelCache(MutableMapping):
+    """
+    Dict-like view of one label type (box / polygon / point) of a label folder or a
+    project database (see label_backend).
+
+    Labels are read the first time an image is accessed, at most `capacity` images
+    are kept in memory and modified entries are written back before eviction or on
+    flush(), unmodified labels are never rewritten.
+    Entries are ImageLabels (plain lists of label dicts are converted on assignment) and
+    are mutated in place, so callers must report in-place edits with mark_modified().
+    """
+
+    def __init__(self, label_type, label_folder=None, capacity=DEFAULT_CAPACITY):
+        self.label_type = label_type
+        self.backend = open_backend(label_folder) if label_folder else None
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.modified = set()
+        self.pinned = set()
+        # Image names that have labels, from a backend scan; None until a scan was set
+        self.index = None
+
+    def set_folder(self, label_folder):
+        """
+        Switch to another label folder, database file or backend. Unsaved entries are written
+        to the current backend first (call clear() before to discard them), nothing of the old
+        source is kept, so it can never be written into the new one.
+        """
+        self.flush()
+        self.backend = open_backend(label_folder) if label_folder else None
+        self.index = None
+        self.clear()
+
+    def set_index(self, image_names):
+        """Names with labels, so lookups of other names no longer touch the file system."""
+        self.index = set(image_names)
+
+    def __getitem__(self, image_name):
+        if image_name in self._entries:
+            self._entries.move_to_end(image_name)
+            return self._entries[image_name]
+
+        if self.backend is None or (self.index is not None and image_name not in self.index):
+            raise KeyError(image_name)
+        labels = self.backend.read(self.label_type, image_name)
+        if labels is None:
+            raise KeyError(image_name)
+
+        self._entries[image_name] = labels
+        self._evict()
+        return labels
+
+    def labels_for(self, image_name):
+        """
+        Labels of an image. Without a label file an empty ImageLabels is kept in memory (and
+        not written), so views and later edits share the same store.
+        """
+        try:
+            return self[image_name]
+        except KeyError:
+            labels = self._entries[image_name] = ImageLabels(self.label_type)
+            self._evict()
+            return labels
+
+    def __setitem__(self, image_name, labels):
+        self._entries[image_name] = ImageLabels.from_labels(self.label_type, labels)
+        self._entries.move_to_end(image_name)
+        self.modified.add(image_name)
+        self._evict()
+
+    def __delitem__(self, image_name):
+        # Only forgets the in-memory entry, label files are never deleted from here
+        if image_name not in self._entries:
+            raise KeyError(image_name)
+        del self._entries[image_name]
+        self.modified.discard(image_name)
+
+    def __contains__(self, image_name):
+        if image_name in self._entries:
+            return True
+        if self.index is not None:
+            return image_name in self.index
+        return self.backend is not None and self.backend.exists(self.label_type, image_name)
+
+    def __iter__(self):
+        names = list(self._entries)
+        if self.index is not None:
+            stored = self.index
+        elif self.backend is not None:
+            stored = self.backend.scan().get(self.label_type, ())
+        else:
+            stored = ()
+        seen = set(names)
+        names.extend(image_name for image_name in stored if image_name not in seen)
+        return iter(names)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def clear(self):
+        self._entries.clear()
+        self.modified.clear()
+
+    def cached_items(self):
+        """Entries currently held in memory, without loading anything."""
+        return list(self._entries.items())
+
+    def preload(self, image_name, labels):
+        """
+        Keep labels parsed ahead of use. Entries already in memory win, and nothing is
+        evicted for a preload: returns False once the cache is full.
+        """
+        if len(self._entries) >= self.capacity:
+            return False
+        self._entries.setdefault(image_name, labels)
+        return True
+
+    def mark_modified(self, image_name):
+        if image_name in self._entries:
+            self.modified.add(image_name)
+
+    def pin(self, image_name):
+        """Keep the entry of the image being shown from being evicted."""
+        self.pinned = {image_name} if image_name else set()
+
+    def invalidate(self, image_name=None):
+        """Drop unmodified entries so they are read again on next access."""
+        names = [image_name] if image_name is not None else list(self._entries)
+        for name in names:
+            if name not in self.modified:
+                self._entries.pop(name, None)
+
+    def reload(self, image_name):
+        """Discard the in-memory entry and read the stored labels again."""
+        self._entries.pop(image_name, None)
+        self.modified.discard(image_name)
+        return self.get(image_name, ImageLabels(self.label_type))
+
+    def stored_changed(self, image_name, labels):
+        """
+        The stored labels of an image were changed outside this cache (labels is None when
+        deleted). Unsaved edits are kept. Returns True when the in-memory entry changed.
+        """
+        if self.index is not None:
+            if labels is None:
+                self.index.discard(image_name)
+            else:
+                self.index.add(image_name)
+        if image_name in self.modified:
+            print(f"{self.label_type} labels of {image_name} changed on disk, keeping the unsaved edits")
+            return False
+        if image_name not in self._entries:
+            if labels is not None:
+                self.preload(image_name, labels)
+            return False
+        if labels is None:
+            del self._entries[image_name]
+        else:
+            self._entries[image_name] = labels
+        return True
+
+    def write(self, image_name):
+        labels = self._entries.get(image_name)
+        if labels is None or self.backend is None:
+            return False
+        self.backend.write(self.label_type, image_name, labels)
+        self.modified.discard(image_name)
+        if self.index is not None:
+            self.index.add(image_name)
+        return True
+
+    def flush(self):
+        """Write every modified entry (one transaction for a database), returning the number of images written."""
+        image_names = [image_name for image_name in self.modified if image_name in self._entries]
+        if self.backend is None or not image_names:
+            return 0
+        self.backend.write_many((self.label_type, image_name, self._entries[image_name]) for image_name in image_names)
+        self.modified.difference_update(image_names)
+        if self.index is not None:
+            self.index.update(image_names)
+        return len(image_names)
+
+    def _evict(self):
+        if len(self._entries) <= self.capacity:
+            return
+        for image_name in list(self._entries):
+            if len(self._entries) <= self.capacity:
+                break
+            if image_name in self.pinned:
+                continue
+            if image_name in self.modified:
+                # Without a backend modified labels can not be written back, keep them
+                if not self.write(image_name):
+                    continue
+            del self._entries[image_name]
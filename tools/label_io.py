@@ -0,0 +1,103 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 12:15
+# @Author :Pang
+# @File :  label_io.py
+# @Description : Read / write YOLO format Box, Point and Polygon label files
+
+
+import os
+import tempfile
+
+from tools.disk_cache import target_mode
+from tools.label_store import ImageLabels
+
+
+LABEL_FOLDERS = {
+    'box': 'Box',
+    'polygon': 'Polygon',
+    'point': 'Point',
+}
+
+
+def label_path(label_folder, label_type, image_name):
+    return os.path.join(label_folder, LABEL_FOLDERS[label_type], f"{image_name}.txt")
+
+
+def parse_point_label(label_path):
+    return ImageLabels.read('point', label_path)
+
+
+def parse_box_label(label_path):
+    return ImageLabels.read('box', label_path)
+
+
+def parse_polygon_label(label_path):
+    return ImageLabels.read('polygon', label_path)
+
+
+def format_box_label(box):
+    return f"{box['class_id']} {' '.join(map(str, box['bbox']))}"
+
+
+def format_polygon_label(polygon):
+    coords = ' '.join(map(str, [coord for point in polygon['polygon'] for coord in point]))
+    return f"{polygon['class_id']} {coords}"
+
+
+def format_point_label(point):
+    return f"{point['class_id']} {point['point'][0]} {point['point'][1]}"
+
+
+PARSERS = {
+    'box': parse_box_label,
+    'polygon': parse_polygon_label,
+    'point': parse_point_label,
+}
+
+FORMATTERS = {
+    'box': format_box_label,
+    'polygon': format_polygon_label,
+    'point': format_point_label,
+}
+
+
+def read_labels(label_folder, label_type, image_name):
+    path = label_path(label_folder, label_type, image_name)
+    if not os.path.exists(path):
+        return ImageLabels(label_type)
+    return PARSERS[label_type](path)
+
+
+def write_lines(path, lines):
+    """Write lines to a temp file next to path and rename it over path, so readers never see a partial file."""
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for line in lines:
+                f.write(f"{line}\n")
+        # mkstemp creates the file 0600, which the rename would keep
+        os.chmod(tmp_path, target_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_labels(label_folder, label_type, image_name, labels):
+    if isinstance(labels, ImageLabels):
+        lines = labels.to_lines()
+    else:
+        lines = (FORMATTERS[label_type](label) for label in labels)
+    write_lines(label_path(label_folder, label_type, image_name), lines)
+
+
+def read_class_names(class_file_path):
+    with open(class_file_path, 'r') as f:
+        return {i: name.strip() for i, name in enumerate(f)}
+
+
+def write_class_names(class_file_path, class_names):
+    write_lines(class_file_path, (class_name for _, class_name in sorted(class_names.items())))
@@ -0,0 +1,122 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 22:15
+# @Author :Pang
+# @File :  label_loader.py
+# @Description : Label folder scan with os.scandir and concurrent parsing of the label files
+
+
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tools import label_io
+
+
+LABEL_TYPES = ('box', 'polygon', 'point')
+
+
+def scan_folder(folder):
+    """{image name: label file path} of the .txt files in folder, one directory read and no stat per file."""
+    files = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.endswith('.txt') and entry.is_file():
+                    files[entry.name[:-4]] = entry.path
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return files
+
+
+def snapshot_folder(folder, stat=True):
+    """
+    {image name: (inode, mtime_ns, size)} of the .txt files in folder, to find the files changed
+    since an earlier call. With stat=False {image name: inode} from the directory listing alone,
+    without a stat per file (except on Windows).
+    """
+    snapshot = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.endswith('.txt') and entry.is_file():
+                    try:
+                        if stat:
+                            info = entry.stat()
+                            snapshot[entry.name[:-4]] = (entry.inode(), info.st_mtime_ns, info.st_size)
+                        else:
+                            snapshot[entry.name[:-4]] = entry.inode()
+                    except FileNotFoundError:
+                        continue
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return snapshot
+
+
+def scan_label_folder(label_folder, label_types=LABEL_TYPES):
+    """{label type: {image name: path}}, the Box / Polygon / Point folders are listed concurrently."""
+    folders = [os.path.join(label_folder, label_io.LABEL_FOLDERS[label_type]) for label_type in label_types]
+    with ThreadPoolExecutor(max_workers=len(folders)) as pool:
+        return dict(zip(label_types, pool.map(scan_folder, folders)))
+
+
+class LabelLoader:
+    """
+    Scans a label backend (see label_backend) and reads its labels on a thread pool.
+
+    Reading a label folder is I/O bound on network storage, so many files are read at
+    once. Results are handed to on_batch in small batches as they complete, the callbacks
+    run on the worker thread that calls run().
+    """
+
+    def __init__(self, backend, workers=8, batch_size=64):
+        self.backend = backend
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def run(self, image_names=None, limit=None, on_index=None, on_batch=None, stop=None):
+        """
+        Scan, then read the labels of image_names (all images when None) in that order.
+
+        on_index(index) gets the scan result, on_batch(batch, done, total) lists of
+        (label type, image name, ImageLabels). At most `limit` label sets of each type are
+        read. Setting the `stop` event cancels the reads not started yet.
+        """
+        index = self.backend.scan()
+        if on_index:
+            on_index(index)
+
+        jobs = []
+        for label_type, stored in index.items():
+            names = [name for name in image_names if name in stored] if image_names is not None else list(stored)
+            jobs.extend((label_type, name) for name in names[:limit])
+        total = len(jobs)
+        if not total:
+            if on_batch:
+                on_batch([], 0, 0)
+            return
+
+        done = 0
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.backend.read, label_type, name): (label_type, name)
+                       for label_type, name in jobs}
+            for future in as_completed(futures):
+                if stop is not None and stop.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    return
+                label_type, name = futures[future]
+                done += 1
+                try:
+                    labels = future.result()
+                except (OSError, ValueError, sqlite3.Error) as e:
+                    print(f"Failed to read {label_type} labels of {name}: {e}")
+                    labels = None
+                # None when the labels were deleted after the scan
+                if labels is not None:
+                    batch.append((label_type, name, labels))
+                # The last call always comes with done == total, even when its batch is empty
+                if len(batch) >= self.batch_size or done == total:
+                    if on_batch:
+                        on_batch(batch, done, total)
+                    batch = []
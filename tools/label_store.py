@@ -0,0 +1,207 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 21:40
+# @Author :Pang
+# @File :  label_store.py
+# @Description : Columnar storage of the labels of one type of one image, with vectorized parsing
+
+
+from collections.abc import MutableSequence
+
+import numpy as np
+
+
+# Values per label after the class id, polygons have a variable number of (x, y) pairs
+COORD_WIDTHS = {
+    'box': 4,
+    'point': 2,
+    'polygon': 2,
+}
+
+
+def parse_text(label_type, text):
+    """(class ids, coords, offsets) of the valid lines of a label file, offsets is None except for polygons."""
+    rows = [line.split() for line in text.splitlines()]
+    counts = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    if label_type == 'polygon':
+        valid = (counts >= 3) & (counts % 2 == 1)
+    else:
+        valid = counts == COORD_WIDTHS[label_type] + 1
+    rows = [row for row, keep in zip(rows, valid.tolist()) if keep]
+    counts = counts[valid]
+    # One C level conversion of every token instead of float() per value
+    values = np.array([token for row in rows for token in row], dtype=np.float64)
+    starts = np.cumsum(counts) - counts
+    class_ids = values[starts].astype(np.int64)
+
+    if label_type == 'polygon':
+        is_class_id = np.zeros(len(values), dtype=bool)
+        is_class_id[starts] = True
+        offsets = np.concatenate([[0], np.cumsum((counts - 1) // 2)])
+        return class_ids, values[~is_class_id].reshape(-1, 2), offsets
+    return class_ids, np.delete(values, starts).reshape(-1, COORD_WIDTHS[label_type]), None
+
+
+class ImageLabels(MutableSequence):
+    """
+    Labels of one type (box / polygon / point) of one image as contiguous arrays.
+
+    class_ids is an (N,) array and coords holds the geometry: (N, 4) [x_center, y_center,
+    width, height] for boxes, (N, 2) for points, and every polygon vertex as (V, 2) for
+    polygons, label i using coords[offsets[i]:offsets[i + 1]].
+
+    [i] returns the label in the label_io dict format, built from the arrays. It is a copy,
+    so an edited label has to be assigned back. `version` changes on every edit.
+    """
+
+    def __init__(self, label_type, class_ids=(), coords=(), offsets=None):
+        self.label_type = label_type
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, COORD_WIDTHS[label_type])
+        if label_type == 'polygon':
+            self.offsets = np.asarray(offsets if offsets is not None else [0], dtype=np.int64)
+        else:
+            self.offsets = None
+        self.version = 0
+
+    @classmethod
+    def parse(cls, label_type, text):
+        return cls(label_type, *parse_text(label_type, text))
+
+    @classmethod
+    def read(cls, label_type, label_path):
+        with open(label_path, 'r') as f:
+            return cls.parse(label_type, f.read())
+
+    @classmethod
+    def from_labels(cls, label_type, labels):
+        """Build from an iterable of label dicts (or return labels if it already is an ImageLabels)."""
+        if isinstance(labels, ImageLabels):
+            return labels
+        store = cls(label_type)
+        store.extend(labels)
+        return store
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.label(i) for i in range(*index.indices(len(self)))]
+        return self.label(index)
+
+    def __setitem__(self, index, label):
+        index = self._position(index)
+        class_ids, coords, counts = self._columns([label])
+        self.class_ids[index] = class_ids[0]
+        if self.offsets is None:
+            self.coords[index] = coords[0]
+        else:
+            self._splice_vertices(index, index + 1, coords, counts)
+        self.version += 1
+
+    def __delitem__(self, index):
+        index = self._position(index)
+        self.class_ids = np.delete(self.class_ids, index)
+        if self.offsets is None:
+            self.coords = np.delete(self.coords, index, axis=0)
+        else:
+            self._splice_vertices(index, index + 1, self.coords[:0], [])
+        self.version += 1
+
+    def insert(self, index, label):
+        index = max(0, min(len(self), index + len(self) if index < 0 else index))
+        self._insert(index, *self._columns([label]))
+
+    def extend(self, labels):
+        """Append many labels with a single copy of the arrays."""
+        labels = list(labels)
+        if labels:
+            self._insert(len(self), *self._columns(labels))
+
+    def label(self, index):
+        index = self._position(index)
+        class_id = int(self.class_ids[index])
+        if self.label_type == 'box':
+            return {'class_id': class_id, 'bbox': self.coords[index].tolist()}
+        if self.label_type == 'point':
+            return {'class_id': class_id, 'point': tuple(self.coords[index].tolist())}
+        return {'class_id': class_id, 'polygon': [tuple(point) for point in self.vertices_of(index).tolist()]}
+
+    def vertices_of(self, index):
+        """(K, 2) view of the vertices of polygon `index`."""
+        return self.coords[self.offsets[index]:self.offsets[index + 1]]
+
+    def subset(self, indices):
+        """New ImageLabels with the labels at indices, in that order."""
+        indices = np.asarray(list(indices), dtype=np.int64)
+        if self.offsets is None:
+            return ImageLabels(self.label_type, self.class_ids[indices], self.coords[indices])
+        polygons = [self.vertices_of(i) for i in indices]
+        counts = [len(coords) for coords in polygons]
+        coords = np.concatenate(polygons) if polygons else self.coords[:0]
+        return ImageLabels(self.label_type, self.class_ids[indices], coords, np.concatenate([[0], np.cumsum(counts)]))
+
+    def copy(self):
+        return ImageLabels(self.label_type, self.class_ids.copy(), self.coords.copy(),
+                           None if self.offsets is None else self.offsets.copy())
+
+    def bounds(self):
+        """(N, 4) [min_x, min_y, max_x, max_y] of every label, NaN for empty polygons."""
+        if self.label_type == 'box':
+            half = self.coords[:, 2:] / 2
+            return np.hstack([self.coords[:, :2] - half, self.coords[:, :2] + half])
+        if self.label_type == 'point':
+            return np.hstack([self.coords, self.coords])
+
+        bounds = np.full((len(self), 4), np.nan)
+        counts = np.diff(self.offsets)
+        filled = counts > 0
+        if filled.any():
+            # Empty polygons add no vertices, so each reduceat segment is exactly one polygon
+            starts = self.offsets[:-1][filled]
+            bounds[filled, :2] = np.minimum.reduceat(self.coords, starts)
+            bounds[filled, 2:] = np.maximum.reduceat(self.coords, starts)
+        return bounds
+
+    def to_lines(self):
+        """Lines in the label file format, same text as label_io.FORMATTERS produce."""
+        class_ids = self.class_ids.tolist()
+        if self.offsets is None:
+            return [f"{class_id} {' '.join(map(str, row))}" for class_id, row in zip(class_ids, self.coords.tolist())]
+        flat = self.coords.reshape(-1).tolist()
+        offsets = (self.offsets * 2).tolist()
+        return [f"{class_id} {' '.join(map(str, flat[start:end]))}"
+                for class_id, start, end in zip(class_ids, offsets[:-1], offsets[1:])]
+
+    def _position(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("label index out of range")
+        return index
+
+    def _columns(self, labels):
+        """(class ids, coords, vertex counts) arrays of label dicts."""
+        class_ids = np.array([label['class_id'] for label in labels], dtype=np.int64)
+        if self.label_type == 'box':
+            return class_ids, np.array([label['bbox'] for label in labels], dtype=np.float64).reshape(-1, 4), None
+        if self.label_type == 'point':
+            return class_ids, np.array([label['point'] for label in labels], dtype=np.float64).reshape(-1, 2), None
+        polygons = [np.asarray(label.get('polygon') or [], dtype=np.float64).reshape(-1, 2) for label in labels]
+        return class_ids, np.concatenate(polygons), [len(coords) for coords in polygons]
+
+    def _insert(self, index, class_ids, coords, counts):
+        self.class_ids = np.insert(self.class_ids, index, class_ids)
+        if self.offsets is None:
+            self.coords = np.insert(self.coords, index, coords, axis=0)
+        else:
+            self._splice_vertices(index, index, coords, counts)
+        self.version += 1
+
+    def _splice_vertices(self, first, last, coords, counts):
+        # Replace the vertices of polygons first..last-1 with coords, split by counts
+        start, end = self.offsets[first], self.offsets[last]
+        self.coords = np.concatenate([self.coords[:start], coords, self.coords[end:]])
+        new_offsets = start + np.cumsum(np.asarray(counts, dtype=np.int64))
+        shift = len(coords) - (end - start)
+        self.offsets = np.concatenate([self.offsets[:first + 1], new_offsets, self.offsets[last + 1:] + shift])
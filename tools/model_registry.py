@@ -0,0 +1,162 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 09:12
+# @Author :Pang
+# @File :  model_registry.py
+# @Description : Process-wide cache of loaded SAM / YOLO models with LRU eviction
+
+
+import importlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+# Default memory budget for resident models, can be overridden with SMARTTAGGER_MODEL_BUDGET_MB
+DEFAULT_MEMORY_BUDGET_MB = 4096
+
+
+class ModelRegistry:
+    """
+    Keeps recently used models in memory, keyed by (kind, weight path, device).
+
+    ultralytics (and with it torch) is only imported when the first model is loaded.
+    A model is loaded once: threads asking for a model that is still loading wait for it.
+    """
+
+    # kind -> (module, class), resolved on first use
+    loaders = {
+        'sam': ('ultralytics', 'SAM'),
+        'yolo': ('ultralytics', 'YOLO'),
+    }
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._models = OrderedDict()  # key -> (model, size in bytes)
+        self._loading = {}  # key -> Event set when the load finished (or failed)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(kind, weight_path, device=None):
+        return kind, os.path.abspath(str(weight_path)), str(device) if device is not None else 'auto'
+
+    def get(self, kind, weight_path, device=None):
+        if kind not in self.loaders:
+            raise ValueError(f"Unknown model kind: {kind}")
+
+        key = self.make_key(kind, weight_path, device)
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Another thread (e.g. the warm-up) is loading this model, use its copy
+            loading.wait()
+
+        # Loading happens outside the lock so other models stay available meanwhile
+        try:
+            module_name, class_name = self.loaders[kind]
+            model = getattr(importlib.import_module(module_name), class_name)(str(weight_path))
+            if device is not None:
+                model.to(device)
+
+            with self._lock:
+                self._models[key] = (model, self.estimate_size(model, key[1]))
+                self._evict(keep=key)
+            return model
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def is_loaded(self, kind, weight_path, device=None):
+        return self.make_key(kind, weight_path, device) in self
+
+    def warm_up(self, models, device=None):
+        """Load [(kind, weight path), ...] ahead of use, returns {(kind, weight path): error message} of failures."""
+        errors = {}
+        for kind, weight_path in models:
+            try:
+                self.get(kind, weight_path, device)
+            except Exception as e:
+                errors[(kind, weight_path)] = str(e)
+        return errors
+
+    def set_memory_budget(self, memory_budget_mb):
+        with self._lock:
+            self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+            self._evict()
+
+    def release(self, kind, weight_path, device=None):
+        key = self.make_key(kind, weight_path, device)
+        with self._lock:
+            if self._models.pop(key, None) is not None:
+                self._free_device_memory()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._free_device_memory()
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+    def _evict(self, keep=None):
+        evicted = False
+        usage = self.memory_usage()
+        # Always keep the most recently requested model, even if it alone exceeds the budget
+        while self._models and usage > self.memory_budget:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            usage -= self._models.pop(oldest)[1]
+            evicted = True
+        if evicted:
+            self._free_device_memory()
+
+    @staticmethod
+    def estimate_size(model, weight_path):
+        module = getattr(model, 'model', None)
+        try:
+            size = sum(p.numel() * p.element_size() for p in module.parameters())
+            size += sum(b.numel() * b.element_size() for b in module.buffers())
+            if size:
+                return size
+        except (AttributeError, TypeError):
+            pass
+        # Fall back to the size of the weight file
+        return os.path.getsize(weight_path) if os.path.exists(weight_path) else 0
+
+    @staticmethod
+    def _free_device_memory():
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def budget_from_env(name, default):
+    """Megabytes from environment variable name, default when it is unset or not a number."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Ignoring {name}={value!r}, not a number of megabytes, using {default}")
+        return default
+
+
+model_registry = ModelRegistry(budget_from_env('SMARTTAGGER_MODEL_BUDGET_MB', DEFAULT_MEMORY_BUDGET_MB))
@@ -0,0 +1,97 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 11:40
+# @Author :Pang
+# @File :  polygon_dedup.py
+# @Description : Bounding-box indexed polygon de-duplication for SAM results
+
+
+import numpy as np
+from shapely.geometry import Polygon
+from shapely.prepared import prep
+
+
+EMPTY_BOUNDS = (np.inf, np.inf, -np.inf, -np.inf)
+
+
+def parse_polygon(label):
+    """Parse a 'class_id x1 y1 x2 y2 ...' label string into an (N, 2) coordinate array."""
+    return np.array(label.split()[1:], dtype=float).reshape(-1, 2)
+
+
+class PolygonDeduplicator:
+    """
+    Replace-or-append de-duplication over a growing list of polygons.
+
+    add() gives the same decision as comparing the new polygon with every polygon
+    in the list through calculate_iou and taking the first index above iou_threshold,
+    but only polygons whose bounding boxes overlap are tested exactly.
+    """
+
+    def __init__(self, iou_threshold=0.6, polygons=()):
+        self.iou_threshold = iou_threshold
+        self.geometries = []
+        self.areas = []
+        bounds = []
+        for coords in polygons:
+            geometry, area, box = self._build(coords)
+            self.geometries.append(geometry)
+            self.areas.append(area)
+            bounds.append(box)
+        self.bounds = np.array(bounds, dtype=float).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def add(self, coords):
+        """Insert a polygon, returning (index, replaced)."""
+        geometry, area, bounds = self._build(coords)
+        index = self.find_duplicate(geometry, area, bounds)
+        if index is None:
+            self._append(geometry, area, bounds)
+            return len(self.geometries) - 1, False
+
+        self.geometries[index] = geometry
+        self.areas[index] = area
+        self.bounds[index] = bounds
+        return index, True
+
+    def find_duplicate(self, geometry, area, bounds):
+        if not self.geometries:
+            return None
+
+        if self.iou_threshold < 0:
+            # Every pair passes a negative threshold, the first polygon always wins
+            return 0
+
+        min_x, min_y, max_x, max_y = bounds
+        overlap = ((self.bounds[:, 0] <= max_x) & (self.bounds[:, 2] >= min_x) &
+                   (self.bounds[:, 1] <= max_y) & (self.bounds[:, 3] >= min_y))
+        candidates = np.flatnonzero(overlap)
+        if candidates.size == 0:
+            return None
+
+        prepared = prep(geometry)
+        for i in candidates:
+            other = self.geometries[i]
+            if not prepared.intersects(other):
+                continue
+            intersection = geometry.intersection(other).area
+            if geometry.is_valid and other.is_valid:
+                union = area + self.areas[i] - intersection
+            else:
+                union = geometry.union(other).area
+            iou = intersection / union if union > 0 else 0
+            if iou > self.iou_threshold:
+                return int(i)
+        return None
+
+    @staticmethod
+    def _build(coords):
+        geometry = Polygon(coords)
+        bounds = EMPTY_BOUNDS if geometry.is_empty else geometry.bounds
+        return geometry, geometry.area, bounds
+
+    def _append(self, geometry, area, bounds):
+        self.geometries.append(geometry)
+        self.areas.append(area)
+        self.bounds = np.vstack([self.bounds, bounds])
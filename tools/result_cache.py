@@ -0,0 +1,123 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 21:10
+# @Author :Pang
+# @File :  result_cache.py
+# @Description : On-disk cache of raw YOLO detections and SAM polygons keyed by image, weights and parameters
+
+
+import os
+import threading
+import zipfile
+
+import numpy as np
+
+from tools.disk_cache import DiskCache, DEFAULT_CACHE_ROOT, file_hash, make_key
+from tools.model_registry import budget_from_env
+
+
+def weight_hash(model_path):
+    # Names that ultralytics downloads on first use have no local file to hash yet
+    if os.path.isfile(str(model_path)):
+        return file_hash(str(model_path))
+    return str(model_path)
+
+
+def normalize_prompts(prompts, decimals=2):
+    """Prompts in a canonical text form, so float noise below 1/100 pixel does not change the key."""
+    if prompts is None:
+        return None
+    return np.round(np.asarray(prompts, dtype=float), decimals).tolist()
+
+
+def pack_polygons(polygons):
+    """Variable length (K, 2) polygons as one coordinate array plus the point count of each."""
+    counts = np.array([len(coords) for coords in polygons], dtype=np.int32)
+    coords = [np.asarray(coords, dtype=np.float32).reshape(-1, 2) for coords in polygons]
+    return (np.concatenate(coords) if coords else np.empty((0, 2), dtype=np.float32)), counts
+
+
+def unpack_polygons(coords, counts):
+    return np.split(coords, np.cumsum(counts)[:-1]) if len(counts) else []
+
+
+class ResultCache:
+    """
+    Inference results stored as compressed .npz files in a size-bounded DiskCache.
+
+    The key covers everything that changes the output: image content hash, weight file hash,
+    thresholds, imgsz and the prompts, so a stale entry is never returned and editing
+    labels or moving the image folder never invalidates anything that is still valid.
+    """
+
+    def __init__(self, disk_dir=None, max_mb=512):
+        self.disk_dir = disk_dir or os.path.join(DEFAULT_CACHE_ROOT, 'results')
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._disk = None
+        self._lock = threading.Lock()
+
+    @property
+    def disk(self):
+        with self._lock:
+            if self._disk is None and self.max_bytes > 0:
+                self._disk = DiskCache(self.disk_dir, self.max_bytes, suffix='.npz')
+            return self._disk
+
+    def disable(self):
+        with self._lock:
+            self.max_bytes = 0
+            self._disk = None
+
+    @staticmethod
+    def make_key(kind, image_hash, model_path, **params):
+        parts = [kind, image_hash, weight_hash(model_path)]
+        parts += [f"{name}={params[name]}" for name in sorted(params)]
+        return make_key(*parts)
+
+    def get(self, key):
+        """Dict of the arrays stored under key, or None."""
+        disk = self.disk
+        path = disk.get_path(key) if disk else None
+        if path is None:
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            disk.remove(key)
+            return None
+
+    def put(self, key, **arrays):
+        disk = self.disk
+        if disk is None:
+            return
+        try:
+            disk.put(key, lambda f: np.savez_compressed(f, **arrays))
+        except OSError as e:
+            # A full or read-only cache directory must not fail the inference itself
+            print(f"Failed to cache result {key}: {e}")
+
+    # Helpers for the two result shapes the processors produce
+
+    def get_boxes(self, key):
+        """((N, 6) [x1, y1, x2, y2, conf, class_id] array, (width, height)) or None."""
+        data = self.get(key)
+        if data is None:
+            return None
+        return data['boxes'], tuple(int(value) for value in data['size'])
+
+    def put_boxes(self, key, boxes, img_size):
+        self.put(key, boxes=np.asarray(boxes, dtype=np.float32).reshape(-1, 6),
+                 size=np.asarray(img_size, dtype=np.int64))
+
+    def get_polygons(self, key):
+        data = self.get(key)
+        if data is None:
+            return None
+        return unpack_polygons(data['coords'], data['counts'])
+
+    def put_polygons(self, key, polygons):
+        coords, counts = pack_polygons(polygons)
+        self.put(key, coords=coords, counts=counts)
+
+
+result_cache = ResultCache(max_mb=budget_from_env('SMARTTAGGER_RESULT_CACHE_MB', 512))
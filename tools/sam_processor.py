@@ -4,11 +4,19 @@
 # @File :  sam_processor.py
 # @Description :
 
-from ultralytics import SAM
 from PIL import Image
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 from shapely.geometry import Polygon
+from tools.model_registry import model_registry
+from tools.embedding_cache import embedding_cache
+from tools.disk_cache import file_hash
+from tools.result_cache import result_cache, normalize_prompts
+from tools.label_backend import open_backend
+from tools.label_store import ImageLabels
+from tools.polygon_dedup import PolygonDeduplicator, parse_polygon
+from tools.tiling import TileReader, tile_grid, assign_to_tiles, prefetch, round_to_stride
 
 
 class SAMProcessor:
@@ -17,15 +25,35 @@ class SAMProcessor:
 
     @staticmethod
     def process(image_path, visible_labels, label_folder, label_type, reduction_factor=4, iou_threshold=0.6,
-                model_path="weights/sam2_b.pt", conf=0.25):
-        image = Image.open(image_path)
-        width, height = image.size
+                model_path="weights/sam2_b.pt", conf=0.25, device=None, existing_polygons=None,
+                roi=False, roi_padding=0.5, max_imgsz=1280, tile_size=None, tile_overlap=128, workers=2):
+        """
+        Segment the box / point prompts and merge the polygons into the image's polygon labels.
+
+        When existing_polygons (the in-memory polygon labels of the image) is given nothing is written,
+        the caller applies result["replaced"] and result["added"] itself. Otherwise the polygon labels
+        in label_folder (a label folder, project database or label_backend backend) are updated.
+
+        With roi=True SAM runs on padded crops around the prompts (prompts whose windows
+        overlap share one crop) instead of the full frame. With tile_size set, prompts are run
+        on the overlapping tile grid used for very large images; tiles are read lazily and in
+        parallel, and polygons split at tile seams are de-duplicated by the merge step.
+        """
+        if tile_size:
+            # Very large images are never opened with PIL here, only read tile by tile
+            width, height = TileReader(image_path).size
+        else:
+            image = Image.open(image_path)
+            width, height = image.size
         # print(f"Width: {width}, Height: {height}")
 
+        # Prompts are read from the label arrays
         if label_type == 'box':
+            visible_labels = ImageLabels.from_labels('box', visible_labels)
             input_points = None
             input_boxes = SAMProcessor.convert_boxes(visible_labels, width, height)
         elif label_type == 'point':
+            visible_labels = ImageLabels.from_labels('point', visible_labels)
             input_points = SAMProcessor.convert_points(visible_labels, width, height)
             input_boxes = None
         else:
@@ -33,89 +61,240 @@ class SAMProcessor:
 
         print(str(model_path))
 
-        sam_model = SAM(str(model_path))
-        sam_result = sam_model(source=image_path,
-                               imgsz=1280,
-                               conf=conf,
-                               save=False,
-                               save_txt=False,
-                               bboxes=input_boxes,
-                               points=input_points,
-                               # line_width=3,
-                               )
-
-        # Extract the xyn array
-        xyn_data = sam_result[0].masks.xyn
-
-        polygon_folder = os.path.join(label_folder, 'Polygon')
-        os.makedirs(polygon_folder, exist_ok=True)
-
-        image_name = os.path.splitext(os.path.basename(image_path))[0]
-        output_file = f"{image_name}.txt"
-        output_path = os.path.join(polygon_folder, output_file)
+        # Same image, weights, parameters and prompts give the same polygons, whichever labels changed since
+        if tile_size:
+            mode = f"tiled:{tile_size}:{tile_overlap}"
+        elif roi:
+            mode = f"roi:{roi_padding}"
+        else:
+            mode = "full"
+        image_hash = file_hash(image_path)
+        cache_key = result_cache.make_key('sam', image_hash, model_path, mode=mode, conf=conf, imgsz=max_imgsz,
+                                          boxes=normalize_prompts(input_boxes),
+                                          points=normalize_prompts(input_points))
+        xyn_data = result_cache.get_polygons(cache_key)
+        if xyn_data is None:
+            if tile_size:
+                xyn_data = SAMProcessor.predict_tiled(image_path, input_boxes, input_points, model_path, conf=conf,
+                                                      tile_size=tile_size, overlap=tile_overlap, device=device,
+                                                      workers=workers)
+            elif roi:
+                xyn_data = SAMProcessor.predict_roi(image_path, input_boxes, input_points, model_path, conf=conf,
+                                                    padding=roi_padding, max_imgsz=max_imgsz, device=device,
+                                                    workers=workers)
+            else:
+                sam_result = SAMProcessor.predict(image_path, image_hash, input_boxes, input_points,
+                                                  model_path, conf=conf, imgsz=max_imgsz, device=device)
 
-        # Read existing labels (if the file exists)
-        existing_labels = []
-        if os.path.exists(output_path):
-            with open(output_path, 'r') as file:
-                existing_labels = [line.strip() for line in file.readlines()]
+                # Extract the xyn array
+                xyn_data = sam_result[0].masks.xyn
+            result_cache.put_polygons(cache_key, xyn_data)
 
         # Process new labels
         new_labels = []
-        for item, coordinates in zip(visible_labels, xyn_data):
-            class_id = item['class_id']
+        for class_id, coordinates in zip(visible_labels.class_ids.tolist(), xyn_data):
             # Reduce the number of points
             reduced_coords = coordinates[::reduction_factor]
             coords_str = ' '.join(map(str, reduced_coords.flatten()))
             new_label = f"{class_id} {coords_str}"
             new_labels.append(new_label)
 
+        if existing_polygons is not None:
+            existing_polygons = ImageLabels.from_labels('polygon', existing_polygons)
+            existing_coords = [existing_polygons.vertices_of(i) for i in range(len(existing_polygons))]
+            replaced, added = SAMProcessor.merge_polygons(existing_coords, new_labels, iou_threshold)
+            return {"status": "success", "message": "SAM segmentation completed",
+                    "replaced": [(index, SAMProcessor.to_polygon_label(label)) for index, label in replaced],
+                    "added": [SAMProcessor.to_polygon_label(label) for label in added]}
+
+        # Read existing labels (if any) from the label folder or project database
+        backend = open_backend(label_folder)
+        image_name = os.path.splitext(os.path.basename(image_path))[0]
+        polygons = backend.read('polygon', image_name) or ImageLabels('polygon')
+
         # Check for duplicates and update or add new labels
-        updated_labels = existing_labels.copy()
+        replaced, added = SAMProcessor.merge_polygons([polygons.vertices_of(i) for i in range(len(polygons))],
+                                                      new_labels, iou_threshold)
+        for index, new_label in replaced:
+            polygons[index] = SAMProcessor.to_polygon_label(new_label)  # Replace duplicate label
+        polygons.extend(SAMProcessor.to_polygon_label(label) for label in added)  # Add new labels
+
+        # Save updated labels
+        backend.write('polygon', image_name, polygons)
+
+        return {"status": "success", "message": "SAM segmentation completed and results saved",
+                "replaced": [(index, SAMProcessor.to_polygon_label(label)) for index, label in replaced],
+                "added": [SAMProcessor.to_polygon_label(label) for label in added]}
+
+    @staticmethod
+    def merge_polygons(existing_coords, new_labels, iou_threshold):
+        """
+        De-duplicate new label strings against existing polygons.
+
+        Returns (replaced, added): replaced is a list of (index into existing, new label),
+        added holds the new labels to append, in order.
+        """
+        dedup = PolygonDeduplicator(iou_threshold, existing_coords)
+        replaced = {}
+        added = []
         for new_label in new_labels:
-            is_duplicate = False
-            for i, existing_label in enumerate(updated_labels):
-                if calculate_iou(new_label, existing_label) > iou_threshold:
-                    updated_labels[i] = new_label  # Replace duplicate label
-                    is_duplicate = True
-                    break
+            index, is_duplicate = dedup.add(parse_polygon(new_label))
             if not is_duplicate:
-                updated_labels.append(new_label)  # Add new label
+                added.append(new_label)
+            elif index < len(existing_coords):
+                replaced[index] = new_label
+            else:
+                # Duplicate of a polygon added earlier in this call
+                added[index - len(existing_coords)] = new_label
+        return sorted(replaced.items()), added
 
-        # Save updated labels
-        with open(output_path, 'w') as file:
-            for label in updated_labels:
-                file.write(f"{label}\n")
+    @staticmethod
+    def to_polygon_label(label):
+        parts = label.split()
+        points = list(map(float, parts[1:]))
+        return {
+            'class_id': int(parts[0]),
+            'polygon': [(points[i], points[i + 1]) for i in range(0, len(points), 2)]
+        }
+
+    @staticmethod
+    def predict(source, source_key, input_boxes, input_points, model_path, conf=0.25, imgsz=1280, device=None):
+        """Run SAM on source (an image path or BGR array), source_key identifies its content for the cache."""
+        sam_model = model_registry.get('sam', model_path, device)
+        predictor = SAMProcessor.get_predictor(sam_model, imgsz, conf)
 
-        return {"status": "success", "message": "SAM segmentation completed and results saved"}
+        # Reuse the image encoder output when this image was already encoded with the same model and size
+        key = embedding_cache.make_key(source_key, model_path, imgsz)
+        features = embedding_cache.get(key, device=getattr(predictor, 'device', None))
+        if features is None:
+            predictor.set_image(source)
+            embedding_cache.put(key, predictor.features)
+        else:
+            # setup_source applies this imgsz and drops any features, so they are assigned after it
+            predictor.setup_source(source)
+            # SAM2 sizes its prompt encoder and mask decoder for imgsz while encoding, which a hit skips,
+            # so the model would still be set up for the last image encoded at another size
+            set_imgsz = getattr(getattr(predictor, 'model', None), 'set_imgsz', None)
+            if set_imgsz is not None:
+                set_imgsz(predictor.imgsz)
+            predictor.features = features
+
+        try:
+            # No source here: passing one would set the image up again and re-run the image encoder,
+            # with features set only the prompt encoder and mask decoder run
+            return predictor(bboxes=input_boxes, points=input_points)
+        finally:
+            predictor.reset_image()
+
+    @staticmethod
+    def predict_roi(image_path, input_boxes, input_points, model_path, conf=0.25, padding=0.5,
+                    max_imgsz=1280, point_window=256, device=None, workers=2):
+        """
+        Run SAM on padded crops around the prompts and return one polygon per prompt,
+        normalized to the full image like masks.xyn.
+        """
+        reader = TileReader(image_path)
+        windows = SAMProcessor.prompt_windows(input_boxes, input_points, padding, point_window, *reader.size)
+        return SAMProcessor.predict_windows(reader, SAMProcessor.group_windows(windows), len(windows),
+                                            input_boxes, input_points, model_path, conf=conf,
+                                            max_imgsz=max_imgsz, device=device, workers=workers)
+
+    @staticmethod
+    def predict_tiled(image_path, input_boxes, input_points, model_path, conf=0.25, tile_size=1024, overlap=128,
+                      device=None, workers=2):
+        """Run each prompt on the first tile of the grid that contains it, returning one polygon per prompt."""
+        reader = TileReader(image_path)
+        windows = SAMProcessor.prompt_windows(input_boxes, input_points, 0.1, 64, *reader.size)
+        groups = assign_to_tiles(windows, tile_grid(*reader.size, tile_size=tile_size, overlap=overlap))
+        return SAMProcessor.predict_windows(reader, groups, len(windows), input_boxes, input_points, model_path,
+                                            conf=conf, max_imgsz=tile_size, device=device, workers=workers)
+
+    @staticmethod
+    def predict_windows(reader, groups, prompt_count, input_boxes, input_points, model_path, conf=0.25,
+                        max_imgsz=1280, min_imgsz=256, device=None, workers=2):
+        width, height = reader.size
+        image_hash = file_hash(reader.image_path)
+        xyn_data = [np.empty((0, 2), dtype=np.float32)] * prompt_count
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # Crops are read in parallel while SAM runs on the previous one
+            crops = prefetch(pool, reader.read_bgr, [window for window, _ in groups], ahead=workers)
+            for ((x0, y0, x1, y1), indices), crop in zip(groups, crops):
+                crop_width, crop_height = x1 - x0, y1 - y0
+                offset = np.array([x0, y0], dtype=float)
+
+                boxes = input_boxes[indices] - np.tile(offset, 2) if input_boxes is not None else None
+                points = input_points[indices] - offset if input_points is not None else None
+
+                # Resolution that fits the crop (multiple of 32), never above the full-frame size
+                imgsz = round_to_stride(min(max_imgsz, max(min_imgsz, crop_width, crop_height)))
+                sam_result = SAMProcessor.predict(crop, f"{image_hash}@{x0},{y0},{x1},{y1}", boxes, points,
+                                                  model_path, conf=conf, imgsz=imgsz, device=device)
+
+                # Map crop-normalized polygons back to full-image normalized coordinates
+                for i, coordinates in zip(indices, sam_result[0].masks.xyn):
+                    xy = coordinates * np.array([crop_width, crop_height]) + offset
+                    xyn_data[i] = (xy / np.array([width, height])).astype(np.float32)
+        return xyn_data
+
+    @staticmethod
+    def prompt_windows(input_boxes, input_points, padding, point_window, width, height):
+        if input_boxes is not None:
+            return [SAMProcessor.pad_window(box, padding, point_window, width, height) for box in input_boxes]
+        return [SAMProcessor.pad_window([x, y, x, y], padding, point_window, width, height)
+                for x, y in input_points]
+
+    @staticmethod
+    def pad_window(box, padding, point_window, width, height):
+        x_min, y_min, x_max, y_max = box
+        size = max(x_max - x_min, y_max - y_min, point_window)
+        pad = size * padding + max(0, point_window - (x_max - x_min)) / 2
+        pad_y = size * padding + max(0, point_window - (y_max - y_min)) / 2
+        return (int(max(0, np.floor(x_min - pad))), int(max(0, np.floor(y_min - pad_y))),
+                int(min(width, np.ceil(x_max + pad))), int(min(height, np.ceil(y_max + pad_y))))
+
+    @staticmethod
+    def group_windows(windows):
+        """Merge overlapping windows, returning a list of (window, prompt indices)."""
+        groups = [(window, [i]) for i, window in enumerate(windows)]
+        merged = True
+        while merged:
+            merged = False
+            for a in range(len(groups)):
+                for b in range(a + 1, len(groups)):
+                    (ax0, ay0, ax1, ay1), a_indices = groups[a]
+                    (bx0, by0, bx1, by1), b_indices = groups[b]
+                    if ax0 < bx1 and bx0 < ax1 and ay0 < by1 and by0 < ay1:
+                        groups[a] = ((min(ax0, bx0), min(ay0, by0), max(ax1, bx1), max(ay1, by1)),
+                                     a_indices + b_indices)
+                        del groups[b]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return groups
+
+    @staticmethod
+    def get_predictor(sam_model, imgsz, conf):
+        if sam_model.predictor is None:
+            overrides = dict(conf=conf, task="segment", mode="predict", imgsz=imgsz, save=False, verbose=False)
+            sam_model.predictor = sam_model._smart_load("predictor")(overrides=overrides,
+                                                                     _callbacks=sam_model.callbacks)
+            sam_model.predictor.setup_model(model=sam_model.model, verbose=False)
+        else:
+            sam_model.predictor.args.conf = conf
+            sam_model.predictor.args.imgsz = imgsz
+        return sam_model.predictor
 
     @staticmethod
     def convert_boxes(visible_labels, width, height):
-        converted_boxes = []
-        for item in visible_labels:
-            bbox = item['bbox']
-            x_center = bbox[0] * width
-            y_center = bbox[1] * height
-            box_width = bbox[2] * width
-            box_height = bbox[3] * height
-
-            x_min = x_center - (box_width / 2)
-            y_min = y_center - (box_height / 2)
-            x_max = x_center + (box_width / 2)
-            y_max = y_center + (box_height / 2)
-
-            converted_boxes.append([x_min, y_min, x_max, y_max])
-        return np.array(converted_boxes)
+        # [x_center, y_center, w, h] normalized -> [x_min, y_min, x_max, y_max] pixels
+        boxes = ImageLabels.from_labels('box', visible_labels).coords * (width, height, width, height)
+        return np.hstack([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, :2] + boxes[:, 2:] / 2])
 
     @staticmethod
     def convert_points(visible_labels, width, height):
-        converted_points = []
-        for item in visible_labels:
-            point = item['point']
-            x = point[0] * width
-            y = point[1] * height
-            converted_points.append([x, y])
-        return np.array(converted_points)
+        return ImageLabels.from_labels('point', visible_labels).coords * (width, height)
 
     def generate_mask(self, image, bbox):
         pass
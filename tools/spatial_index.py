@@ -0,0 +1,141 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 17:30
+# @Author :Pang
+# @File :  spatial_index.py
+# @Description : Uniform grid index over normalized label bounds for click hit-testing
+
+
+from collections import defaultdict
+
+import numpy as np
+
+from tools.label_store import ImageLabels
+
+
+def label_bounds(label_type, label):
+    """(min_x, min_y, max_x, max_y) of a label in normalized image coordinates."""
+    if label_type == 'box':
+        x_center, y_center, width, height = label['bbox']
+        return x_center - width / 2, y_center - height / 2, x_center + width / 2, y_center + height / 2
+    if label_type == 'polygon':
+        coords = np.asarray(label.get('polygon') or [], dtype=float).reshape(-1, 2)
+        if len(coords) == 0:
+            return None
+        return (*coords.min(axis=0), *coords.max(axis=0))
+    x, y = label['point']
+    return x, y, x, y
+
+
+class LabelIndex:
+    """
+    Spatial index of one label type (box / polygon / point) of one image.
+
+    Items are addressed by their position in the label list, like the views and the
+    label caches do. The grid stores stable ids, so remove() does not renumber cells.
+    """
+
+    def __init__(self, label_type, labels=(), cells=32):
+        self.label_type = label_type
+        self.cells = cells
+        self.grid = defaultdict(set)
+        self.ids = []  # list position -> stable id
+        self.bounds = {}
+        self.coords = {}
+        self._next_id = 0
+        self._positions = None
+        self.extend(ImageLabels.from_labels(label_type, labels))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, label):
+        coords = np.asarray(label['polygon'], dtype=float).reshape(-1, 2) if self.label_type == 'polygon' else None
+        self._add(label_bounds(self.label_type, label), coords)
+
+    def extend(self, labels):
+        """Add every label of an ImageLabels, reading the bounds of all of them at once."""
+        polygons = self.label_type == 'polygon'
+        for i, bounds in enumerate(labels.bounds().tolist()):
+            self._add(None if np.isnan(bounds[0]) else tuple(bounds), labels.vertices_of(i) if polygons else None)
+
+    def _add(self, bounds, coords):
+        item_id = self._next_id
+        self._next_id += 1
+        self.ids.append(item_id)
+        self._positions = None
+
+        if bounds is None:
+            # Empty polygons are kept in the list but can never be hit
+            return
+        self.bounds[item_id] = bounds
+        if coords is not None:
+            self.coords[item_id] = coords
+        for cell in self._cells(bounds):
+            self.grid[cell].add(item_id)
+
+    def remove(self, index):
+        """Remove the item at list position `index`, later items move down by one like in the list."""
+        item_id = self.ids.pop(index)
+        self._positions = None
+        bounds = self.bounds.pop(item_id, None)
+        self.coords.pop(item_id, None)
+        if bounds is not None:
+            for cell in self._cells(bounds):
+                self.grid[cell].discard(item_id)
+
+    def candidates(self, min_x, min_y, max_x, max_y):
+        """List positions whose bounds may overlap the query rectangle, in ascending order."""
+        item_ids = set()
+        for cell in self._cells((min_x, min_y, max_x, max_y)):
+            item_ids.update(self.grid.get(cell, ()))
+        if self._positions is None:
+            self._positions = {item_id: position for position, item_id in enumerate(self.ids)}
+        return sorted(self._positions[item_id] for item_id in item_ids)
+
+    def hit(self, x, y, scale=(1, 1), visible=None, threshold=5):
+        """
+        First visible label under the normalized point (x, y), or None.
+
+        scale is the size of the displayed image in pixels, points are hit within
+        `threshold` of those pixels.
+        """
+        tolerance_x = threshold / scale[0] if self.label_type == 'point' else 0
+        tolerance_y = threshold / scale[1] if self.label_type == 'point' else 0
+        positions = self.candidates(x - tolerance_x, y - tolerance_y, x + tolerance_x, y + tolerance_y)
+        if visible is not None:
+            positions = [position for position in positions if position in visible]
+        if not positions:
+            return None
+
+        item_ids = [self.ids[position] for position in positions]
+        bounds = np.array([self.bounds[item_id] for item_id in item_ids])
+        if self.label_type == 'box':
+            inside = (bounds[:, 0] <= x) & (x <= bounds[:, 2]) & (bounds[:, 1] <= y) & (y <= bounds[:, 3])
+        elif self.label_type == 'point':
+            dx = (bounds[:, 0] - x) * scale[0]
+            dy = (bounds[:, 1] - y) * scale[1]
+            inside = dx ** 2 + dy ** 2 <= threshold ** 2
+        else:
+            inside = self._inside_polygons(x, y, [self.coords[item_id] for item_id in item_ids])
+
+        hits = np.flatnonzero(inside)
+        return positions[hits[0]] if hits.size else None
+
+    @staticmethod
+    def _inside_polygons(x, y, polygons):
+        # Even-odd ray casting over the edges of all candidate polygons at once
+        starts = np.concatenate(polygons)
+        ends = np.concatenate([np.roll(coords, -1, axis=0) for coords in polygons])
+        owners = np.repeat(np.arange(len(polygons)), [len(coords) for coords in polygons])
+
+        y1, y2 = starts[:, 1], ends[:, 1]
+        crosses = (y1 > y) != (y2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = starts[:, 0] + (y - y1) * (ends[:, 0] - starts[:, 0]) / (y2 - y1)
+        crosses &= x < x_cross
+        return np.bincount(owners[crosses], minlength=len(polygons)) % 2 == 1
+
+    def _cells(self, bounds):
+        last = self.cells - 1
+        min_x, min_y, max_x, max_y = (min(last, max(0, int(value * self.cells))) for value in bounds)
+        return [(cx, cy) for cx in range(min_x, max_x + 1) for cy in range(min_y, max_y + 1)]
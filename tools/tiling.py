@@ -0,0 +1,172 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 16:10
+# @Author :Pang
+# @File :  tiling.py
+# @Description : Lazy region reading, tile grids and box NMS for tiled inference
+
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+try:
+    # pyvips decodes only the requested regions, so gigapixel images never sit in RAM as a whole
+    import pyvips
+except ImportError:
+    pyvips = None
+
+_pixel_limit_lock = threading.Lock()
+_warned_no_pyvips = False
+
+
+@contextmanager
+def unlimited_pixels():
+    """Lift PIL's decompression bomb limit only around one open, the process keeps the check otherwise."""
+    with _pixel_limit_lock:
+        limit = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            yield
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
+
+def warn_no_pyvips():
+    global _warned_no_pyvips
+    if not _warned_no_pyvips:
+        _warned_no_pyvips = True
+        print("pyvips is not installed, tiled reading decodes each large image fully into memory "
+              "(pip install pyvips, see README)")
+
+
+class TileReader:
+    """Reads (x0, y0, x1, y1) regions of an image as RGB uint8 arrays."""
+
+    def __init__(self, image_path):
+        self.image_path = image_path
+        if pyvips is not None:
+            self.image = self.to_rgb(pyvips.Image.new_from_file(image_path, access='random'))
+            self.size = (self.image.width, self.image.height)
+        else:
+            # Without pyvips PIL has to decode the full image on the first read
+            warn_no_pyvips()
+            with unlimited_pixels():
+                self.image = Image.open(image_path)
+            self.size = self.image.size
+            self._lock = threading.Lock()
+
+    @staticmethod
+    def to_rgb(image):
+        """
+        Lazy pyvips pipeline to 8 bit RGB, what PIL's convert('RGB') gives: alpha is dropped, grey,
+        CMYK and other colour spaces are converted and 16 bit or float pixels are scaled, not clipped.
+        """
+        if image.hasalpha():
+            image = image.extract_band(0, n=image.bands - 1)
+        try:
+            # Also turns 16 bit grey / RGB into 8 bit
+            image = image.colourspace('srgb')
+        except pyvips.Error:
+            # Multiband and other data without a colour space are left as they are
+            pass
+        if image.format != 'uchar':
+            # One streaming pass over the whole image, so that every tile is scaled the same way
+            maximum = image.max()
+            if maximum > 0:
+                image = image * (255.0 / maximum)
+            image = image.cast('uchar')
+        return image
+
+    def read(self, window):
+        x0, y0, x1, y1 = window
+        if pyvips is None:
+            # PIL images are not safe to load from several threads at once
+            with self._lock:
+                region = self.image.crop((x0, y0, x1, y1))
+            return np.array(region.convert('RGB'))
+
+        region = self.image.crop(x0, y0, x1 - x0, y1 - y0)
+        array = np.ndarray(buffer=region.write_to_memory(), dtype=np.uint8,
+                           shape=[region.height, region.width, region.bands])
+        if region.bands < 3:
+            array = np.repeat(array[:, :, :1], 3, axis=2)
+        return np.ascontiguousarray(array[:, :, :3])
+
+    def read_bgr(self, window):
+        return np.ascontiguousarray(self.read(window)[:, :, ::-1])
+
+
+def prefetch(pool, fn, items, ahead):
+    """Like pool.map(fn, items) in order, but with at most `ahead` results pending at a time."""
+    items = iter(items)
+    pending = deque(pool.submit(fn, item) for _, item in zip(range(max(1, ahead)), items))
+    while pending:
+        result = pending.popleft().result()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            break
+        yield result
+
+
+def round_to_stride(size, stride=32):
+    """Smallest multiple of stride not below size, the image sizes models run at without being rounded (and warning)."""
+    return -(-int(size) // stride) * stride
+
+
+def tile_grid(width, height, tile_size=1024, overlap=128):
+    """Tiles covering the image, neighbours overlap by `overlap` pixels and the last row/column ends at the edge."""
+    stride = max(1, tile_size - overlap)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y, min(width, x + tile_size), min(height, y + tile_size))
+            for y in starts(height) for x in starts(width)]
+
+
+def assign_to_tiles(windows, tiles):
+    """
+    Group prompt windows by the first tile that fully contains them.
+
+    Windows that fit no tile keep their own window. Returns a list of (window, prompt indices).
+    """
+    groups = {}
+    for i, (x0, y0, x1, y1) in enumerate(windows):
+        for tile in tiles:
+            if tile[0] <= x0 and tile[1] <= y0 and x1 <= tile[2] and y1 <= tile[3]:
+                groups.setdefault(tile, []).append(i)
+                break
+        else:
+            groups.setdefault((x0, y0, x1, y1), []).append(i)
+    return list(groups.items())
+
+
+def nms(boxes, iou_threshold=0.45):
+    """Class-aware NMS over rows of [x1, y1, x2, y2, conf, class_id], returns the kept rows."""
+    if len(boxes) == 0:
+        return boxes
+
+    # Offset boxes per class so that different classes never overlap
+    offsets = boxes[:, 5:6] * (boxes[:, :4].max() + 1)
+    x1, y1, x2, y2 = (boxes[:, :4] + offsets).T
+    areas = (x2 - x1) * (y2 - y1)
+    order = boxes[:, 4].argsort()[::-1]
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        intersection = w * h
+        iou = intersection / np.maximum(areas[i] + areas[rest] - intersection, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return boxes[keep]
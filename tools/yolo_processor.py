@@ -7,20 +7,174 @@
 
 # tools/yolo_processor.py
 
-from ultralytics import YOLO
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PIL import Image
+from tools.model_registry import model_registry
+from tools import label_io
+from tools.disk_cache import file_hash
+from tools.result_cache import result_cache
+from tools.tiling import TileReader, tile_grid, nms, prefetch, round_to_stride
 
 class YOLOProcessor:
-    def __init__(self, weight_path, conf_threshold=0.25, iou_threshold=0.6):
-        self.model = YOLO(weight_path)
+    def __init__(self, weight_path, conf_threshold=0.25, iou_threshold=0.6, device=None):
+        self.weight_path = weight_path
+        self.device = device
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
 
+    @property
+    def model(self):
+        # Looked up on use, so a processor is cheap to make on the GUI thread (the model loads on
+        # the first job) and never keeps a model alive that the registry has evicted
+        return model_registry.get('yolo', self.weight_path, self.device)
+
     def process_image(self, image_path):
         image = Image.open(image_path)
         results = self.model(image, conf=self.conf_threshold, iou=self.iou_threshold)[0]
         return results, image.size
 
+    def detect(self, image_path):
+        """Like process_image, but returns the raw (N, 6) box array and is served from the result cache."""
+        key = self.cache_key(image_path)
+        cached = result_cache.get_boxes(key)
+        if cached is not None:
+            return cached
+        results, img_size = self.process_image(image_path)
+        boxes = results.boxes.data.cpu().numpy()
+        result_cache.put_boxes(key, boxes, img_size)
+        return boxes, img_size
+
+    def cache_key(self, image_path, **params):
+        return result_cache.make_key('yolo', file_hash(image_path), self.weight_path,
+                                     conf=self.conf_threshold, iou=self.iou_threshold, **params)
+
+    def process_image_tiled(self, image_path, tile_size=1024, overlap=128, batch_size=8, workers=4):
+        """
+        Detect on overlapping tiles read lazily from the image, then merge across seams with NMS.
+
+        Returns an (N, 6) array of [x1, y1, x2, y2, conf, class_id] in full image pixels and the image size.
+        """
+        # The model rounds imgsz up to a multiple of its stride anyway, the tiles are cut at that size
+        tile_size = round_to_stride(tile_size, self.stride())
+        key = self.cache_key(image_path, tile_size=tile_size, overlap=overlap)
+        cached = result_cache.get_boxes(key)
+        if cached is not None:
+            return cached
+
+        reader = TileReader(image_path)
+        tiles = tile_grid(*reader.size, tile_size=tile_size, overlap=overlap)
+
+        detections = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # Tiles are decoded in parallel ahead of the batch that is being inferred
+            decoded = prefetch(pool, reader.read_bgr, tiles, ahead=2 * batch_size)
+            for start in range(0, len(tiles), batch_size):
+                batch_tiles = tiles[start:start + batch_size]
+                images = [next(decoded) for _ in batch_tiles]
+                results = self.model(images, conf=self.conf_threshold, iou=self.iou_threshold,
+                                     imgsz=tile_size, verbose=False)
+                for (x0, y0, _, _), result in zip(batch_tiles, results):
+                    boxes = result.boxes.data.cpu().numpy().astype(float)
+                    if len(boxes):
+                        boxes[:, [0, 2]] += x0
+                        boxes[:, [1, 3]] += y0
+                        detections.append(boxes)
+
+        boxes = nms(np.concatenate(detections), self.iou_threshold) if detections else np.empty((0, 6))
+        result_cache.put_boxes(key, boxes, reader.size)
+        return boxes, reader.size
+
+    def stride(self):
+        """Largest stride of the model, 32 for the usual YOLO models."""
+        stride = getattr(getattr(self.model, 'model', None), 'stride', None)
+        return int(max(stride)) if stride is not None else 32
+
+    def process_stream(self, image_paths, batch_size=8, prefetch_batches=2, workers=1):
+        """
+        Run batched detection over an iterable of image paths.
+
+        Images are decoded ahead in a background thread (with `workers` decode threads),
+        and (image_path, boxes, img_size) is yielded as soon as each batch finishes, boxes
+        being the raw (N, 6) detections. Only about prefetch_batches + 1 batches are held in
+        memory at a time. Images found in the result cache are neither decoded nor inferred.
+        """
+        batches = queue.Queue(maxsize=max(1, prefetch_batches))
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def lookup(image_path):
+            try:
+                key = self.cache_key(image_path)
+            except OSError as e:
+                print(f"Failed to read {image_path}: {e}")
+                return None, None
+            return key, result_cache.get_boxes(key)
+
+        def decode_batch(pool, paths):
+            # (path, cache key, image, cached (boxes, size)), cached items skip decoding
+            lookups = list(pool.map(lookup, paths) if pool else map(lookup, paths))
+            misses = [path for path, (key, cached) in zip(paths, lookups) if key is not None and cached is None]
+            decoded = dict(zip(misses, pool.map(load_image, misses) if pool else map(load_image, misses)))
+            items = []
+            for path, (key, cached) in zip(paths, lookups):
+                if cached is not None or decoded.get(path) is not None:
+                    items.append((path, key, decoded.get(path), cached))
+            return items
+
+        def decode():
+            pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+            try:
+                paths = []
+                for image_path in image_paths:
+                    paths.append(image_path)
+                    if len(paths) == batch_size:
+                        if not put(decode_batch(pool, paths)):
+                            return
+                        paths = []
+                if paths:
+                    put(decode_batch(pool, paths))
+            except Exception as e:
+                put(e)
+            finally:
+                if pool:
+                    pool.shutdown(wait=False)
+                put(None)
+
+        thread = threading.Thread(target=decode, daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                if not batch:
+                    continue
+                images = [image for _, _, image, cached in batch if cached is None]
+                results = iter(self.model(images, conf=self.conf_threshold, iou=self.iou_threshold,
+                                          verbose=False) if images else ())
+                for image_path, key, image, cached in batch:
+                    if cached is None:
+                        boxes = next(results).boxes.data.cpu().numpy()
+                        cached = boxes, image.size
+                        result_cache.put_boxes(key, *cached)
+                    yield image_path, *cached
+        finally:
+            stop.set()
+            thread.join(timeout=1)
+
     @staticmethod
     def convert_to_yolo_format(box, img_size):
         x1, y1, x2, y2, conf, class_id = box
@@ -39,10 +193,32 @@ class YOLOProcessor:
 
     @staticmethod
     def save_results(save_path, results, img_size):
-        with open(save_path, 'w') as f:
-            for box in results.boxes.data.tolist():
-                center_x, center_y, width, height, _, class_id = YOLOProcessor.convert_to_yolo_format(box, img_size)
-                f.write(f"{int(class_id)} {center_x} {center_y} {width} {height}\n")
+        YOLOProcessor.save_boxes(save_path, results.boxes.data.tolist(), img_size)
+
+    @staticmethod
+    def save_boxes(save_path, boxes, img_size):
+        lines = []
+        for box in boxes:
+            center_x, center_y, width, height, _, class_id = YOLOProcessor.convert_to_yolo_format(box, img_size)
+            lines.append(f"{int(class_id)} {center_x} {center_y} {width} {height}")
+        label_io.write_lines(save_path, lines)
+
+    @staticmethod
+    def merge_boxes(existing_boxes, boxes, img_size, iou_threshold):
+        """
+        Box labels for the raw detections that do not overlap an existing box ([x_center, y_center,
+        width, height] normalized) or an earlier detection by more than iou_threshold.
+        """
+        kept = [list(box) for box in existing_boxes]
+        new_labels = []
+        for box in boxes:
+            center_x, center_y, width, height, conf, class_id = YOLOProcessor.convert_to_yolo_format(box, img_size)
+            new_box = [center_x, center_y, width, height]
+            if any(YOLOProcessor.calculate_iou(new_box, existing_box) > iou_threshold for existing_box in kept):
+                continue
+            kept.append(new_box)
+            new_labels.append({'class_id': class_id, 'bbox': new_box, 'confidence': conf})
+        return new_labels
 
     @staticmethod
     def calculate_iou(box1, box2):
@@ -73,3 +249,13 @@ class YOLOProcessor:
         # Calculate IoU
         iou = intersection / union if union > 0 else 0
         return iou
+
+
+def load_image(image_path):
+    try:
+        image = Image.open(image_path)
+        image.load()
+        return image
+    except (OSError, ValueError) as e:
+        print(f"Failed to load {image_path}: {e}")
+        return None
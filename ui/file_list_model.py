@@ -0,0 +1,136 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/18 00:10
+# @Author :Pang
+# @File :  file_list_model.py
+# @Description : List model over the image paths of the file list, with in-model filtering and sorting
+
+
+import os
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+
+SORT_KEYS = ('scan', 'name', 'path')
+
+
+class FileListModel(QAbstractListModel):
+    """
+    Image paths in scan order, of which `rows` (indices into paths) are shown.
+
+    Paths can be appended in batches while a folder is still being scanned. Filtering by
+    a file name prefix or substring and sorting only rebuild the `rows` list and emit a
+    layout change, so the view keeps its current item and nothing is created per row.
+    Doing this in the model instead of a QSortFilterProxyModel avoids one Python call
+    per row and comparison, which matters with a million files.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paths = []
+        self.names = []  # Lower case file names, what the filter and the name sort look at
+        self.rows = []
+        # {path: row} of the shown rows, built on first use and dropped whenever the order changes
+        self._path_rows = None
+        self.filter_text = ''
+        self.prefix_only = False
+        self.sort_key = 'scan'
+        self.sort_order = Qt.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.rows):
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.paths[self.rows[index.row()]]
+        return None
+
+    def path(self, row):
+        return self.paths[self.rows[row]]
+
+    def row_of(self, path):
+        """Row of path, or -1 when it is not listed (or filtered out)."""
+        if self._path_rows is None:
+            paths = self.paths
+            self._path_rows = {paths[path_index]: row for row, path_index in enumerate(self.rows)}
+        return self._path_rows.get(path, -1)
+
+    def visible_paths(self):
+        return [self.paths[i] for i in self.rows]
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = []
+        self.names = []
+        self.rows = []
+        self._path_rows = None
+        self.endResetModel()
+        self.append_paths(paths)
+
+    def clear(self):
+        self.set_paths([])
+
+    def append_paths(self, paths):
+        """Add paths at the end of the scan order; with another sort they stay at the end until sort() is called."""
+        if not paths:
+            return
+        first = len(self.paths)
+        self.paths.extend(paths)
+        self.names.extend(os.path.basename(path).lower() for path in paths)
+        new_rows = self.matching(range(first, len(self.paths)))
+        if not new_rows:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(new_rows) - 1)
+        if self._path_rows is not None:
+            self._path_rows.update((self.paths[path_index], row) for row, path_index in
+                                   enumerate(new_rows, start=len(self.rows)))
+        self.rows.extend(new_rows)
+        self.endInsertRows()
+
+    def set_filter(self, text, prefix_only=False):
+        self.filter_text = text.lower()
+        self.prefix_only = prefix_only
+        self.relayout(self.sorted_rows(self.matching(range(len(self.paths)))))
+
+    def sort(self, column=0, order=Qt.AscendingOrder):
+        """Reorder the shown rows by SORT_KEYS[column] ('scan' order, file 'name' or full 'path')."""
+        self.sort_key = SORT_KEYS[column]
+        self.sort_order = order
+        self.relayout(self.sorted_rows(self.rows))
+
+    def matching(self, indices):
+        if not self.filter_text:
+            return list(indices)
+        text = self.filter_text
+        names = self.names
+        if self.prefix_only:
+            return [i for i in indices if names[i].startswith(text)]
+        return [i for i in indices if text in names[i]]
+
+    def sorted_rows(self, rows):
+        keys = {'name': self.names.__getitem__, 'path': self.paths.__getitem__}.get(self.sort_key)
+        return sorted(rows, key=keys, reverse=self.sort_order == Qt.DescendingOrder)
+
+    def relayout(self, rows):
+        """Show rows instead, moving the persistent indexes (current / selected items) along."""
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_paths = [self.rows[index.row()] for index in old_indexes]
+        self.rows = rows
+        self._path_rows = None
+        # Only a handful of persistent indexes, so a linear lookup each is fine
+        positions = {}
+        new_indexes = []
+        for path_index in old_paths:
+            if path_index not in positions:
+                try:
+                    positions[path_index] = rows.index(path_index)
+                except ValueError:
+                    positions[path_index] = -1
+            row = positions[path_index]
+            new_indexes.append(self.index(row, 0) if row >= 0 else QModelIndex())
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
@@ -0,0 +1,128 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 19:05
+# @Author :Pang
+# @File :  image_cache.py
+# @Description : Display resolution image cache with background prefetch of neighbouring files
+
+
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, QRunnable, QSize, QThreadPool, Qt, Signal
+from PySide6.QtGui import QImageReader
+
+
+DEFAULT_BUDGET_MB = 256
+
+
+def decode_scaled(image_path, target_size):
+    """Decode an image no larger than target_size (keeping aspect ratio), returns (QImage, full size)."""
+    reader = QImageReader(image_path)
+    full_size = reader.size()
+    if full_size.isValid():
+        scaled = full_size.scaled(target_size, Qt.KeepAspectRatio)
+        if scaled.width() < full_size.width():
+            # JPEG scales while decoding, the full resolution image is never built
+            reader.setScaledSize(scaled)
+    image = reader.read()
+    if not full_size.isValid():
+        full_size = image.size()
+    return image, full_size
+
+
+class DecodeSignals(QObject):
+    decoded = Signal(str, object, object)
+
+
+class DecodeTask(QRunnable):
+    def __init__(self, image_path, target_size, signals):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.image_path = image_path
+        self.target_size = target_size
+        self.signals = signals
+
+    def run(self):
+        image, full_size = decode_scaled(self.image_path, self.target_size)
+        self.signals.decoded.emit(self.image_path, image, full_size)
+
+
+class ImageCache(QObject):
+    """
+    LRU of decoded images at display resolution, bounded by budget_mb.
+
+    prefetch() decodes files on worker threads (QImage is safe off the GUI thread, QPixmap
+    is not), load() returns a cached image or decodes it right away.
+    """
+    image_ready = Signal(str)
+
+    def __init__(self, parent=None, budget_mb=DEFAULT_BUDGET_MB, workers=2):
+        super().__init__(parent)
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.target_size = QSize(1920, 1080)
+        self.images = OrderedDict()  # path -> (QImage, full size)
+        self.cached_bytes = 0
+        self.pending = {}  # path -> DecodeTask
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(workers)
+        self.signals = DecodeSignals()
+        self.signals.decoded.connect(self._on_decoded)
+
+    def set_target_size(self, size):
+        self.target_size = QSize(max(1, size.width()), max(1, size.height()))
+
+    def get(self, image_path):
+        entry = self.images.get(image_path)
+        if entry is None or not self._fits(*entry):
+            return None
+        self.images.move_to_end(image_path)
+        return entry[0]
+
+    def load(self, image_path):
+        image = self.get(image_path)
+        if image is None:
+            image, full_size = decode_scaled(image_path, self.target_size)
+            if image.isNull():
+                return None
+            self._store(image_path, image, full_size)
+        return image
+
+    def prefetch(self, image_paths):
+        """Decode image_paths in the background, nearest first; queued work for other files is dropped."""
+        wanted = set(image_paths)
+        for image_path, task in list(self.pending.items()):
+            if image_path not in wanted and self.pool.tryTake(task):
+                del self.pending[image_path]
+
+        for priority, image_path in enumerate(reversed(image_paths)):
+            if image_path in self.pending or self.get(image_path) is not None:
+                continue
+            task = DecodeTask(image_path, QSize(self.target_size), self.signals)
+            self.pending[image_path] = task
+            self.pool.start(task, priority)
+
+    def clear(self):
+        self.images.clear()
+        self.cached_bytes = 0
+
+    def _fits(self, image, full_size):
+        # Images decoded for a smaller window are not sharp enough any more
+        needed = full_size.scaled(self.target_size, Qt.KeepAspectRatio)
+        return image.width() >= min(needed.width(), full_size.width()) - 1
+
+    def _on_decoded(self, image_path, image, full_size):
+        self.pending.pop(image_path, None)
+        if image.isNull():
+            print(f"Failed to prefetch {image_path}")
+            return
+        self._store(image_path, image, full_size)
+        self.image_ready.emit(image_path)
+
+    def _store(self, image_path, image, full_size):
+        old = self.images.pop(image_path, None)
+        if old is not None:
+            self.cached_bytes -= old[0].sizeInBytes()
+        self.images[image_path] = (image, full_size)
+        self.cached_bytes += image.sizeInBytes()
+        while self.cached_bytes > self.budget_bytes and len(self.images) > 1:
+            _, (evicted, _) = self.images.popitem(last=False)
+            self.cached_bytes -= evicted.sizeInBytes()
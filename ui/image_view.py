@@ -9,6 +9,15 @@ from PySide6.QtWidgets import (QLabel)
 from PySide6.QtCore import Qt, QRectF, Signal, QPointF
 from PySide6.QtGui import QPixmap, QPainter, QPen, QColor, QBrush, QPolygonF, QFont, QCursor
 
+from tools.label_store import ImageLabels
+from tools.spatial_index import LabelIndex
+from ui.tile_pyramid import TilePyramid
+
+
+MAX_PIXEL_ZOOM = 16  # Screen pixels per image pixel at the highest zoom
+ZOOM_STEP = 1.25
+CULL_MARGIN = 50  # Screen pixels around the viewport whose labels are still drawn (label text)
+
 
 class ImageView(QLabel):
     label_selected = Signal(int, str)  # Signal to emit when a label is selected
@@ -19,11 +28,14 @@ class ImageView(QLabel):
     def __init__(self):
         super().__init__()
         self.setAlignment(Qt.AlignCenter)
-        self.pixmap = None
-        self.scaled_pixmap = None
-        self.box_labels = []
-        self.polygon_labels = []
-        self.point_labels = []
+        self.pyramid = None
+        # 1.0 fits the whole image into the widget, pan moves the image centre in screen pixels
+        self.zoom = 1.0
+        self.pan = QPointF(0, 0)
+        self.pan_start = None
+        self.box_labels = ImageLabels('box')
+        self.polygon_labels = ImageLabels('polygon')
+        self.point_labels = ImageLabels('point')
         self.visible_box_labels = set()
         self.visible_polygon_labels = set()
         self.visible_point_labels = set()
@@ -44,23 +56,68 @@ class ImageView(QLabel):
         self.setMouseTracking(True)
         self.drawing_complete = False
 
+        # Screen-space geometry of the labels, valid for one display size
+        self.geometry_cache = {}
+        self.geometry_cache_size = None
+
+        # Offscreen image + committed labels, the drawing preview is composited on top of it
+        self.static_layer = None
+        self.static_layer_dirty = True
+
+        # Grid indexes over normalized label bounds for hit-testing, built on the first click
+        self.label_indexes = {}
+
     def set_active_label_type(self, label_type):
         """Set the current active label type"""
         self.active_label_type = label_type
-        self.update()
-
-    def load_image(self, image_path):
-        self.pixmap = QPixmap(image_path)
-        self.update_scaled_pixmap()
-
-    def update_scaled_pixmap(self):
-        if self.pixmap:
-            self.scaled_pixmap = self.pixmap.scaled(
-                self.size(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            self.update()
+        self.invalidate_layer()
+
+    def load_image(self, image_path, preview=None):
+        # Only the header is read here, tiles are decoded when they are first painted.
+        # preview is an already decoded display resolution QImage that covers the fitted view
+        self.pyramid = TilePyramid(image_path, preview=preview)
+        if not self.pyramid.is_valid():
+            self.pyramid = None
+        self.reset_view()
+
+    def set_preview(self, image):
+        if self.pyramid:
+            self.pyramid.set_preview(image)
+            self.invalidate_layer()
+
+    def reset_view(self):
+        self.zoom = 1.0
+        self.pan = QPointF(0, 0)
+        self.invalidate_layer()
+
+    def display_rect(self):
+        """Rectangle of the whole image in widget coordinates at the current zoom and pan."""
+        size = self.pyramid.size
+        scale = min(self.width() / size.width(), self.height() / size.height()) * self.zoom
+        width, height = size.width() * scale, size.height() * scale
+        return QRectF((self.width() - width) / 2 + self.pan.x(), (self.height() - height) / 2 + self.pan.y(),
+                      width, height)
+
+    def set_zoom(self, zoom, anchor):
+        """Zoom keeping the image point under the widget position `anchor` in place."""
+        size = self.pyramid.size
+        fit_scale = min(self.width() / size.width(), self.height() / size.height())
+        zoom = min(max(zoom, 1.0), max(1.0, MAX_PIXEL_ZOOM / fit_scale))
+        x, y = self.map_to_image(anchor)
+
+        self.zoom = zoom
+        width, height = size.width() * fit_scale * zoom, size.height() * fit_scale * zoom
+        self.pan = QPointF(anchor.x() - x * width - (self.width() - width) / 2,
+                           anchor.y() - y * height - (self.height() - height) / 2)
+        self.clamp_pan()
+        self.invalidate_layer()
+
+    def clamp_pan(self):
+        # The image can not be dragged out of view, a smaller-than-widget axis stays centred
+        rect = self.display_rect()
+        limit_x = max(0.0, (rect.width() - self.width()) / 2)
+        limit_y = max(0.0, (rect.height() - self.height()) / 2)
+        self.pan = QPointF(min(max(self.pan.x(), -limit_x), limit_x), min(max(self.pan.y(), -limit_y), limit_y))
 
     def set_labels(self, box_labels, polygon_labels, point_labels, class_colors, class_names):
         self.box_labels = box_labels
@@ -73,70 +130,141 @@ class ImageView(QLabel):
         self.visible_polygon_labels = set(range(len(self.polygon_labels)))
         self.visible_point_labels = set(range(len(self.point_labels)))
 
+        self.invalidate_geometry()
+        self.label_indexes.clear()
+        self.invalidate_layer()
+
+    def invalidate_layer(self):
+        """Rebuild the static layer on the next repaint (labels, visibility, selection or size changed)."""
+        self.static_layer_dirty = True
         self.update()
 
-    def set_label_visibility(self, label_index, is_visible, label_type):
-        if label_type == 'box':
-            if is_visible:
-                self.visible_box_labels.add(label_index)
-            else:
-                self.visible_box_labels.discard(label_index)
-        elif label_type == 'polygon':
-            if is_visible:
-                self.visible_polygon_labels.add(label_index)
-            else:
-                self.visible_polygon_labels.discard(label_index)
-        elif label_type == 'point':
-            if is_visible:
-                self.visible_point_labels.add(label_index)
+    def refresh(self):
+        self.invalidate_layer()
+
+    def labels_changed(self, label_type=None):
+        """Call after labels were added, edited or deleted in place."""
+        self.invalidate_geometry(label_type)
+        if label_type is None:
+            self.label_indexes.clear()
+        else:
+            self.label_indexes.pop(label_type, None)
+        self.invalidate_layer()
+
+    def label_appended(self, label_type):
+        """Call after a label was appended to the labels of label_type."""
+        labels = self.labels_of(label_type)
+        index = self.label_indexes.get(label_type)
+        if index is not None and len(index) == len(labels) - 1:
+            index.append(labels[-1])
+        else:
+            self.label_indexes.pop(label_type, None)
+        self.invalidate_layer()
+
+    def label_removed(self, label_type, label_index):
+        """Call after the label at label_index was deleted from the labels of label_type."""
+        index = self.label_indexes.get(label_type)
+        if index is not None and len(index) == len(self.labels_of(label_type)) + 1:
+            index.remove(label_index)
+        else:
+            self.label_indexes.pop(label_type, None)
+        # Later labels moved down by one, their cached geometry is keyed by the old index
+        self.invalidate_geometry(label_type)
+        self.invalidate_layer()
+
+    def labels_of(self, label_type):
+        return {'box': self.box_labels, 'polygon': self.polygon_labels, 'point': self.point_labels}[label_type]
+
+    def label_index(self, label_type):
+        index = self.label_indexes.get(label_type)
+        if index is None:
+            index = self.label_indexes[label_type] = LabelIndex(label_type, self.labels_of(label_type))
+        return index
+
+    def invalidate_geometry(self, label_type=None):
+        if label_type is None:
+            self.geometry_cache.clear()
+        else:
+            for key in [key for key in self.geometry_cache if key[0] == label_type]:
+                del self.geometry_cache[key]
+
+    def label_geometry(self, label_type, index):
+        """Cached QRectF / QPolygonF / QPointF of a label, relative to the top-left of the displayed image."""
+        size = self.display_rect().size()
+        if size != self.geometry_cache_size:
+            self.geometry_cache.clear()
+            self.geometry_cache_size = size
+
+        key = (label_type, index)
+        geometry = self.geometry_cache.get(key)
+        if geometry is None:
+            # Read straight from the label arrays, no label dict is built
+            labels = self.labels_of(label_type)
+            if label_type == 'box':
+                geometry = QRectF(*self.scale_bbox(labels.coords[index].tolist(), self.pyramid.size, size))
+            elif label_type == 'polygon':
+                scaled = labels.vertices_of(index) * (size.width(), size.height())
+                geometry = QPolygonF([QPointF(x, y) for x, y in scaled.tolist()])
             else:
-                self.visible_point_labels.discard(label_index)
-        self.update()
+                geometry = QPointF(*self.scale_point(labels.coords[index].tolist(), self.pyramid.size, size))
+            self.geometry_cache[key] = geometry
+        return geometry
+
+    def visible_labels_of(self, label_type):
+        return {'box': self.visible_box_labels, 'polygon': self.visible_polygon_labels,
+                'point': self.visible_point_labels}[label_type]
+
+    def set_labels_visibility(self, label_type, label_indices, is_visible):
+        """Show or hide many labels of one type with a single repaint."""
+        visible = self.visible_labels_of(label_type)
+        if is_visible:
+            visible.update(label_indices)
+        else:
+            visible.difference_update(label_indices)
+        self.invalidate_layer()
+
+    def set_visible_labels(self, visible_labels):
+        """Replace the visible indices of the label types in visible_labels ({type: indices}), one repaint."""
+        for label_type, label_indices in visible_labels.items():
+            setattr(self, f"visible_{label_type}_labels", set(label_indices))
+        self.invalidate_layer()
+
+    def set_label_visibility(self, label_index, is_visible, label_type):
+        self.set_labels_visibility(label_type, [label_index], is_visible)
 
     def set_selected_label(self, label_index, label_type):
         if label_type == 'polygon' and self.selected_polygon_label != label_index:
             self.selected_polygon_label = label_index
             self.label_selected.emit(label_index, 'polygon')
-            self.update()
+            self.invalidate_layer()
         elif label_type == 'box' and self.selected_box_label != label_index:
             self.selected_box_label = label_index
             self.label_selected.emit(label_index, 'box')
-            self.update()
+            self.invalidate_layer()
         elif label_type == 'point' and self.selected_point_label != label_index:
             self.selected_point_label = label_index
             self.label_selected.emit(label_index, 'point')
-            self.update()
+            self.invalidate_layer()
         elif label_type is None:
             if self.selected_polygon_label is not None or self.selected_box_label is not None or self.selected_point_label is not None:
                 self.selected_polygon_label = None
                 self.selected_box_label = None
                 self.selected_point_label = None
                 self.label_selected.emit(-1, 'none')
+                self.invalidate_layer()
 
     def paintEvent(self, event):
         super().paintEvent(event)
-        if self.scaled_pixmap:
+        if self.pyramid:
             painter = QPainter(self)
 
-            x = (self.width() - self.scaled_pixmap.width()) // 2
-            y = (self.height() - self.scaled_pixmap.height()) // 2
-
-            painter.drawPixmap(x, y, self.scaled_pixmap)
-
-            if self.active_label_type in [None, 'box']:
-                for i, label in enumerate(self.box_labels):
-                    if i in self.visible_box_labels:
-                        self.draw_box_label(painter, label, i, x, y)
-
-            if self.active_label_type in [None, 'polygon']:
-                for i, label in enumerate(self.polygon_labels):
-                    if i in self.visible_polygon_labels:
-                        self.draw_polygon_label(painter, label, i, x, y)
+            rect = self.display_rect()
+            x, y = rect.x(), rect.y()
 
-            if self.active_label_type in [None, 'point']:
-                for i, label in enumerate(self.point_labels):
-                    if i in self.visible_point_labels:
-                        self.draw_point_label(painter, label, i, x, y)
+            if self.static_layer_dirty or self.static_layer is None or \
+                    self.static_layer.deviceIndependentSize().toSize() != self.size():
+                self.render_static_layer(rect)
+            painter.drawPixmap(0, 0, self.static_layer)
 
             # Draw current item being drawn
             if self.drawing and self.points:
@@ -158,42 +286,93 @@ class ImageView(QLabel):
 
             painter.end()
 
-    def draw_point_label(self, painter, label, index, x_offset, y_offset):
-        color = self.class_colors.get(label['class_id'], QColor(255, 0, 0))
-        point = label.get('point')
-        if not point:
+    def render_static_layer(self, rect):
+        ratio = self.devicePixelRatioF()
+        self.static_layer = QPixmap(self.size() * ratio)
+        self.static_layer.setDevicePixelRatio(ratio)
+        self.static_layer.fill(Qt.transparent)
+
+        painter = QPainter(self.static_layer)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        viewport = QRectF(self.rect()).intersected(rect)
+        if not viewport.isEmpty():
+            self.draw_tiles(painter, rect, viewport, ratio)
+
+        # Cached label geometry is relative to the image, so draw the labels in image coordinates
+        painter.translate(rect.x(), rect.y())
+        margin = QRectF(self.rect()).adjusted(-CULL_MARGIN, -CULL_MARGIN, CULL_MARGIN, CULL_MARGIN)
+        bounds = ((margin.left() - rect.x()) / rect.width(), (margin.top() - rect.y()) / rect.height(),
+                  (margin.right() - rect.x()) / rect.width(), (margin.bottom() - rect.y()) / rect.height())
+        if self.active_label_type in [None, 'box']:
+            for i in self.labels_in_view('box', bounds):
+                if i in self.visible_box_labels:
+                    self.draw_box_label(painter, i, 0, 0)
+
+        if self.active_label_type in [None, 'polygon']:
+            for i in self.labels_in_view('polygon', bounds):
+                if i in self.visible_polygon_labels:
+                    self.draw_polygon_label(painter, i, 0, 0)
+
+        if self.active_label_type in [None, 'point']:
+            for i in self.labels_in_view('point', bounds):
+                if i in self.visible_point_labels:
+                    self.draw_point_label(painter, i, 0, 0)
+        painter.end()
+        self.static_layer_dirty = False
+
+    def draw_tiles(self, painter, rect, viewport, ratio):
+        preview = self.pyramid.preview
+        if preview is not None and preview.width() >= rect.width() * ratio - 1:
+            painter.drawPixmap(rect, preview, QRectF(preview.rect()))
             return
 
-        scaled_point = self.scale_point(point, self.pixmap.size(), self.scaled_pixmap.size())
-        x, y = scaled_point
-        x += x_offset
-        y += y_offset
+        # Pick the pyramid level matching the device pixel scale, decode only the tiles in view
+        level = self.pyramid.level_for(rect.width() / self.pyramid.size.width() * ratio)
+        level_size = self.pyramid.level_size(level)
+        scale = rect.width() / level_size.width()
+        visible = QRectF((viewport.x() - rect.x()) / scale, (viewport.y() - rect.y()) / scale,
+                         viewport.width() / scale, viewport.height() / scale)
+        for tile_rect, pixmap in self.pyramid.tiles_in(level, visible):
+            target = QRectF(rect.x() + tile_rect.x() * scale, rect.y() + tile_rect.y() * scale,
+                            tile_rect.width() * scale, tile_rect.height() * scale)
+            painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def labels_in_view(self, label_type, bounds):
+        """Indices of the labels overlapping the normalized bounds, in list order."""
+        min_x, min_y, max_x, max_y = bounds
+        if min_x <= 0 and min_y <= 0 and max_x >= 1 and max_y >= 1:
+            return range(len(self.labels_of(label_type)))
+        return self.label_index(label_type).candidates(min_x, min_y, max_x, max_y)
+
+    def draw_point_label(self, painter, index, x_offset, y_offset):
+        class_id = int(self.point_labels.class_ids[index])
+        color = self.class_colors.get(class_id, QColor(255, 0, 0))
+
+        scaled_point = self.label_geometry('point', index)
+        x = scaled_point.x() + x_offset
+        y = scaled_point.y() + y_offset
 
         if index == self.selected_point_label:
             painter.setPen(QPen(color, 6, Qt.PenStyle.SolidLine))  # Thicker when selected
         else:
             painter.setPen(QPen(color, 2, Qt.PenStyle.SolidLine))  # Increase default thickness
 
-        painter.drawPoint(x, y)
+        painter.drawPoint(QPointF(x, y))
 
         # Draw a circle to increase visibility
-        painter.drawEllipse(x - 3, y - 3, 6, 6)
+        painter.drawEllipse(QRectF(x - 3, y - 3, 6, 6))
 
         # Draw label text next to the point
         painter.setPen(QPen(color, 1))
         painter.setFont(QFont('Arial', 8))
-        label_text = f"{self.class_names.get(label['class_id'], str(label['class_id']))} {index}"
-        painter.drawText(x + 5, y + 5, label_text)
+        label_text = f"{self.class_names.get(class_id, str(class_id))} {index}"
+        painter.drawText(QPointF(x + 5, y + 5), label_text)
 
-    def draw_box_label(self, painter, label, index, x_offset, y_offset):
-        color = self.class_colors.get(label['class_id'], QColor(255, 0, 0))
+    def draw_box_label(self, painter, index, x_offset, y_offset):
+        color = self.class_colors.get(int(self.box_labels.class_ids[index]), QColor(255, 0, 0))
         painter.setPen(QPen(color, 2, Qt.PenStyle.SolidLine))
 
-        bbox = label['bbox']
-        scaled_bbox = self.scale_bbox(bbox, self.pixmap.size(), self.scaled_pixmap.size())
-
-        rect = QRectF(x_offset + scaled_bbox[0], y_offset + scaled_bbox[1],
-                      scaled_bbox[2], scaled_bbox[3])
+        rect = self.label_geometry('box', index).translated(x_offset, y_offset)
 
         painter.drawRect(rect)
 
@@ -202,16 +381,16 @@ class ImageView(QLabel):
             transparent_color.setAlpha(128)
             painter.fillRect(rect, QBrush(transparent_color))
 
-    def draw_polygon_label(self, painter, label, index, x_offset, y_offset):
-        color = self.class_colors.get(label['class_id'], QColor(255, 0, 0))
+    def draw_polygon_label(self, painter, index, x_offset, y_offset):
+        color = self.class_colors.get(int(self.polygon_labels.class_ids[index]), QColor(255, 0, 0))
         painter.setPen(QPen(color, 2, Qt.PenStyle.SolidLine))
 
-        polygon = label.get('polygon')
-        scaled_polygon = self.scale_polygon(polygon, self.pixmap.size(), self.scaled_pixmap.size())
-        if not scaled_polygon:
+        if len(self.polygon_labels.vertices_of(index)) == 0:
             return
 
-        qt_polygon = QPolygonF([QPointF(x_offset + p[0], y_offset + p[1]) for p in scaled_polygon])
+        qt_polygon = self.label_geometry('polygon', index)
+        if x_offset or y_offset:
+            qt_polygon = qt_polygon.translated(x_offset, y_offset)
 
         # Draw polygon outline
         painter.drawPolygon(qt_polygon)
@@ -251,6 +430,9 @@ class ImageView(QLabel):
         return (x * x_scale * original_size.width(), y * y_scale * original_size.height())
 
     def mousePressEvent(self, event):
+        if event.button() in (Qt.MiddleButton, Qt.RightButton) and self.pyramid:
+            self.pan_start = (event.position(), QPointF(self.pan))
+            return
         if self.drawing:
             point = self.map_to_image(event.position())
             self.add_point(point)
@@ -270,39 +452,22 @@ class ImageView(QLabel):
             # Selection logic
             # Call the parent class mousePressEvent if needed
             super().mousePressEvent(event)
-            if not self.pixmap or not self.active_label_type:
+            if not self.pyramid or not self.active_label_type:
                 return
 
-            x = event.position().x() - (self.width() - self.scaled_pixmap.width()) // 2
-            y = event.position().y() - (self.height() - self.scaled_pixmap.height()) // 2
-
+            # Hit-test in normalized image coordinates, boxes first, then polygons, then points
+            rect = self.display_rect()
+            scale = (rect.width(), rect.height())
+            x, y = self.map_to_image(event.position())
             selected = False
-            if self.active_label_type in [None, 'box']:
-                for i, label in enumerate(self.box_labels):
-                    if i in self.visible_box_labels:
-                        bbox = self.scale_bbox(label['bbox'], self.pixmap.size(), self.scaled_pixmap.size())
-                        if (bbox[0] <= x <= bbox[0] + bbox[2] and bbox[1] <= y <= bbox[1] + bbox[3]):
-                            self.set_selected_label(i, 'box')
-                            selected = True
-                            break
-
-            if not selected and self.active_label_type in [None, 'polygon']:
-                for i, label in enumerate(self.polygon_labels):
-                    if i in self.visible_polygon_labels:
-                        polygon = self.scale_polygon(label['polygon'], self.pixmap.size(), self.scaled_pixmap.size())
-                        if self.point_inside_polygon(x, y, polygon):
-                            self.set_selected_label(i, 'polygon')
-                            selected = True
-                            break
-
-            if not selected and self.active_label_type in [None, 'point']:
-                for i, label in enumerate(self.point_labels):
-                    if i in self.visible_point_labels:
-                        point = self.scale_point(label['point'], self.pixmap.size(), self.scaled_pixmap.size())
-                        if self.point_near_point(x, y, point):
-                            self.set_selected_label(i, 'point')
-                            selected = True
-                            break
+            for label_type in ['box', 'polygon', 'point']:
+                if self.active_label_type not in [None, label_type]:
+                    continue
+                hit = self.label_index(label_type).hit(x, y, scale, self.visible_labels_of(label_type))
+                if hit is not None:
+                    self.set_selected_label(hit, label_type)
+                    selected = True
+                    break
 
             if not selected:
                 self.set_selected_label(None, None)
@@ -329,21 +494,30 @@ class ImageView(QLabel):
         return ((x - point[0]) ** 2 + (y - point[1]) ** 2) <= threshold ** 2
 
     def resizeEvent(self, event):
-        self.update_scaled_pixmap()
+        if self.pyramid:
+            self.clamp_pan()
+        self.invalidate_layer()
+
+    def wheelEvent(self, event):
+        if not self.pyramid:
+            return super().wheelEvent(event)
+        self.set_zoom(self.zoom * ZOOM_STEP ** (event.angleDelta().y() / 120), event.position())
+
+    def mouseDoubleClickEvent(self, event):
+        if event.button() == Qt.MiddleButton:
+            self.reset_view()
+        else:
+            super().mouseDoubleClickEvent(event)
 
     def sizeHint(self):
-        if self.pixmap:
-            return self.pixmap.size()
+        if self.pyramid:
+            return self.pyramid.size
         return super().sizeHint()
 
     def is_label_visible(self, label_index, label_type):
-        if label_type == 'box':
-            return label_index in self.visible_box_labels
-        elif label_type == 'polygon':
-            return label_index in self.visible_polygon_labels
-        elif label_type == 'point':
-            return label_index in self.visible_point_labels
-        return False
+        if label_type not in ['box', 'polygon', 'point']:
+            return False
+        return label_index in self.visible_labels_of(label_type)
 
     # drawing
 
@@ -366,10 +540,15 @@ class ImageView(QLabel):
         self.current_item = None
         self.current_preview = None
         self.setCursor(self.create_crosshair_cursor())
-        self.update()
+        self.invalidate_layer()
 
     def mouseMoveEvent(self, event):
-        if self.drawing:
+        if self.pan_start is not None:
+            start, pan = self.pan_start
+            self.pan = pan + event.position() - start
+            self.clamp_pan()
+            self.invalidate_layer()
+        elif self.drawing:
             current_point = self.map_to_image(event.position())
             if self.active_label_type == "Box" and self.points:
                 if len(self.points) == 1:
@@ -383,7 +562,9 @@ class ImageView(QLabel):
             super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event):
-        if self.drawing and not self.drawing_complete:
+        if self.pan_start is not None and event.button() in (Qt.MiddleButton, Qt.RightButton):
+            self.pan_start = None
+        elif self.drawing and not self.drawing_complete:
             if self.active_label_type == "Box" and len(self.points) == 1:
                 self.current_item = self.points + [self.map_to_image(event.position())]
             self.update()
@@ -431,13 +612,15 @@ class ImageView(QLabel):
 
 
     def map_to_image(self, point):
-        x = (point.x() - (self.width() - self.scaled_pixmap.width()) // 2) / self.scaled_pixmap.width()
-        y = (point.y() - (self.height() - self.scaled_pixmap.height()) // 2) / self.scaled_pixmap.height()
+        rect = self.display_rect()
+        x = (point.x() - rect.x()) / rect.width()
+        y = (point.y() - rect.y()) / rect.height()
         return (x, y)
 
     def draw_point(self, painter, point, x_offset, y_offset):
-        scaled_point = (point[0] * self.scaled_pixmap.width() + x_offset,
-                        point[1] * self.scaled_pixmap.height() + y_offset)
+        rect = self.display_rect()
+        scaled_point = (point[0] * rect.width() + x_offset,
+                        point[1] * rect.height() + y_offset)
         painter.setPen(QPen(Qt.red, 6))
         painter.drawPoint(QPointF(*scaled_point))
 
@@ -448,11 +631,12 @@ class ImageView(QLabel):
                 self.draw_point(painter, box[0], x_offset, y_offset)
             return
 
+        rect = self.display_rect()
         scaled_box = [
-            (box[0][0] * self.scaled_pixmap.width() + x_offset,
-             box[0][1] * self.scaled_pixmap.height() + y_offset),
-            (box[1][0] * self.scaled_pixmap.width() + x_offset,
-             box[1][1] * self.scaled_pixmap.height() + y_offset)
+            (box[0][0] * rect.width() + x_offset,
+             box[0][1] * rect.height() + y_offset),
+            (box[1][0] * rect.width() + x_offset,
+             box[1][1] * rect.height() + y_offset)
         ]
         painter.setPen(QPen(Qt.red, 2))
         painter.drawRect(QRectF(QPointF(*scaled_box[0]), QPointF(*scaled_box[1])))
@@ -461,9 +645,10 @@ class ImageView(QLabel):
         if not polygon:
             return
 
+        rect = self.display_rect()
         scaled_polygon = [
-            (p[0] * self.scaled_pixmap.width() + x_offset,
-             p[1] * self.scaled_pixmap.height() + y_offset)
+            (p[0] * rect.width() + x_offset,
+             p[1] * rect.height() + y_offset)
             for p in polygon
         ]
         painter.setPen(QPen(Qt.red, 2))
@@ -484,8 +669,9 @@ class ImageView(QLabel):
     def draw_guide_lines(self, painter):
         if self.current_item:
             last_point = self.current_item[-1] if isinstance(self.current_item, list) else self.current_item[1]
-            x = last_point[0] * self.scaled_pixmap.width() + (self.width() - self.scaled_pixmap.width()) // 2
-            y = last_point[1] * self.scaled_pixmap.height() + (self.height() - self.scaled_pixmap.height()) // 2
+            rect = self.display_rect()
+            x = last_point[0] * rect.width() + rect.x()
+            y = last_point[1] * rect.height() + rect.y()
 
             painter.setPen(QPen(Qt.gray, 1, Qt.DashLine))
             painter.drawLine(0, y, self.width(), y)
@@ -0,0 +1,127 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 10:55
+# @Author :Pang
+# @File :  job_queue.py
+# @Description : Background queue for SAM / YOLO inference jobs
+
+
+import itertools
+import traceback
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class JobSignals(QObject):
+    started = Signal(int)
+    finished = Signal(int, object)
+    failed = Signal(int, str)
+
+
+class InferenceJob(QRunnable):
+    def __init__(self, job_id, description, fn, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.job_id = job_id
+        self.description = description
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.signals = JobSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.cancelled:
+            return
+        self.signals.started.emit(self.job_id)
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, result)
+
+
+class JobQueue(QObject):
+    """Runs inference jobs off the GUI thread and reports their state as status text."""
+    status_changed = Signal(str)
+
+    def __init__(self, parent=None, max_workers=1):
+        super().__init__(parent)
+        # Models are shared through the registry, so jobs run one at a time by default
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.jobs = {}  # job_id -> (job, on_finished, on_failed)
+        self.running = set()
+        self.completed = 0
+        self._ids = itertools.count(1)
+
+    def submit(self, description, fn, *args, on_finished=None, on_failed=None, **kwargs):
+        job_id = next(self._ids)
+        job = InferenceJob(job_id, description, fn, args, kwargs)
+        job.signals.started.connect(self._on_started)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.failed.connect(self._on_failed)
+        self.jobs[job_id] = (job, on_finished, on_failed)
+        self.pool.start(job)
+        self._report()
+        return job_id
+
+    def cancel(self, job_id):
+        entry = self.jobs.get(job_id)
+        if entry is None:
+            return
+        job = entry[0]
+        job.cancel()
+        if job_id not in self.running and self.pool.tryTake(job):
+            del self.jobs[job_id]
+        self._report()
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def pending_count(self):
+        return len(self.jobs)
+
+    def _on_started(self, job_id):
+        self.running.add(job_id)
+        self._report()
+
+    def _on_finished(self, job_id, result):
+        job, on_finished, _ = self._pop(job_id)
+        if job is not None and not job.cancelled and on_finished:
+            on_finished(result)
+        self._report()
+
+    def _on_failed(self, job_id, message):
+        job, _, on_failed = self._pop(job_id)
+        if job is not None and not job.cancelled and on_failed:
+            on_failed(message)
+        self._report()
+
+    def _pop(self, job_id):
+        self.running.discard(job_id)
+        entry = self.jobs.pop(job_id, None)
+        if entry is None:
+            return None, None, None
+        self.completed += 1
+        return entry
+
+    def _report(self):
+        if not self.jobs:
+            self.completed = 0
+            self.status_changed.emit("Ready")
+            return
+
+        running = [self.jobs[i][0].description for i in self.running if i in self.jobs]
+        total = self.completed + len(self.jobs)
+        text = f"Job {self.completed + 1}/{total}"
+        if running:
+            text += f": {running[0]}"
+        queued = len(self.jobs) - len(running)
+        if queued:
+            text += f" ({queued} queued)"
+        self.status_changed.emit(text)
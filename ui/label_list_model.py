@@ -0,0 +1,164 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 19:40
+# @Author :Pang
+# @File :  label_list_model.py
+# @Description : List model over the labels of the current image, for the All / Point / Box / Polygon tabs
+
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, Signal
+from PySide6.QtGui import QColor
+
+from tools.label_store import ImageLabels
+
+
+class LabelListModel(QAbstractListModel):
+    """
+    One row per label of the given label types, in label_types order.
+
+    Rows are read from the label lists on demand, so a view only formats the rows it
+    shows. The stock item delegate paints the visibility check box from CheckStateRole
+    and the class colour from DecorationRole; toggling the check box emits
+    visibility_changed instead of changing anything here. Labels of the shown image are
+    added and deleted through append_labels / remove_label, which insert and remove the
+    rows around the change in every linked model.
+    """
+    visibility_changed = Signal(int, bool, str)
+
+    def __init__(self, label_types, parent=None):
+        super().__init__(parent)
+        self.label_types = list(label_types)
+        self.labels = {label_type: ImageLabels(label_type) for label_type in self.label_types}
+        self.visibility = {label_type: set() for label_type in self.label_types}
+        self.class_names = {}
+        self.class_colors = {}
+        self.linked = [self]
+
+    def set_labels(self, labels, visibility, class_names, class_colors):
+        """labels / visibility map a label type to the image's label list / visible indices (shared, not copied)."""
+        self.beginResetModel()
+        self.labels = {label_type: labels[label_type] if label_type in labels else ImageLabels(label_type)
+                       for label_type in self.label_types}
+        self.visibility = visibility
+        self.class_names = class_names
+        self.class_colors = class_colors
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return sum(len(self.labels[label_type]) for label_type in self.label_types)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        label_type, label_index = self.label_at(index.row())
+        if label_type is None:
+            return None
+
+        if role == Qt.DisplayRole:
+            class_id = int(self.labels[label_type].class_ids[label_index])
+            class_name = self.class_names.get(class_id, str(class_id))
+            return f"{class_name} ({label_type.capitalize()} Label {label_index})"
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if label_index in self.visibility.get(label_type, ()) else Qt.Unchecked
+        if role == Qt.DecorationRole:
+            class_id = int(self.labels[label_type].class_ids[label_index])
+            return self.class_colors.get(class_id, QColor(255, 0, 0))
+        if role == Qt.UserRole:
+            return label_type, label_index
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        label_type, label_index = self.label_at(index.row())
+        self.visibility_changed.emit(label_index, Qt.CheckState(value) == Qt.Checked, label_type)
+        return True
+
+    def label_at(self, row):
+        """(label type, index in that type's list) of a row."""
+        for label_type in self.label_types:
+            count = len(self.labels[label_type])
+            if row < count:
+                return label_type, row
+            row -= count
+        return None, None
+
+    def row_of(self, label_type, label_index):
+        if label_type not in self.labels or not 0 <= label_index < len(self.labels[label_type]):
+            return -1
+        return self._offset(label_type) + label_index
+
+    def index_of(self, label_type, label_index):
+        row = self.row_of(label_type, label_index)
+        return self.index(row) if row >= 0 else QModelIndex()
+
+    def link(self, *models):
+        """Models showing the same label lists, rows added or removed through one are announced by all."""
+        linked = [self, *models]
+        for model in linked:
+            model.linked = linked
+
+    # The label lists and visible indices of the shown image are only changed through these, between the
+    # begin and end calls of every linked model
+
+    def append_labels(self, label_type, labels):
+        """Append labels to the label list of label_type, they are shown as visible."""
+        labels = list(labels)
+        models = [model for model in self.linked if label_type in model.labels]
+        if not labels or not models:
+            return
+        label_list = models[0].labels[label_type]
+        first = len(label_list)
+        for model in models:
+            offset = model._offset(label_type)
+            model.beginInsertRows(QModelIndex(), offset + first, offset + first + len(labels) - 1)
+        label_list.extend(labels)
+        self.visibility.setdefault(label_type, set()).update(range(first, len(label_list)))
+        for model in models:
+            model.endInsertRows()
+
+    def remove_label(self, label_type, label_index):
+        """Delete the label at label_index, later labels (and their visibility) move up by one."""
+        models = [model for model in self.linked if label_type in model.labels]
+        if not models or not 0 <= label_index < len(models[0].labels[label_type]):
+            return False
+        label_list = models[0].labels[label_type]
+        for model in models:
+            row = model._offset(label_type) + label_index
+            model.beginRemoveRows(QModelIndex(), row, row)
+        del label_list[label_index]
+        # Shifted in place, the set is shared with the window and the other models
+        visible = self.visibility.setdefault(label_type, set())
+        shifted = {i if i < label_index else i - 1 for i in visible if i != label_index}
+        visible.clear()
+        visible.update(shifted)
+        for model in models:
+            model.endRemoveRows()
+        # The remaining rows of this type show their new index
+        for model in models:
+            model.labels_changed(label_type, range(label_index, len(label_list)))
+        return True
+
+    def labels_changed(self, label_type, label_indices):
+        """Repaint the rows of label_indices (text, class colour or check state changed)."""
+        if label_type not in self.labels:
+            return
+        count = len(self.labels[label_type])
+        label_indices = [label_index for label_index in label_indices if 0 <= label_index < count]
+        if label_indices:
+            offset = self._offset(label_type)
+            self.dataChanged.emit(self.index(offset + min(label_indices)), self.index(offset + max(label_indices)))
+
+    def _offset(self, label_type):
+        offset = 0
+        for other in self.label_types:
+            if other == label_type:
+                break
+            offset += len(self.labels[other])
+        return offset
@@ -0,0 +1,189 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 23:45
+# @Author :Pang
+# @File :  label_watcher.py
+# @Description : Watch a label folder for changes made by other programs and re-read only the changed files
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal
+
+from tools import label_io
+from tools.label_backend import FolderBackend
+from tools.label_loader import LABEL_TYPES, snapshot_folder
+
+
+class LabelWatcher(QObject):
+    """
+    Watches the Box / Polygon / Point folders and classes.txt of a label folder backend.
+
+    Folder notifications cover files that are created, deleted or replaced. Files edited in
+    place only notify themselves, so the label files of the current image (watch_image) are
+    watched too. Notifications are collected for `delay` ms, then the changed folders are
+    listed on a background thread; only new, deleted or replaced (new inode) files are
+    stat'ed and only those whose mtime or size changed are read again. Files the backend
+    wrote itself are skipped. Project databases are not watched.
+    """
+
+    labels_changed = Signal(object, object)  # backend, [(label type, image name, ImageLabels or None if deleted)]
+    classes_changed = Signal(object, object)  # backend, {class id: name}
+
+    def __init__(self, parent=None, delay=300):
+        super().__init__(parent)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_path_changed)
+        self.watcher.fileChanged.connect(self.on_path_changed)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.check_changes)
+        self.backend = None
+        self.image_name = None
+        self.dirty = set()
+        # One thread, so the snapshots are only touched by one scan at a time
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.snapshots = {}
+        self.classes_stamp = None
+
+    def set_backend(self, backend):
+        """Watch the folder of backend (nothing for a database or None)."""
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+        self.timer.stop()
+        self.dirty.clear()
+        self.backend = backend if isinstance(backend, FolderBackend) else None
+        if self.backend is None:
+            return
+        self.watch_paths()
+        self.executor.submit(self.take_snapshots, self.backend)
+
+    def watch_image(self, image_name):
+        """Watch the label files of the image being shown, and check them for changes missed so far."""
+        previous = [path for path, (_, name) in self.watched_paths().items() if name is not None]
+        self.image_name = image_name
+        if self.backend is None:
+            return
+        stale = [path for path in previous if path in self.watcher.files()]
+        if stale:
+            self.watcher.removePaths(stale)
+        self.watch_paths()
+        self.executor.submit(self.scan_changes, self.backend, set(),
+                             [(label_type, image_name) for label_type in LABEL_TYPES], False)
+
+    def watched_paths(self):
+        """{path: (label type, image name)}, (None, None) for the label folder and classes.txt."""
+        if self.backend is None:
+            return {}
+        location = self.backend.location
+        paths = {location: (None, None), os.path.join(location, 'classes.txt'): (None, None)}
+        for label_type in LABEL_TYPES:
+            paths[self.type_folder(self.backend, label_type)] = (label_type, None)
+            if self.image_name is not None:
+                paths[label_io.label_path(location, label_type, self.image_name)] = (label_type, self.image_name)
+        return paths
+
+    def watch_paths(self):
+        # Folders and files created later, or replaced by a rename, have to be added (again)
+        watched = set(self.watcher.files() + self.watcher.directories())
+        missing = [path for path in self.watched_paths() if path not in watched and os.path.exists(path)]
+        if missing:
+            self.watcher.addPaths(missing)
+            self.dirty.update(missing)
+
+    def on_path_changed(self, path):
+        if self.backend is None:
+            return
+        self.dirty.add(path)
+        self.watch_paths()
+        self.timer.start()
+
+    def check_changes(self):
+        if self.backend is None or not self.dirty:
+            return
+        paths = self.watched_paths()
+        label_types, files, check_classes = set(), [], False
+        for path in self.dirty:
+            label_type, image_name = paths.get(path, (None, None))
+            if image_name is not None:
+                files.append((label_type, image_name))
+            elif label_type is not None:
+                label_types.add(label_type)
+            elif path in paths:
+                check_classes = True
+        self.dirty.clear()
+        self.executor.submit(self.scan_changes, self.backend, label_types, files, check_classes)
+
+    @staticmethod
+    def type_folder(backend, label_type):
+        return os.path.join(backend.location, label_io.LABEL_FOLDERS[label_type])
+
+    @staticmethod
+    def file_stamp(path):
+        """(inode, mtime_ns, size) of the file at path, None when there is none."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def check_file(self, backend, label_type, image_name, stamp, changes):
+        # stamp is None for a file that does not exist (anymore)
+        snapshot = self.snapshots.setdefault(label_type, {})
+        if snapshot.get(image_name) == stamp:
+            return
+        if stamp is None:
+            del snapshot[image_name]
+            changes.append((label_type, image_name, None))
+            return
+        snapshot[image_name] = stamp
+        if backend.is_own_write(label_io.label_path(backend.location, label_type, image_name), stamp[1:]):
+            return
+        try:
+            changes.append((label_type, image_name, backend.read(label_type, image_name)))
+        except (OSError, ValueError) as e:
+            print(f"Failed to read {label_type} labels of {image_name}: {e}")
+
+    def take_snapshots(self, backend):
+        self.snapshots = {label_type: snapshot_folder(self.type_folder(backend, label_type))
+                          for label_type in LABEL_TYPES}
+        self.classes_stamp = self.file_stamp(os.path.join(backend.location, 'classes.txt'))
+
+    def scan_changes(self, backend, label_types, files, check_classes):
+        """
+        Runs on the scan thread: diff whole folders (label_types) and single (label type, image
+        name) files against the last snapshot and read the changed files.
+        """
+        if backend is not self.backend:
+            return
+        changes = []
+        for label_type in sorted(label_types):
+            # Every save renames a temp file into the folder. Only names that are new, gone or were
+            # replaced (a rename gives a new inode) are stat'ed, not every file of the folder
+            inodes = snapshot_folder(self.type_folder(backend, label_type), stat=False)
+            snapshot = self.snapshots.setdefault(label_type, {})
+            for image_name in inodes.keys() | snapshot.keys():
+                previous = snapshot.get(image_name)
+                if previous is not None and previous[0] == inodes.get(image_name):
+                    continue
+                path = label_io.label_path(backend.location, label_type, image_name)
+                stamp = self.file_stamp(path) if image_name in inodes else None
+                self.check_file(backend, label_type, image_name, stamp, changes)
+        for label_type, image_name in files:
+            if label_type not in label_types:
+                path = label_io.label_path(backend.location, label_type, image_name)
+                self.check_file(backend, label_type, image_name, self.file_stamp(path), changes)
+        if changes:
+            self.labels_changed.emit(backend, changes)
+
+        if check_classes:
+            class_file_path = os.path.join(backend.location, 'classes.txt')
+            stamp = self.file_stamp(class_file_path)
+            if stamp != self.classes_stamp:
+                self.classes_stamp = stamp
+                if stamp is not None and not backend.is_own_write(class_file_path, stamp[1:]):
+                    class_names = backend.read_class_names()
+                    if class_names is not None:
+                        self.classes_changed.emit(backend, class_names)
@@ -7,55 +7,30 @@
 
 import random
 import os
+import threading
 from PySide6.QtWidgets import (QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton,
-                               QWidget, QListWidget, QSplitter, QFileDialog, QLabel,
-                               QListWidgetItem, QCheckBox, QTabWidget, QMessageBox,
+                               QWidget, QListView, QSplitter, QFileDialog, QLabel,
+                               QCheckBox, QTabWidget, QMessageBox,
                                QDialog, QButtonGroup, QRadioButton, QComboBox,
-                               QLineEdit, QDialogButtonBox, QScrollArea)
-from PySide6.QtCore import Qt, Signal
+                               QLineEdit, QDialogButtonBox, QScrollArea, QProgressBar)
+from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QColor, QKeySequence, QShortcut
 from ui.image_view import ImageView
+from ui.image_cache import ImageCache
+from ui.job_queue import JobQueue
+from ui.file_list_model import FileListModel
+from ui.label_list_model import LabelListModel
+from ui.label_watcher import LabelWatcher
 from tools.sam_processor import SAMProcessor
 from tools.yolo_processor import YOLOProcessor
+from tools import label_io
+from tools.file_enumerator import enumerate_images
+from tools.label_backend import DB_SUFFIXES, open_backend
+from tools.label_cache import LabelCache
+from tools.label_loader import LabelLoader
+from tools.model_registry import model_registry
 
 
-class CustomListItem(QWidget):
-    visibility_changed = Signal(int, bool, str)
-
-    def __init__(self, text, index, label_type, parent=None):
-        super().__init__(parent)
-        self.index = index
-        self.label_type = label_type
-        self.is_visible = True
-        self.label_visibility = {
-            'box': set(),
-            'polygon': set(),
-            'point': set()
-        }
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(5, 2, 2, 2)
-        layout.setSpacing(7)
-
-        self.class_colors = {}
-
-        self.checkbox = QCheckBox()
-        self.checkbox.setChecked(True)
-        self.checkbox.clicked.connect(self.on_checkbox_clicked)
-        layout.addWidget(self.checkbox)
-
-
-        self.label = QLabel(text)
-        layout.addWidget(self.label)
-        layout.addStretch()
-
-
-    def on_checkbox_clicked(self):
-        self.is_visible = self.checkbox.isChecked()
-        self.visibility_changed.emit(self.index, self.is_visible, self.label_type)
-
-    def get_text(self):
-        return self.label.text()
-
 class ScrollableLabel(QScrollArea):
     def __init__(self, text):
         super().__init__()
@@ -78,6 +53,12 @@ class ScrollableLabel(QScrollArea):
 
 
 class MainWindow(QMainWindow):
+    models_ready = Signal(object)  # {(kind, weight path): error} of a finished warm-up
+    files_found = Signal(int, object)  # folder scan run, [image paths]
+    files_scanned = Signal(int, int)  # folder scan run, number of images
+    labels_scanned = Signal(int, object)  # loader run, {label type: image names}
+    labels_parsed = Signal(int, object, int, int)  # loader run, [(type, image name, labels)], done, total
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("SmartTagger Tool")
@@ -88,9 +69,14 @@ class MainWindow(QMainWindow):
         self.layout = QHBoxLayout(self.central_widget)
 
         self.current_image_path = None
-        self.box_labels = {}  # Dictionary to store labels for each image
-        self.polygon_labels = {}
-        self.point_labels = {}
+        self.label_folder = None  # Label folder or project database path
+        self.label_backend = None
+        # Visible label indices of the current image by type
+        self.label_visibility = {'box': set(), 'polygon': set(), 'point': set()}
+        # Labels for each image, parsed lazily from the label folder
+        self.box_labels = LabelCache('box')
+        self.polygon_labels = LabelCache('polygon')
+        self.point_labels = LabelCache('point')
 
         self.class_names = {}  # Dictionary to store class names
         self.class_colors = {}  # Dictionary to store class colors
@@ -99,6 +85,24 @@ class MainWindow(QMainWindow):
         self.image_view = ImageView()
         self.image_view.setMouseTracking(True)
 
+        self.job_queue = JobQueue(self)
+        self.tile_size = 1024  # Tile size used when tiled inference is enabled
+
+        # Display resolution images of the files around the current one are decoded ahead
+        self.image_cache = ImageCache(self)
+        self.prefetch_count = 3
+
+        # Background scan of the image folder
+        self.file_scan_stop = None
+        self.file_scan_run = 0
+
+        # Background scan / parse of the label folder
+        self.label_loader_stop = None
+        self.label_loader_run = 0
+        self.label_loader_workers = 8
+        # Label files changed by other programs are read again without a full refresh
+        self.label_watcher = LabelWatcher(self)
+
         self.setup_ui()
         self.setup_connections()
 
@@ -115,6 +119,9 @@ class MainWindow(QMainWindow):
         # Set a fixed seed for color generation
         random.seed(42)
 
+        # torch / ultralytics are imported by the warm-up, after the window is shown
+        QTimer.singleShot(0, self.warm_up_models)
+
     def add_shortcut(self, widget, key, callback):
         shortcut = QShortcut(QKeySequence(key), self)
         shortcut.activated.connect(callback)
@@ -124,11 +131,27 @@ class MainWindow(QMainWindow):
 
     def setup_connections(self):
         self.image_view.label_selected.connect(self.on_image_label_selected)
-        self.polygon_labels_list.itemClicked.connect(self.on_polygon_label_item_clicked)
-        self.box_labels_list.itemClicked.connect(self.on_box_label_item_clicked)
-        self.point_labels_list.itemClicked.connect(self.on_point_label_item_clicked)
+        self.all_labels_list.clicked.connect(self.on_all_label_item_clicked)
+        self.polygon_labels_list.clicked.connect(self.on_polygon_label_item_clicked)
+        self.box_labels_list.clicked.connect(self.on_box_label_item_clicked)
+        self.point_labels_list.clicked.connect(self.on_point_label_item_clicked)
         self.image_view.label_added.connect(self.handle_new_label)
         self.image_view.sam_segmentation_performed.connect(self.handle_sam_segmentation)
+        self.job_queue.status_changed.connect(self.statusBar().showMessage)
+        self.model_status = QLabel()
+        self.statusBar().addPermanentWidget(self.model_status)
+        self.models_ready.connect(self.on_models_ready)
+        self.label_progress = QProgressBar()
+        self.label_progress.setMaximumWidth(200)
+        self.label_progress.setFormat("Labels %v/%m")
+        self.label_progress.hide()
+        self.statusBar().addPermanentWidget(self.label_progress)
+        self.labels_scanned.connect(self.on_labels_scanned)
+        self.labels_parsed.connect(self.on_labels_parsed)
+        self.label_watcher.labels_changed.connect(self.on_labels_changed_on_disk)
+        self.label_watcher.classes_changed.connect(self.on_classes_changed_on_disk)
+        self.files_found.connect(self.on_files_found)
+        self.files_scanned.connect(self.on_files_scanned)
 
     def setup_ui(self):
         # Main layout
@@ -156,11 +179,20 @@ class MainWindow(QMainWindow):
         self.tab_widget = QTabWidget()
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
 
+        # Label lists are views over the labels of the current image
+        self.all_labels_model = LabelListModel(['box', 'polygon', 'point'], self)
+        self.point_labels_model = LabelListModel(['point'], self)
+        self.box_labels_model = LabelListModel(['box'], self)
+        self.polygon_labels_model = LabelListModel(['polygon'], self)
+        self.label_models = [self.all_labels_model, self.point_labels_model,
+                             self.box_labels_model, self.polygon_labels_model]
+        self.all_labels_model.link(self.point_labels_model, self.box_labels_model, self.polygon_labels_model)
+
         # All Labels Tab
         all_labels_widget = QWidget()
         all_labels_layout = QVBoxLayout(all_labels_widget)
         all_labels_layout.addWidget(QLabel("All Labels:"))
-        self.all_labels_list = QListWidget()
+        self.all_labels_list = self.create_label_list_view(self.all_labels_model)
         all_labels_layout.addWidget(self.all_labels_list)
         self.tab_widget.addTab(all_labels_widget, "All")
 
@@ -168,7 +200,7 @@ class MainWindow(QMainWindow):
         point_labels_widget = QWidget()
         point_labels_layout = QVBoxLayout(point_labels_widget)
         point_labels_layout.addWidget(QLabel("Point Labels:"))
-        self.point_labels_list = QListWidget()
+        self.point_labels_list = self.create_label_list_view(self.point_labels_model)
         point_labels_layout.addWidget(self.point_labels_list)
         self.toggle_all_point_button = QPushButton("Toggle All Point Labels")
         self.toggle_all_point_button.clicked.connect(lambda: self.toggle_all_labels('point'))
@@ -179,7 +211,7 @@ class MainWindow(QMainWindow):
         box_labels_widget = QWidget()
         box_labels_layout = QVBoxLayout(box_labels_widget)
         box_labels_layout.addWidget(QLabel("Box Labels:"))
-        self.box_labels_list = QListWidget()
+        self.box_labels_list = self.create_label_list_view(self.box_labels_model)
         box_labels_layout.addWidget(self.box_labels_list)
         self.toggle_all_box_button = QPushButton("Toggle All Box Labels")
         self.toggle_all_box_button.clicked.connect(lambda: self.toggle_all_labels('box'))
@@ -190,7 +222,7 @@ class MainWindow(QMainWindow):
         polygon_labels_widget = QWidget()
         polygon_labels_layout = QVBoxLayout(polygon_labels_widget)
         polygon_labels_layout.addWidget(QLabel("Polygon Labels:"))
-        self.polygon_labels_list = QListWidget()
+        self.polygon_labels_list = self.create_label_list_view(self.polygon_labels_model)
         polygon_labels_layout.addWidget(self.polygon_labels_list)
         self.toggle_all_polygon_button = QPushButton("Toggle All Polygon Labels")
         self.toggle_all_polygon_button.clicked.connect(lambda: self.toggle_all_labels('polygon'))
@@ -204,8 +236,31 @@ class MainWindow(QMainWindow):
         file_widget = QWidget()
         file_layout = QVBoxLayout(file_widget)
         file_layout.addWidget(QLabel("Files:"))
-        self.file_list = QListWidget()
+        filter_layout = QHBoxLayout()
+        self.file_filter = QLineEdit()
+        self.file_filter.setPlaceholderText("Filter file names")
+        self.file_filter.setClearButtonEnabled(True)
+        filter_layout.addWidget(self.file_filter)
+        self.file_filter_prefix = QCheckBox("Prefix")
+        filter_layout.addWidget(self.file_filter_prefix)
+        self.file_sort = QComboBox()
+        self.file_sort.addItems(["Scan order", "Name", "Path"])
+        filter_layout.addWidget(self.file_sort)
+        file_layout.addLayout(filter_layout)
+        # Rows are formatted only when shown, the list never holds one widget item per file
+        self.file_model = FileListModel(self)
+        self.file_list = QListView()
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.setModel(self.file_model)
         file_layout.addWidget(self.file_list)
+        # Filtering a million names takes a moment, so it waits until typing pauses
+        self.file_filter_timer = QTimer(self)
+        self.file_filter_timer.setSingleShot(True)
+        self.file_filter_timer.setInterval(150)
+        # Rows streamed in during a scan are sorted in at most this often
+        self.file_sort_timer = QTimer(self)
+        self.file_sort_timer.setSingleShot(True)
+        self.file_sort_timer.setInterval(500)
 
         # Create a splitter for the right side
         right_splitter = QSplitter(Qt.Vertical)
@@ -222,7 +277,20 @@ class MainWindow(QMainWindow):
         main_splitter.setStretchFactor(2, 1)  # Right side
 
         # Connect signals
-        self.file_list.currentItemChanged.connect(self.change_image)
+        self.file_list.selectionModel().currentChanged.connect(self.change_image)
+        self.file_filter.textChanged.connect(self.file_filter_timer.start)
+        self.file_filter_prefix.toggled.connect(self.apply_file_filter)
+        self.file_filter_timer.timeout.connect(self.apply_file_filter)
+        self.file_sort.currentIndexChanged.connect(self.sort_files)
+        self.file_sort_timer.timeout.connect(self.sort_files)
+
+    def create_label_list_view(self, model):
+        view = QListView()
+        view.setModel(model)
+        # All rows have the same height, so only the rows in view are laid out and painted
+        view.setUniformItemSizes(True)
+        model.visibility_changed.connect(self.toggle_label_visibility)
+        return view
 
     def on_tab_changed(self, index):
         """Handle tab switching event"""
@@ -230,25 +298,15 @@ class MainWindow(QMainWindow):
 
         if tab_text == "All":
             self.image_view.set_active_label_type(None)
-            self.update_all_labels_list()
         elif tab_text in ["Point", "Box", "Polygon"]:
             label_type = tab_text.lower()
             self.image_view.set_active_label_type(label_type)
-            self.update_label_list(label_type)
 
-        self.image_view.update()
+        self.image_view.refresh()
 
     def refresh_active_label_list(self):
-        current_tab_index = self.tab_widget.currentIndex()
-        tab_text = self.tab_widget.tabText(current_tab_index)
-
-        if tab_text == "All":
-            self.update_all_labels_list()
-        elif tab_text in ["Point", "Box", "Polygon"]:
-            label_type = tab_text.lower()
-            self.update_label_list(label_type)
-
-        self.image_view.update()
+        self.update_label_lists()
+        self.image_view.refresh()
 
     def setup_left_buttons(self, layout):
         buttons = [
@@ -256,6 +314,7 @@ class MainWindow(QMainWindow):
             ("Delete Label (D)", self.delete_label),
             ("Perform SAM Segmentation", self.perform_sam_segmentation),
             ("Perform YOLO Segmentation", self.perform_yolo_segmentation),
+            ("Cancel Jobs", self.cancel_jobs),
         ]
 
         for text, callback in buttons:
@@ -273,7 +332,7 @@ class MainWindow(QMainWindow):
         # Add SAM weight file selection
         sam_layout = QHBoxLayout()
         sam_layout.addWidget(QLabel("SAM:"))
-        self.sam_weight_label = ScrollableLabel("/weights/sam2_b.pt")
+        self.sam_weight_label = ScrollableLabel("weights/sam2_b.pt")
         sam_layout.addWidget(self.sam_weight_label)
         sam_button = QPushButton("Select")
         sam_button.clicked.connect(self.select_sam_weight)
@@ -283,7 +342,7 @@ class MainWindow(QMainWindow):
         # Add YOLO weight file selection
         yolo_layout = QHBoxLayout()
         yolo_layout.addWidget(QLabel("YOLO:"))
-        self.yolo_weight_label = ScrollableLabel("/weights/yolo11n.pt")
+        self.yolo_weight_label = ScrollableLabel("weights/yolo11n.pt")
         yolo_layout.addWidget(self.yolo_weight_label)
         yolo_button = QPushButton("Select")
         yolo_button.clicked.connect(self.select_yolo_weight)
@@ -297,6 +356,14 @@ class MainWindow(QMainWindow):
         conf_layout.addWidget(self.conf_threshold)
         layout.addLayout(conf_layout)
 
+        # Run SAM on crops around the prompts, better for small objects on large images
+        self.sam_roi_checkbox = QCheckBox("SAM ROI crop")
+        layout.addWidget(self.sam_roi_checkbox)
+
+        # Split very large images into overlapping tiles for SAM and YOLO
+        self.tiled_checkbox = QCheckBox("Tiled inference")
+        layout.addWidget(self.tiled_checkbox)
+
         layout.addStretch(1)  # Add stretch to push buttons to the top
 
 
@@ -322,12 +389,38 @@ class MainWindow(QMainWindow):
         if file_path:
             relative_path = self.get_relative_path(file_path)
             self.sam_weight_label.setText(relative_path)
+            self.warm_up_models()
 
     def select_yolo_weight(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select YOLO Weight File", "", "Weight Files (*.pt)")
         if file_path:
             relative_path = self.get_relative_path(file_path)
             self.yolo_weight_label.setText(relative_path)
+            self.warm_up_models()
+
+    def warm_up_models(self):
+        """Load the selected SAM and YOLO weights on a background thread."""
+        models = []
+        for kind, weight_label in [('sam', self.sam_weight_label), ('yolo', self.yolo_weight_label)]:
+            weight_path = os.path.abspath(weight_label.label.text())
+            if not os.path.exists(weight_path):
+                print(f"Not warming up the {kind} model, {weight_path} does not exist")
+            elif not model_registry.is_loaded(kind, weight_path):
+                models.append((kind, weight_path))
+        if not models:
+            if not self.model_status.text():
+                self.model_status.setText("Models load on first use")
+            return
+
+        self.model_status.setText("Loading models...")
+        # Jobs that need one of these models before it is loaded wait for this load in the registry
+        threading.Thread(target=lambda: self.models_ready.emit(model_registry.warm_up(models)),
+                         daemon=True).start()
+
+    def on_models_ready(self, errors):
+        for (kind, weight_path), message in errors.items():
+            print(f"Failed to load {kind} weight {weight_path}: {message}")
+        self.model_status.setText("Model loading failed" if errors else "Models ready")
 
     def setup_center_buttons(self, layout):
         button_layout = QHBoxLayout()
@@ -337,6 +430,7 @@ class MainWindow(QMainWindow):
             ("Load Images", self.load_images),
             ("Load Folder", self.load_folder),
             ("Load Labels", self.load_labels),
+            ("Open Label DB", self.open_label_database),
             ("Save (Ctrl+S)", self.save)
         ]
 
@@ -358,66 +452,243 @@ class MainWindow(QMainWindow):
         folder_dialog = QFileDialog()
         folder_dialog.setFileMode(QFileDialog.Directory)
         if folder_dialog.exec():
-            folder_path = folder_dialog.selectedFiles()[0]
-            image_files = []
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
-                        image_files.append(os.path.join(root, file))
-            self.add_files_to_list(image_files)
+            self.scan_image_folder(folder_dialog.selectedFiles()[0])
+
+    def scan_image_folder(self, folder_path):
+        """List the images under folder_path, streamed in from a background scan so the first ones show at once."""
+        self.stop_file_scan()
+        self.file_model.clear()
+        self.file_scan_run += 1
+        run = self.file_scan_run
+        stop = self.file_scan_stop = threading.Event()
+        self.statusBar().showMessage(f"Scanning {folder_path}...")
+
+        def scan():
+            count = enumerate_images(folder_path, lambda paths: self.files_found.emit(run, paths), stop=stop)
+            self.files_scanned.emit(run, count)
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def stop_file_scan(self):
+        if self.file_scan_stop is not None:
+            self.file_scan_stop.set()
+            self.file_scan_stop = None
+
+    def on_files_found(self, run, paths):
+        if run != self.file_scan_run:
+            return
+        self.file_model.append_paths(paths)
+        if self.file_model.sort_key != 'scan' and not self.file_sort_timer.isActive():
+            self.file_sort_timer.start()
+        self.statusBar().showMessage(f"Scanning... {len(self.file_model.paths)} images")
+
+    def on_files_scanned(self, run, count):
+        if run != self.file_scan_run:
+            return
+        self.file_scan_stop = None
+        if self.file_model.sort_key != 'scan':
+            self.file_sort_timer.stop()
+            self.sort_files()
+        self.statusBar().showMessage(f"{count} images", 5000)
+        if self.label_folder:
+            # Parse the labels of the new images first
+            self.start_label_loader()
 
     def add_files_to_list(self, file_names):
-        self.file_list.clear()
-        self.file_list.addItems(file_names)
+        self.stop_file_scan()
+        self.file_model.set_paths(file_names)
+        if self.file_model.sort_key != 'scan':
+            self.sort_files()
+        if self.label_folder:
+            # Parse the labels of the new images first
+            self.start_label_loader()
+
+    def apply_file_filter(self):
+        self.file_filter_timer.stop()
+        self.file_model.set_filter(self.file_filter.text(), prefix_only=self.file_filter_prefix.isChecked())
+
+    def sort_files(self):
+        self.file_model.sort(self.file_sort.currentIndex())
+
+    def select_file_row(self, row):
+        if 0 <= row < self.file_model.rowCount():
+            self.file_list.setCurrentIndex(self.file_model.index(row, 0))
 
     def change_image(self, current, previous):
-        if current:
-            self.current_image_path = current.text()
-            self.image_view.load_image(self.current_image_path)
+        if current.isValid():
+            self.current_image_path = self.file_model.path(current.row())
+            image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
+            for label_type in ['box', 'polygon', 'point']:
+                getattr(self, f"{label_type}_labels").pin(image_name)
+            self.label_watcher.watch_image(image_name)
+            self.image_cache.set_target_size(self.image_view.size() * self.image_view.devicePixelRatioF())
+            self.image_view.load_image(self.current_image_path,
+                                       preview=self.image_cache.load(self.current_image_path))
             self.load_image_labels(self.current_image_path)
             self.update_label_lists()
+            self.prefetch_neighbours()
+
+    def prefetch_neighbours(self):
+        row = self.file_list.currentIndex().row()
+        image_paths = []
+        for offset in range(1, self.prefetch_count + 1):
+            for neighbour in (row + offset, row - offset):
+                if 0 <= neighbour < self.file_model.rowCount():
+                    image_paths.append(self.file_model.path(neighbour))
+        self.image_cache.prefetch(image_paths)
 
     def load_labels(self):
         folder_dialog = QFileDialog()
         folder_dialog.setFileMode(QFileDialog.Directory)
         if folder_dialog.exec():
-            self.label_folder = folder_dialog.selectedFiles()[0]
-            class_file_path = os.path.join(self.label_folder, 'classes.txt')
-            self.load_class_names(class_file_path)
-
-            box_folder = os.path.join(self.label_folder, 'Box')
-            if os.path.exists(box_folder):
-                for file_name in os.listdir(box_folder):
-                    if file_name.endswith('.txt'):
-                        image_name = os.path.splitext(file_name)[0]
-                        box_label_path = os.path.join(box_folder, file_name)
-                        self.box_labels[image_name] = self.parse_box_label(box_label_path)
-
-            polygon_folder = os.path.join(self.label_folder, 'Polygon')
-            if os.path.exists(polygon_folder):
-                for file_name in os.listdir(polygon_folder):
-                    if file_name.endswith('.txt'):
-                        image_name = os.path.splitext(file_name)[0]
-                        polygon_label_path = os.path.join(polygon_folder, file_name)
-                        self.polygon_labels[image_name] = self.parse_polygon_label(polygon_label_path)
-
-            point_folder = os.path.join(self.label_folder, 'Point')
-            if os.path.exists(point_folder):
-                for file_name in os.listdir(point_folder):
-                    if file_name.endswith('.txt'):
-                        image_name = os.path.splitext(file_name)[0]
-                        point_label_path = os.path.join(point_folder, file_name)
-                        self.point_labels[image_name] = self.parse_point_label(point_label_path)
+            self.set_label_source(folder_dialog.selectedFiles()[0])
+
+    def open_label_database(self):
+        # An existing project database is opened, a new file name creates one
+        db_path, _ = QFileDialog.getSaveFileName(self, "Open or create label database", "",
+                                                 "Label database (*.sqlite *.db)",
+                                                 options=QFileDialog.DontConfirmOverwrite)
+        if db_path:
+            if not db_path.lower().endswith(DB_SUFFIXES):
+                db_path += '.sqlite'
+            self.set_label_source(db_path)
+
+    def set_label_source(self, location):
+        """Use a label folder or a project database (.sqlite / .db) for all labels and class names."""
+        if not self.resolve_unsaved_labels():
+            return
+        previous_backend = self.label_backend
+        self.label_folder = location
+        self.label_backend = open_backend(location)
+        self.load_class_names()
+
+        for label_type in ['box', 'polygon', 'point']:
+            getattr(self, f"{label_type}_labels").set_folder(self.label_backend)
+        self.label_watcher.set_backend(self.label_backend)
+        if self.current_image_path:
+            self.label_watcher.watch_image(os.path.splitext(os.path.basename(self.current_image_path))[0])
 
-            self.update_label_lists()
+        if self.current_image_path:
+            self.load_image_labels(self.current_image_path)
+        self.update_label_lists()
+        self.start_label_loader()
+        # Unsaved labels were flushed to it by set_folder and its loader run is stopped
+        if previous_backend is not None and previous_backend is not self.label_backend:
+            previous_backend.close()
+
+    def closeEvent(self, event):
+        if self.label_loader_stop is not None:
+            self.label_loader_stop.set()
+        if self.label_backend is not None:
+            self.label_backend.close()
+        super().closeEvent(event)
+
+    def resolve_unsaved_labels(self):
+        """
+        Before the label source changes: save or discard unsaved labels, so they are never
+        written into the new source. Returns False when the user cancels.
+        """
+        caches = [getattr(self, f"{label_type}_labels") for label_type in ['box', 'polygon', 'point']]
+        if not any(cache.modified for cache in caches):
+            return True
+        if self.label_backend is None:
+            buttons = QMessageBox.Discard | QMessageBox.Cancel
+            text = "Labels drawn before choosing a label folder are not saved. Discard them?"
+        else:
+            buttons = QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel
+            text = f"Save the unsaved labels to {self.label_folder} first?"
+        answer = QMessageBox.question(self, "Unsaved labels", text, buttons)
+        if answer == QMessageBox.Cancel:
+            return False
+        if answer == QMessageBox.Discard:
+            for cache in caches:
+                cache.clear()
+        # Save: set_folder flushes to the current backend before switching
+        return True
+
+    def start_label_loader(self):
+        """Scan the label folder and parse the label files of the listed images in the background."""
+        if self.label_loader_stop is not None:
+            self.label_loader_stop.set()
+        if not self.label_folder:
+            return
+
+        # Images from the current one on are parsed first, only as many as the label caches keep
+        row = max(0, self.file_list.currentIndex().row())
+        paths = self.file_model.visible_paths()
+        limit = min(getattr(self, f"{label_type}_labels").capacity for label_type in ['box', 'polygon', 'point'])
+
+        # Results of an earlier run that is still finishing are ignored by run number
+        self.label_loader_run += 1
+        run = self.label_loader_run
+        stop = self.label_loader_stop = threading.Event()
+        loader = LabelLoader(self.label_backend, workers=self.label_loader_workers)
+        self.label_progress.setRange(0, 0)
+        self.label_progress.show()
+
+        def load():
+            # Names are made on the loader thread, that takes a while for a million files
+            image_names = [os.path.splitext(os.path.basename(path))[0] for path in paths[row:] + paths[:row]]
+            loader.run(image_names=image_names, limit=limit, stop=stop,
+                       on_index=lambda index: self.labels_scanned.emit(run, index),
+                       on_batch=lambda batch, done, total: self.labels_parsed.emit(run, batch, done, total))
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def on_labels_scanned(self, run, index):
+        if run != self.label_loader_run:
+            return
+        for label_type, files in index.items():
+            getattr(self, f"{label_type}_labels").set_index(files)
+
+    def on_labels_parsed(self, run, batch, done, total):
+        if run != self.label_loader_run:
+            return
+        for label_type, image_name, labels in batch:
+            getattr(self, f"{label_type}_labels").preload(image_name, labels)
+        self.label_progress.setRange(0, total)
+        self.label_progress.setValue(done)
+        if done == total:
+            self.label_progress.hide()
+
+    def on_labels_changed_on_disk(self, backend, changes):
+        """Labels written by another program: update the caches, redraw only if the current image changed."""
+        if backend is not self.label_backend:
+            return
+        current_image = None
+        if self.current_image_path:
+            current_image = os.path.splitext(os.path.basename(self.current_image_path))[0]
+        current_changed = False
+        for label_type, image_name, labels in changes:
+            if getattr(self, f"{label_type}_labels").stored_changed(image_name, labels) and image_name == current_image:
+                current_changed = True
+
+        if current_changed:
+            # Label indices of the old labels no longer apply
+            self.image_view.set_selected_label(None, None)
+            self.selected_label = None
+            self.load_image_labels(self.current_image_path)
+        self.statusBar().showMessage(f"{len(changes)} label file(s) changed on disk", 3000)
+
+    def on_classes_changed_on_disk(self, backend, class_names):
+        if backend is not self.label_backend or class_names == self.class_names:
+            return
+        # Updated in place, the image view and the list models share the dict
+        self.class_names.clear()
+        self.class_names.update(class_names)
+        for class_id in self.class_names:
+            if class_id not in self.class_colors:
+                self.class_colors[class_id] = self.generate_random_color(seed=class_id)
+        self.update_label_lists()
+        self.image_view.refresh()
 
-    def load_class_names(self, class_file_path):
-        if os.path.exists(class_file_path):
-            with open(class_file_path, 'r') as f:
-                self.class_names = {i: name.strip() for i, name in enumerate(f)}
+    def load_class_names(self):
+        class_names = self.label_backend.read_class_names()
+        if class_names is not None:
+            self.class_names = class_names
         else:
             self.class_names = {0: '0', 1: '1'}  # Default class names
-            self.save_class_names(class_file_path)
+            self.save_class_names()
 
         # Generate colors for each class
         for class_id in self.class_names:
@@ -430,53 +701,20 @@ class MainWindow(QMainWindow):
         return QColor(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
 
     def parse_point_label(self, label_path):
-        labels = []
-        with open(label_path, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) == 3:
-                    class_id, x, y = map(float, parts)
-                    labels.append({
-                        'class_id': int(class_id),
-                        'point': (x, y)
-                    })
-        # print(labels)
-        return labels
+        return label_io.parse_point_label(label_path)
 
     def parse_box_label(self, label_path):
-        labels = []
-        with open(label_path, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) == 5:
-                    class_id, x_center, y_center, width, height = map(float, parts)
-                    labels.append({
-                        'class_id': int(class_id),
-                        'bbox': [x_center, y_center, width, height]
-                    })
-        return labels
+        return label_io.parse_box_label(label_path)
 
     def parse_polygon_label(self, label_path):
-        labels = []
-        with open(label_path, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) >= 3 and len(parts) % 2 == 1:
-                    class_id = int(parts[0])
-                    points = list(map(float, parts[1:]))
-                    polygon = [(points[i], points[i + 1]) for i in range(0, len(points), 2)]
-                    labels.append({
-                        'class_id': class_id,
-                        'polygon': polygon
-                    })
-        return labels
+        return label_io.parse_polygon_label(label_path)
 
     def load_image_labels(self, image_path):
         image_name = os.path.splitext(os.path.basename(image_path))[0]
 
-        box_labels = self.box_labels.get(image_name, [])
-        polygon_labels = self.polygon_labels.get(image_name, [])
-        point_labels = self.point_labels.get(image_name, [])
+        box_labels = self.box_labels.labels_for(image_name)
+        polygon_labels = self.polygon_labels.labels_for(image_name)
+        point_labels = self.point_labels.labels_for(image_name)
 
         # Reset visualization options
         self.label_visibility = {
@@ -488,219 +726,141 @@ class MainWindow(QMainWindow):
         self.image_view.set_labels(box_labels, polygon_labels, point_labels,
                                    self.class_colors, self.class_names)
 
-        self.update_all_labels_list()
-        self.update_label_list('box')
-        self.update_label_list('polygon')
-        self.update_label_list('point')
-
-    def update_label_list(self, label_type):
-        list_widget = getattr(self, f"{label_type}_labels_list")
-        list_widget.clear()
-
-        if self.current_image_path:
-            image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-            labels = getattr(self, f"{label_type}_labels").get(image_name, [])
-
-            for i, label in enumerate(labels):
-                class_id = label['class_id']
-                class_name = self.class_names.get(class_id, str(class_id))
-                item = QListWidgetItem(list_widget)
-                custom_item = CustomListItem(f"{class_name} ({label_type.capitalize()} Label {i})", i, label_type)
-                item.setSizeHint(custom_item.sizeHint())
-                list_widget.setItemWidget(item, custom_item)
-
-                custom_item.visibility_changed.connect(self.toggle_label_visibility)
-
-                # Set initial visibility state
-                is_visible = i in self.label_visibility[label_type]
-                custom_item.checkbox.setChecked(is_visible)
-
-        # 重新连接信号
-        list_widget.itemClicked.connect(getattr(self, f"on_{label_type}_label_item_clicked"))
+        self.update_label_lists()
 
     def update_visible_labels(self, label_type):
         """更新标签可见性"""
         if not self.current_image_path:
             return
 
-        # Clear visibility for all labels
-        self.image_view.visible_box_labels.clear()
-        self.image_view.visible_polygon_labels.clear()
-        self.image_view.visible_point_labels.clear()
-
         # Display only the current type of labels
         image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-        if label_type == 'box' and image_name in self.box_labels:
-            self.image_view.visible_box_labels = set(range(len(self.box_labels[image_name])))
-        elif label_type == 'polygon' and image_name in self.polygon_labels:
-            self.image_view.visible_polygon_labels = set(range(len(self.polygon_labels[image_name])))
-        elif label_type == 'point' and image_name in self.point_labels:
-            self.image_view.visible_point_labels = set(range(len(self.point_labels[image_name])))
-
-        self.image_view.update()
+        self.image_view.set_visible_labels({
+            other: range(len(getattr(self, f"{other}_labels").labels_for(image_name))) if other == label_type else ()
+            for other in ['box', 'polygon', 'point']
+        })
 
     def update_label_lists(self):
-        self.update_box_label_list()
-        self.update_polygon_label_list()
-        self.update_point_label_list()
-        self.update_all_labels_list()
-
-    def update_point_label_list(self):
-        self.point_labels_list.clear()
-        if self.current_image_path:
-            image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-            if image_name in self.point_labels:
-                for i, label in enumerate(self.point_labels[image_name]):
-                    class_id = label['class_id']
-                    class_name = self.class_names.get(class_id, str(class_id))
-                    item = QListWidgetItem(self.point_labels_list)
-                    custom_item = CustomListItem(f"{class_name} (Point Label {i})", i, 'point')
-                    item.setSizeHint(custom_item.sizeHint())
-                    self.point_labels_list.setItemWidget(item, custom_item)
-                    custom_item.visibility_changed.connect(self.toggle_label_visibility)
-        self.point_labels_list.itemClicked.connect(self.on_point_label_item_clicked)
-
-    def update_box_label_list(self):
-        self.box_labels_list.clear()
-        if self.current_image_path:
-            image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-            if image_name in self.box_labels:
-                for i, label in enumerate(self.box_labels[image_name]):
-                    class_id = label['class_id']
-                    class_name = self.class_names.get(class_id, str(class_id))
-                    item = QListWidgetItem(self.box_labels_list)
-                    custom_item = CustomListItem(f"{class_name} (Box Label {i})", i, 'box')
-                    item.setSizeHint(custom_item.sizeHint())
-                    self.box_labels_list.setItemWidget(item, custom_item)
-                    custom_item.visibility_changed.connect(self.toggle_label_visibility)
-        self.box_labels_list.itemClicked.connect(self.on_box_label_item_clicked)
-
-    def update_polygon_label_list(self):
-        self.polygon_labels_list.clear()
+        """Point the list models at the labels of the current image (one reset each, no per-row widgets)."""
+        labels = {}
         if self.current_image_path:
             image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-            if image_name in self.polygon_labels:
-                for i, label in enumerate(self.polygon_labels[image_name]):
-                    class_id = label['class_id']
-                    class_name = self.class_names.get(class_id, str(class_id))
-                    item = QListWidgetItem(self.polygon_labels_list)
-                    custom_item = CustomListItem(f"{class_name} (Polygon Label {i})", i, 'polygon')
-                    item.setSizeHint(custom_item.sizeHint())
-                    self.polygon_labels_list.setItemWidget(item, custom_item)
-                    custom_item.visibility_changed.connect(self.toggle_label_visibility)
-        self.polygon_labels_list.itemClicked.connect(self.on_polygon_label_item_clicked)
-
-    def update_all_labels_list(self):
-        self.all_labels_list.clear()
-
-        if self.current_image_path:
-            image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-            for label_type in ['box', 'polygon', 'point']:
-                labels = getattr(self, f"{label_type}_labels").get(image_name, [])
-                for i, label in enumerate(labels):
-                    class_id = label['class_id']
-                    class_name = self.class_names.get(class_id, str(class_id))
-                    item = QListWidgetItem(self.all_labels_list)
-                    custom_item = CustomListItem(f"{class_name} ({label_type.capitalize()} Label {i})", i, label_type)
-                    item.setSizeHint(custom_item.sizeHint())
-                    self.all_labels_list.setItemWidget(item, custom_item)
+            labels = {label_type: getattr(self, f"{label_type}_labels").labels_for(image_name)
+                      for label_type in ['box', 'polygon', 'point']}
+        for model in self.label_models:
+            model.set_labels(labels, self.label_visibility, self.class_names, self.class_colors)
+
+    def append_labels(self, image_name, label_type, new_labels):
+        """
+        Append new_labels to the labels of image_name. Labels of the image being shown are added
+        through the list models and are made visible.
+        """
+        labels_cache = getattr(self, f"{label_type}_labels")
+        labels = labels_cache.labels_for(image_name)
+        if not new_labels:
+            return
+        first = len(labels)
+        if self.all_labels_model.labels.get(label_type) is labels:
+            self.all_labels_model.append_labels(label_type, new_labels)
+            getattr(self.image_view, f"visible_{label_type}_labels").update(range(first, len(labels)))
+        else:
+            labels.extend(new_labels)
+        labels_cache.mark_modified(image_name)
 
-                    custom_item.visibility_changed.connect(self.toggle_label_visibility)
+    def remove_label(self, label_type, label_index):
+        """Delete the label at label_index from the current image's labels, returns False when there is none."""
+        image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
+        labels_cache = getattr(self, f"{label_type}_labels")
+        labels = labels_cache.labels_for(image_name)
+        if self.all_labels_model.labels.get(label_type) is labels:
+            if not self.all_labels_model.remove_label(label_type, label_index):
+                return False
+        elif 0 <= label_index < len(labels):
+            del labels[label_index]
+        else:
+            return False
+        labels_cache.mark_modified(image_name)
+
+        visible_attribute = f"visible_{label_type}_labels"
+        setattr(self.image_view, visible_attribute,
+                {i if i < label_index else i - 1 for i in getattr(self.image_view, visible_attribute)
+                 if i != label_index})
+        self.image_view.label_removed(label_type, label_index)
+        return True
+
+    def set_labels_visibility(self, label_type, label_indices, is_visible):
+        """Show or hide many labels of one type: one set update, one image repaint and one row range per list."""
+        label_indices = list(label_indices)
+        if is_visible:
+            self.label_visibility[label_type].update(label_indices)
+        else:
+            self.label_visibility[label_type].difference_update(label_indices)
 
-                    # Set initial visibility state
-                    is_visible = i in self.label_visibility[label_type]
-                    custom_item.checkbox.setChecked(is_visible)
+        self.image_view.set_labels_visibility(label_type, label_indices, is_visible)
 
-        # Reconnect signals
-        self.all_labels_list.itemClicked.connect(self.on_all_label_item_clicked)
+        # Rows are found from (type, index) arithmetically, no list is scanned
+        for model in self.label_models:
+            model.labels_changed(label_type, label_indices)
 
     def toggle_label_visibility(self, label_index, is_visible, label_type):
-        if is_visible:
-            self.label_visibility[label_type].add(label_index)
-        else:
-            self.label_visibility[label_type].discard(label_index)
-
-        self.image_view.set_label_visibility(label_index, is_visible, label_type)
-        self.image_view.update()
-
-        # Update the corresponding individual list
-        list_widget = getattr(self, f"{label_type}_labels_list")
-        if list_widget:
-            item = list_widget.item(label_index)
-            if item:
-                custom_item = list_widget.itemWidget(item)
-                custom_item.checkbox.setChecked(is_visible)
-
-        # Update the all_labels list
-        for i in range(self.all_labels_list.count()):
-            item = self.all_labels_list.item(i)
-            custom_item = self.all_labels_list.itemWidget(item)
-            if custom_item.label_type == label_type and custom_item.index == label_index:
-                custom_item.checkbox.setChecked(is_visible)
-                break
+        self.set_labels_visibility(label_type, [label_index], is_visible)
 
     def toggle_polygon_label_visibility(self, label_index, is_visible):
         self.toggle_label_visibility(label_index, is_visible, 'polygon')
 
     def toggle_all_labels(self, label_type):
-        if label_type == 'box':
-            labels_list = self.box_labels_list
-        elif label_type == 'polygon':
-            labels_list = self.polygon_labels_list
-        elif label_type == 'point':
-            labels_list = self.point_labels_list
-        else:
+        if label_type not in ['box', 'polygon', 'point'] or not self.current_image_path:
             return
 
+        image_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
+        count = len(getattr(self, f"{label_type}_labels").labels_for(image_name))
+
         # Check if all are currently selected
-        all_checked = all(labels_list.itemWidget(labels_list.item(i)).checkbox.isChecked()
-                          for i in range(labels_list.count()))
+        all_checked = self.label_visibility[label_type].issuperset(range(count))
 
-        # Toggle the state of all items
-        for i in range(labels_list.count()):
-            custom_item = labels_list.itemWidget(labels_list.item(i))
-            custom_item.checkbox.setChecked(not all_checked)
-            custom_item.on_checkbox_clicked()
+        # Toggle the state of all items in one batch
+        self.set_labels_visibility(label_type, range(count), not all_checked)
 
-    def on_point_label_item_clicked(self, item):
+    def on_point_label_item_clicked(self, index):
         if self.image_view.active_label_type in [None, 'point']:
-            label_index = self.point_labels_list.row(item)
+            label_index = index.row()
             if self.image_view.selected_point_label != label_index:
                 self.image_view.set_selected_label(label_index, 'point')
 
-    def on_polygon_label_item_clicked(self, item):
+    def on_polygon_label_item_clicked(self, index):
         if self.image_view.active_label_type in [None, 'polygon']:
-            label_index = self.polygon_labels_list.row(item)
+            label_index = index.row()
             if self.image_view.selected_polygon_label != label_index:
                 self.image_view.set_selected_label(label_index, 'polygon')
 
-    def on_box_label_item_clicked(self, item):
+    def on_box_label_item_clicked(self, index):
         if self.image_view.active_label_type in [None, 'box']:
-            label_index = self.box_labels_list.row(item)
+            label_index = index.row()
             if self.image_view.selected_box_label != label_index:
                 self.image_view.set_selected_label(label_index, 'box')
 
-    def on_all_label_item_clicked(self, item):
-        custom_item = self.all_labels_list.itemWidget(item)
-        label_type = custom_item.label_type
-        label_index = custom_item.index
+    def on_all_label_item_clicked(self, index):
+        label_type, label_index = index.data(Qt.UserRole)
 
         self.image_view.set_selected_label(label_index, label_type)
 
         # Update the selection state of the corresponding individual list
-        list_widget = getattr(self, f"{label_type}_labels_list")
-        if list_widget:
-            list_widget.setCurrentRow(label_index)
+        self.select_label_row(label_type, label_index)
+
+    def select_label_row(self, label_type, label_index):
+        view = getattr(self, f"{label_type}_labels_list")
+        model = getattr(self, f"{label_type}_labels_model")
+        view.setCurrentIndex(model.index_of(label_type, label_index))
 
     def on_image_label_selected(self, index, label_type):
         if label_type == 'box':
-            self.box_labels_list.setCurrentRow(index)
+            self.select_label_row('box', index)
             self.selected_label = {'type': 'Box', 'index': index}
         elif label_type == 'polygon':
-            self.polygon_labels_list.setCurrentRow(index)
+            self.select_label_row('polygon', index)
             self.selected_label = {'type': 'Polygon', 'index': index}
         elif label_type == 'point':
-            self.point_labels_list.setCurrentRow(index)
+            self.select_label_row('point', index)
             self.selected_label = {'type': 'Point', 'index': index}
         elif label_type == 'none':
             self.box_labels_list.clearSelection()
@@ -708,35 +868,18 @@ class MainWindow(QMainWindow):
             self.point_labels_list.clearSelection()
             self.selected_label = None
 
-        # Update the selection of all labels list
+        # Update the selection of all labels list, ImageView already repaints on selection changes
         self.update_all_labels_list_selection(index, label_type)
-        self.image_view.update()
 
     def update_all_labels_list_selection(self, index, label_type):
-        for i in range(self.all_labels_list.count()):
-            item = self.all_labels_list.item(i)
-            custom_item = self.all_labels_list.itemWidget(item)
-            if custom_item.label_type == label_type and custom_item.index == index:
-                self.all_labels_list.setCurrentItem(item)
-                break
+        model_index = self.all_labels_model.index_of(label_type, index)
+        if model_index.isValid():
+            self.all_labels_list.setCurrentIndex(model_index)
         else:
             self.all_labels_list.clearSelection()
 
     def update_selected_label_in_list(self, selected_index, label_type='box'):
-        if label_type == 'box':
-            label_list = self.box_labels_list
-        else:
-            label_list = self.polygon_labels_list
-
-        for i in range(label_list.count()):
-            item = label_list.item(i)
-            custom_item = label_list.itemWidget(item)
-            if i == selected_index:
-                item.setSelected(True)
-                custom_item.setStyleSheet("background-color: lightblue;")
-            else:
-                item.setSelected(False)
-                custom_item.setStyleSheet("")
+        self.select_label_row(label_type, selected_index)
 
     def handle_sam_segmentation(self, label_type, points):
         if not self.current_image_path:
@@ -754,21 +897,13 @@ class MainWindow(QMainWindow):
             return
 
         if label_type.lower() == 'box':
-            result = self.perform_sam_with_add_boxes(image_name, points, class_id,
-                                                     sam_weight=sam_weight, conf=conf_threshold)
+            self.perform_sam_with_add_boxes(image_name, points, class_id,
+                                            sam_weight=sam_weight, conf=conf_threshold)
         elif label_type.lower() == 'point':
-            result = self.perform_sam_with_add_points(image_name, points, class_id,
-                                                      sam_weight=sam_weight, conf=conf_threshold)
+            self.perform_sam_with_add_points(image_name, points, class_id,
+                                             sam_weight=sam_weight, conf=conf_threshold)
         else:
             QMessageBox.warning(self, "Warning", "Unsupported label type for SAM segmentation.")
-            return
-
-        # Handle the result
-        if result and result["status"] == "success":
-            QMessageBox.information(self, "Success", result["message"])
-            self.refresh_labels()
-        else:
-            QMessageBox.warning(self, "Error", "SAM segmentation failed.")
 
     def perform_sam_with_add_boxes(self, image_name, points, class_id, sam_weight, conf):
         if len(points) != 2:
@@ -785,8 +920,7 @@ class MainWindow(QMainWindow):
 
         bbox = {'class_id': class_id, 'bbox': [center_x, center_y, width, height]}
 
-        return SAMProcessor.process(self.current_image_path, [bbox], self.label_folder, 'box',
-                                    reduction_factor=4, iou_threshold=0.6, model_path=sam_weight, conf=conf)
+        self.submit_sam_job([bbox], 'box', sam_weight, conf)
 
     def perform_sam_with_add_points(self, image_name, points, class_id, sam_weight, conf):
         if not points:
@@ -796,8 +930,7 @@ class MainWindow(QMainWindow):
         # 将点转换为所需的格式
         point_labels = [{'class_id': class_id, 'point': point} for point in points]
 
-        return SAMProcessor.process(self.current_image_path, point_labels, self.label_folder, 'point',
-                                    reduction_factor=4, iou_threshold=0.6, model_path=sam_weight, conf=conf)
+        self.submit_sam_job(point_labels, 'point', sam_weight, conf)
 
     def perform_sam_segmentation(self):
         if not self.current_image_path:
@@ -811,106 +944,114 @@ class MainWindow(QMainWindow):
         self.save(skipDialog=True)
 
         if self.image_view.active_label_type == 'box':
-            result = self.perform_sam_with_boxes(image_name, sam_weight=sam_weight, conf=conf_threshold)
+            self.perform_sam_with_boxes(image_name, sam_weight=sam_weight, conf=conf_threshold)
         elif self.image_view.active_label_type == 'point':
-            result = self.perform_sam_with_points(image_name, sam_weight=sam_weight, conf=conf_threshold)
+            self.perform_sam_with_points(image_name, sam_weight=sam_weight, conf=conf_threshold)
         else:
             QMessageBox.warning(self, "Warning", "Please select point or box labels for SAM segmentation.")
-            return
-
-        # 处理结果
-        if result["status"] == "success":
-            QMessageBox.information(self, "Success", result["message"])
-            self.refresh_labels()
-        else:
-            QMessageBox.warning(self, "Error", "SAM segmentation failed.")
 
     def perform_sam_with_boxes(self, image_name, sam_weight, conf):
         if image_name not in self.box_labels:
             QMessageBox.warning(self, "Warning", "No box labels found for the current image.")
             return
 
-        visible_labels = []
-        for i, label in enumerate(self.box_labels[image_name]):
-            item = self.box_labels_list.item(i)
-            custom_item = self.box_labels_list.itemWidget(item)
-            if custom_item.checkbox.isChecked():
-                visible_labels.append(label)
+        labels = self.box_labels[image_name]
+        visible_labels = labels.subset(sorted(i for i in self.label_visibility['box'] if i < len(labels)))
 
-        if not visible_labels:
+        if not len(visible_labels):
             QMessageBox.warning(self, "Warning", "No visible box labels found.")
             return
 
-        return SAMProcessor.process(self.current_image_path, visible_labels, self.label_folder, 'box',
-                                    reduction_factor=4, iou_threshold=0.6, model_path=sam_weight, conf=conf)
+        self.submit_sam_job(visible_labels, 'box', sam_weight, conf)
 
     def perform_sam_with_points(self, image_name, sam_weight, conf):
         if image_name not in self.point_labels:
             QMessageBox.warning(self, "Warning", "No point labels found for the current image.")
             return
 
-        visible_labels = []
-        for i, label in enumerate(self.point_labels[image_name]):
-            item = self.point_labels_list.item(i)
-            custom_item = self.point_labels_list.itemWidget(item)
-            if custom_item.checkbox.isChecked():
-                visible_labels.append(label)
+        labels = self.point_labels[image_name]
+        visible_labels = labels.subset(sorted(i for i in self.label_visibility['point'] if i < len(labels)))
 
-        if not visible_labels:
+        if not len(visible_labels):
             QMessageBox.warning(self, "Warning", "No visible point labels found.")
             return
 
-        return SAMProcessor.process(self.current_image_path, visible_labels, self.label_folder, 'point',
-                                    reduction_factor=4, iou_threshold=0.6, model_path=sam_weight, conf=conf)
+        self.submit_sam_job(visible_labels, 'point', sam_weight, conf)
+
+    def submit_sam_job(self, visible_labels, label_type, sam_weight, conf, iou_threshold=0.6):
+        image_path = self.current_image_path
+        image_name = os.path.splitext(os.path.basename(image_path))[0]
+        # Snapshot of the polygons the job de-duplicates against
+        polygons = self.polygon_labels.labels_for(image_name)
+        existing_polygons, version = polygons.copy(), polygons.version
+        self.job_queue.submit(f"SAM on {os.path.basename(image_path)}",
+                              SAMProcessor.process, image_path, visible_labels, self.label_backend,
+                              label_type, reduction_factor=4, iou_threshold=iou_threshold, model_path=sam_weight,
+                              conf=conf, existing_polygons=existing_polygons,
+                              roi=self.sam_roi_checkbox.isChecked(),
+                              tile_size=self.tile_size if self.tiled_checkbox.isChecked() else None,
+                              on_finished=lambda result: self.on_sam_job_finished(image_path, polygons, version,
+                                                                                  iou_threshold, result),
+                              on_failed=lambda message: QMessageBox.warning(
+                                  self, "Error", f"SAM segmentation failed: {message}"))
+
+    def on_sam_job_finished(self, image_path, source_polygons, version, iou_threshold, result):
+        if not result or result["status"] != "success":
+            QMessageBox.warning(self, "Error", "SAM segmentation failed.")
+            return
+
+        image_name = os.path.splitext(os.path.basename(image_path))[0]
+        if image_name not in self.polygon_labels:
+            self.polygon_labels[image_name] = []
+        polygons = self.polygon_labels[image_name]
+
+        replaced, added = result["replaced"], result["added"]
+        if polygons is not source_polygons or polygons.version != version:
+            # Polygons changed while the job was running, de-duplicate again against the current ones
+            new_labels = [label for _, label in replaced] + added
+            replaced, added = SAMProcessor.merge_polygons(
+                [polygons.vertices_of(i) for i in range(len(polygons))],
+                [label_io.format_polygon_label(label) for label in new_labels], iou_threshold)
+            replaced = [(index, SAMProcessor.to_polygon_label(label)) for index, label in replaced]
+            added = [SAMProcessor.to_polygon_label(label) for label in added]
+
+        for index, label in replaced:
+            polygons[index] = label
+        self.polygon_labels.mark_modified(image_name)
+        if image_path == self.current_image_path:
+            for model in self.label_models:
+                model.labels_changed('polygon', [index for index, _ in replaced])
+        self.append_labels(image_name, 'polygon', added)
+        # Persist just this image's polygon file
+        self.polygon_labels.write(image_name)
+
+        if image_path == self.current_image_path:
+            self.image_view.labels_changed('polygon')
+        self.statusBar().showMessage(f"{result['message']}: {len(replaced)} replaced, {len(added)} added", 5000)
+
+    def cancel_jobs(self):
+        self.job_queue.cancel_all()
 
     def refresh_labels(self):
         if self.label_folder and self.current_image_path:
-            # Clear existing labels
-            self.box_labels.clear()
-            self.polygon_labels.clear()
-            self.point_labels.clear()
+            # Drop loaded labels and the folder index, they are read again on demand and by a new scan
+            for label_type in ['box', 'polygon', 'point']:
+                labels = getattr(self, f"{label_type}_labels")
+                labels.invalidate()
+                labels.index = None
 
             # Reload category names
-            self.load_class_names(os.path.join(self.label_folder, 'classes.txt'))
-
-            # Load box labels
-            box_folder = os.path.join(self.label_folder, 'Box')
-            if os.path.exists(box_folder):
-                for file_name in os.listdir(box_folder):
-                    if file_name.endswith('.txt'):
-                        image_name = os.path.splitext(file_name)[0]
-                        box_label_path = os.path.join(box_folder, file_name)
-                        self.box_labels[image_name] = self.parse_box_label(box_label_path)
-
-            # Load polygon labels
-            polygon_folder = os.path.join(self.label_folder, 'Polygon')
-            if os.path.exists(polygon_folder):
-                for file_name in os.listdir(polygon_folder):
-                    if file_name.endswith('.txt'):
-                        image_name = os.path.splitext(file_name)[0]
-                        polygon_label_path = os.path.join(polygon_folder, file_name)
-                        self.polygon_labels[image_name] = self.parse_polygon_label(polygon_label_path)
-
-            # Load point labels
-            point_folder = os.path.join(self.label_folder, 'Point')
-            if os.path.exists(point_folder):
-                for file_name in os.listdir(point_folder):
-                    if file_name.endswith('.txt'):
-                        image_name = os.path.splitext(file_name)[0]
-                        point_label_path = os.path.join(point_folder, file_name)
-                        self.point_labels[image_name] = self.parse_point_label(point_label_path)
+            self.load_class_names()
 
             # Simulate image switching process
             self.image_view.load_image(self.current_image_path)
             self.load_image_labels(self.current_image_path)
 
             self.update_label_lists()
+            self.start_label_loader()
 
         # Update the current item in the file list
-        current_image_name = os.path.basename(self.current_image_path)
-        items = self.file_list.findItems(current_image_name, Qt.MatchExactly)
-        if items:
-            self.file_list.setCurrentItem(items[0])
+        self.select_file_row(self.file_model.row_of(self.current_image_path))
 
     def show_add_label_dialog(self):
         if not hasattr(self, 'current_image_path') or not self.current_image_path:
@@ -977,9 +1118,6 @@ class MainWindow(QMainWindow):
 
         if label_type == "Point":
             new_label = {'class_id': class_id, 'point': points[0]}
-            if image_name not in self.point_labels:
-                self.point_labels[image_name] = []
-            self.point_labels[image_name].append(new_label)
         elif label_type == "Box":
             x1, y1 = points[0]
             x2, y2 = points[1]
@@ -988,17 +1126,14 @@ class MainWindow(QMainWindow):
             center_x = (x1 + x2) / 2
             center_y = (y1 + y2) / 2
             new_label = {'class_id': class_id, 'bbox': [center_x, center_y, width, height]}
-            if image_name not in self.box_labels:
-                self.box_labels[image_name] = []
-            self.box_labels[image_name].append(new_label)
         elif label_type == "Polygon":
             new_label = {'class_id': class_id, 'polygon': points}
-            if image_name not in self.polygon_labels:
-                self.polygon_labels[image_name] = []
-            self.polygon_labels[image_name].append(new_label)
+        else:
+            return
 
-        self.update_label_lists()
-        self.image_view.update()
+        label_type = label_type.lower()
+        self.append_labels(image_name, label_type, [new_label])
+        self.image_view.label_appended(label_type)
 
     def start_drawing(self, label_type, is_sam=False):
         self.image_view.start_drawing(label_type, is_sam)
@@ -1012,10 +1147,6 @@ class MainWindow(QMainWindow):
         elif label_type == "Polygon":
             self.add_new_label("Polygon", points, class_id)
 
-        # Update UI
-        self.update_label_lists()
-        self.image_view.update()
-
     def select_class(self, is_sam=False):
         class_dialog = QDialog(self)
         class_dialog.setWindowTitle("Select Class")
@@ -1053,35 +1184,27 @@ class MainWindow(QMainWindow):
             self.class_names[new_id] = new_class
             self.class_colors[new_id] = self.generate_random_color(seed=new_id)
             if self.label_folder:
-                self.save_class_names(os.path.join(self.label_folder, 'classes.txt'))
+                self.save_class_names()
                 # Update UI
                 self.update_label_lists()
-                self.image_view.update()
+                self.image_view.refresh()
 
     def save_class_names(self, class_file_path=None):
         if class_file_path is None:
-            class_file_path = os.path.join(self.label_folder, 'classes.txt')
+            # classes.txt of the label folder, or the class table of the project database
+            self.label_backend.write_class_names(self.class_names)
+            return
 
-        with open(class_file_path, 'w') as f:
-            if isinstance(self.class_names, dict):
-                # If class_names is a dictionary, write id and name
-                for class_id, class_name in sorted(self.class_names.items()):
-                    f.write(f"{class_name}\n")
-            else:
-                # If class_names is a list or any other iterable, write just the names
-                for class_name in self.class_names:
-                    f.write(f"{class_name}\n")
+        if isinstance(self.class_names, dict):
+            # If class_names is a dictionary, write the names ordered by id
+            label_io.write_class_names(class_file_path, self.class_names)
+        else:
+            # If class_names is a list or any other iterable, write just the names
+            label_io.write_lines(class_file_path, self.class_names)
 
     def save_label(self, label_type, class_id, points):
-        if self.current_image not in self.point_labels:
-            self.point_labels[self.current_image] = []
-        if self.current_image not in self.box_labels:
-            self.box_labels[self.current_image] = []
-        if self.current_image not in self.polygon_labels:
-            self.polygon_labels[self.current_image] = []
-
         if label_type == "Point":
-            self.point_labels[self.current_image].append({'class_id': class_id, 'point': points[0]})
+            new_label = {'class_id': class_id, 'point': points[0]}
         elif label_type == "Box":
             x1, y1 = points[0]
             x2, y2 = points[1]
@@ -1089,32 +1212,29 @@ class MainWindow(QMainWindow):
             height = abs(y2 - y1)
             center_x = (x1 + x2) / 2
             center_y = (y1 + y2) / 2
-            self.box_labels[self.current_image].append(
-                {'class_id': class_id, 'bbox': [center_x, center_y, width, height]})
+            new_label = {'class_id': class_id, 'bbox': [center_x, center_y, width, height]}
         elif label_type == "Polygon":
-            self.polygon_labels[self.current_image].append({'class_id': class_id, 'polygon': points})
+            new_label = {'class_id': class_id, 'polygon': points}
+        else:
+            return
 
-        self.update_label_lists()
+        label_type = label_type.lower()
+        self.append_labels(self.current_image, label_type, [new_label])
+        self.image_view.label_appended(label_type)
 
     def delete_label(self):
         if hasattr(self, 'selected_label') and self.selected_label:
             label_type = self.selected_label['type']
             index = self.selected_label['index']
-            current_image = os.path.splitext(os.path.basename(self.current_image_path))[0]
+            deleted = False
 
-            if label_type == 'Point':
-                if current_image in self.point_labels and 0 <= index < len(self.point_labels[current_image]):
-                    del self.point_labels[current_image][index]
-            elif label_type == 'Box':
-                if current_image in self.box_labels and 0 <= index < len(self.box_labels[current_image]):
-                    del self.box_labels[current_image][index]
-            elif label_type == 'Polygon':
-                if current_image in self.polygon_labels and 0 <= index < len(self.polygon_labels[current_image]):
-                    del self.polygon_labels[current_image][index]
+            if label_type in ('Point', 'Box', 'Polygon'):
+                # Rows are removed from the label lists around the deletion
+                deleted = self.remove_label(label_type.lower(), index)
 
             # 更新 UI
-            self.update_label_lists()
-            self.image_view.update()
+            if deleted:
+                self.image_view.set_selected_label(None, None)
             self.selected_label = None
         else:
             QMessageBox.warning(self, "Warning", "No label selected for deletion.")
@@ -1125,35 +1245,16 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Warning", "No label folder selected.")
             return
 
-        # 保存 Box 标签
-        box_folder = os.path.join(self.label_folder, 'Box')
-        os.makedirs(box_folder, exist_ok=True)
-        for image_name, boxes in self.box_labels.items():
-            box_file_path = os.path.join(box_folder, f"{image_name}.txt")
-            with open(box_file_path, 'w') as f:
-                for box in boxes:
-                    f.write(f"{box['class_id']} {' '.join(map(str, box['bbox']))}\n")
-
-        # 保存 Polygon 标签
-        polygon_folder = os.path.join(self.label_folder, 'Polygon')
-        os.makedirs(polygon_folder, exist_ok=True)
-        for image_name, polygons in self.polygon_labels.items():
-            polygon_file_path = os.path.join(polygon_folder, f"{image_name}.txt")
-            with open(polygon_file_path, 'w') as f:
-                for polygon in polygons:
-                    coords = ' '.join(map(str, [coord for point in polygon['polygon'] for coord in point]))
-                    f.write(f"{polygon['class_id']} {coords}\n")
-
-        # 保存 Point 标签
-        point_folder = os.path.join(self.label_folder, 'Point')
-        os.makedirs(point_folder, exist_ok=True)
-        for image_name, points in self.point_labels.items():
-            point_file_path = os.path.join(point_folder, f"{image_name}.txt")
-            with open(point_file_path, 'w') as f:
-                for point in points:
-                    f.write(f"{point['class_id']} {point['point'][0]} {point['point'][1]}\n")
-        if not skipDialog:
-            QMessageBox.information(self, "Success", "Labels saved successfully.")
+        # 只保存修改过的 Box / Polygon / Point 标签
+        written = 0
+        for label_type in ['box', 'polygon', 'point']:
+            written += getattr(self, f"{label_type}_labels").flush()
+
+        message = f"Labels saved successfully ({written} file{'s' if written != 1 else ''} written)."
+        if skipDialog:
+            self.statusBar().showMessage(message, 3000)
+        else:
+            QMessageBox.information(self, "Success", message)
 
     def perform_yolo_segmentation(self):
         if not hasattr(self, 'current_image_path') or not self.current_image_path:
@@ -1165,51 +1266,48 @@ class MainWindow(QMainWindow):
         yolo_weight = os.path.abspath(self.yolo_weight_label.label.text())
         conf_threshold = float(self.conf_threshold.text())
         iou_threshold = 0.45  # You can add an input for this in the UI if needed
-
-        # Initialize YOLO processor
+        image_path = self.current_image_path
+        tile_size = self.tile_size if self.tiled_checkbox.isChecked() else None
+        # One processor per job, made here: jobs never share or replace each other's settings
         yolo_processor = YOLOProcessor(yolo_weight, conf_threshold, iou_threshold)
 
-        # Process image
-        results, img_size = yolo_processor.process_image(self.current_image_path)
+        self.job_queue.submit(f"YOLO on {os.path.basename(image_path)}",
+                              self.run_yolo, yolo_processor, image_path, tile_size,
+                              on_finished=lambda result: self.on_yolo_job_finished(image_path, iou_threshold,
+                                                                                   *result),
+                              on_failed=lambda message: QMessageBox.warning(
+                                  self, "Error", f"YOLO segmentation failed: {message}"))
+
+    @staticmethod
+    def run_yolo(yolo_processor, image_path, tile_size=None):
+        """Runs on the job queue thread, everything it needs is passed in."""
+        if tile_size:
+            boxes, img_size = yolo_processor.process_image_tiled(image_path, tile_size=tile_size)
+        else:
+            boxes, img_size = yolo_processor.detect(image_path)
+        return boxes.tolist(), img_size
 
+    def on_yolo_job_finished(self, image_path, iou_threshold, boxes, img_size):
         # Process results
-        current_image = os.path.splitext(os.path.basename(self.current_image_path))[0]
+        current_image = os.path.splitext(os.path.basename(image_path))[0]
         if current_image not in self.box_labels:
             self.box_labels[current_image] = []
 
-        for box in results.boxes.data.tolist():
-            center_x, center_y, width, height, conf, class_id = yolo_processor.convert_to_yolo_format(box, img_size)
-
+        # Boxes overlapping an existing one are skipped
+        new_labels = YOLOProcessor.merge_boxes(self.box_labels[current_image].coords.tolist(), boxes, img_size,
+                                               iou_threshold)
+        for label in new_labels:
             # Check if class name exists, if not, add it
-            if class_id not in self.class_names:
-                new_class_name = f"class_{class_id}"
-                self.class_names[class_id] = new_class_name
+            if label['class_id'] not in self.class_names:
+                self.class_names[label['class_id']] = f"class_{label['class_id']}"
                 self.save_class_names()
+        self.append_labels(current_image, 'box', new_labels)
 
-            # Check for overlapping boxes
-            new_box = [center_x, center_y, width, height]
-            is_overlapping = False
-            for existing_label in self.box_labels[current_image]:
-                existing_box = existing_label['bbox']
-                iou = yolo_processor.calculate_iou(new_box, existing_box)
-                if iou > iou_threshold:
-                    is_overlapping = True
-                    break
-
-            if not is_overlapping:
-                # Add to box_labels
-                self.box_labels[current_image].append({
-                    'class_id': class_id,
-                    'bbox': new_box,
-                    'confidence': conf
-                })
-
-        # Save results to txt file
-        save_path = os.path.join(self.label_folder, 'Box', f"{current_image}.txt")
-        yolo_processor.save_results(save_path, results, img_size)
+        # Persist just this image's boxes, through the label backend (folder or database)
+        self.box_labels.write(current_image)
 
         # Update UI
-        self.update_label_lists()
-        self.image_view.update()
+        if image_path == self.current_image_path:
+            self.image_view.labels_changed('box')
 
-        QMessageBox.information(self, "Success", "YOLO segmentation completed and saved.")
+        self.statusBar().showMessage("YOLO segmentation completed and saved.", 5000)
@@ -0,0 +1,123 @@
+# -*- coding = utf-8 -*-
+# @Time :2026/10/17 18:20
+# @Author :Pang
+# @File :  tile_pyramid.py
+# @Description : Multi-resolution image tiles decoded on demand with QImageReader
+
+
+import math
+from collections import OrderedDict
+
+from PySide6.QtCore import QRect, QSize
+from PySide6.QtGui import QImageIOHandler, QImageReader, QPixmap
+
+
+DEFAULT_TILE_SIZE = 512
+DEFAULT_CACHE_MB = 128
+
+
+class TilePyramid:
+    """
+    Level L is the image downscaled by 2 ** L and cut into tile_size squares.
+
+    Tiles are decoded from the file on first use with a clip rect and a scaled size, so
+    only the visible part of the needed level is ever decoded. Readers that can not clip
+    decode each level as a single tile. Decoded tiles are kept in a byte bounded LRU.
+    """
+
+    def __init__(self, image_path, tile_size=DEFAULT_TILE_SIZE, cache_mb=DEFAULT_CACHE_MB, preview=None):
+        self.image_path = image_path
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self.tiles = OrderedDict()
+        self.cached_bytes = 0
+        self.preview = None
+
+        # The size comes from the header, nothing is decoded here
+        reader = QImageReader(image_path)
+        self.size = reader.size()
+        self.clip = reader.supportsOption(QImageIOHandler.ImageOption.ClipRect)
+        if not self.size.isValid():
+            image = reader.read()
+            self.size = image.size()
+            self.clip = False
+
+        longest = max(self.size.width(), self.size.height(), 1)
+        self.max_level = max(0, math.ceil(math.log2(longest / tile_size))) if longest > tile_size else 0
+        self.tile_size = tile_size if self.clip else longest
+        if preview is not None:
+            self.set_preview(preview)
+
+    def is_valid(self):
+        return not self.size.isEmpty()
+
+    def set_preview(self, image):
+        """Whole image already decoded at some lower resolution, drawn instead of tiles while it is sharp enough."""
+        self.preview = QPixmap.fromImage(image) if image is not None and not image.isNull() else None
+
+    def level_for(self, scale):
+        """Coarsest level that still has at least `scale` device pixels per source pixel."""
+        if scale >= 1:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1 / scale))))
+
+    def level_size(self, level):
+        factor = 2 ** level
+        return QSize(math.ceil(self.size.width() / factor), math.ceil(self.size.height() / factor))
+
+    def tiles_in(self, level, rect):
+        """(QRect in level pixels, QPixmap) of every tile of `level` overlapping rect (level pixels)."""
+        size = self.level_size(level)
+        first_column = max(0, int(rect.left() // self.tile_size))
+        first_row = max(0, int(rect.top() // self.tile_size))
+        last_column = min((size.width() - 1) // self.tile_size, int(rect.right() // self.tile_size))
+        last_row = min((size.height() - 1) // self.tile_size, int(rect.bottom() // self.tile_size))
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                tile_rect = QRect(column * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size)
+                tile_rect = tile_rect.intersected(QRect(0, 0, size.width(), size.height()))
+                pixmap = self.tile(level, column, row, tile_rect)
+                if pixmap is not None:
+                    yield tile_rect, pixmap
+
+    def tile(self, level, column, row, tile_rect):
+        key = (level, column, row)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+
+        factor = 2 ** level
+        source = QRect(tile_rect.x() * factor, tile_rect.y() * factor,
+                       tile_rect.width() * factor, tile_rect.height() * factor)
+        source = source.intersected(QRect(0, 0, self.size.width(), self.size.height()))
+
+        reader = QImageReader(self.image_path)
+        if source.size() != self.size:
+            reader.setClipRect(source)
+        if tile_rect.size() != source.size():
+            reader.setScaledSize(tile_rect.size())
+        image = reader.read()
+        if image.isNull():
+            print(f"Failed to decode tile {key} of {self.image_path}: {reader.errorString()}")
+            return None
+
+        pixmap = QPixmap.fromImage(image)
+        self.tiles[key] = pixmap
+        self.cached_bytes += self.pixmap_bytes(pixmap)
+        self._evict(keep=key)
+        return pixmap
+
+    def clear(self):
+        self.tiles.clear()
+        self.cached_bytes = 0
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+    def _evict(self, keep):
+        while self.cached_bytes > self.cache_bytes and len(self.tiles) > 1:
+            key = next(iter(self.tiles))
+            if key == keep:
+                break
+            self.cached_bytes -= self.pixmap_bytes(self.tiles.pop(key))